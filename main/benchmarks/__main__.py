@@ -0,0 +1,43 @@
+import argparse
+import json
+import os
+
+from benchmarks.micro import print_streaming, print_version_parsing, run_streaming, run_version_parsing
+from benchmarks.suite import SCENARIOS, compare, print_results, run_suite
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmark the release against local Repox and S3 stand-ins")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the scenarios and write the results as JSON")
+    run_parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                            help="scenario to run (repeatable, default: all)")
+    run_parser.add_argument("--repeat", type=int, default=3, help="runs per scenario, the median is reported")
+    run_parser.add_argument("--output", default="build/benchmarks/results.json")
+    compare_parser = subparsers.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    micro_parser = subparsers.add_parser("micro", help="run the in-process micro-benchmarks")
+    micro_parser.add_argument("--number", type=int, default=20000, help="calls per measurement")
+    micro_parser.add_argument("--streaming-size", type=int, default=256, help="MB downloaded per streaming measurement")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_suite(args.scenario or list(SCENARIOS), args.repeat)
+        print_results(results)
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+    elif args.command == "micro":
+        print_version_parsing(run_version_parsing(args.number))
+        print()
+        print_streaming(run_streaming(args.streaming_size))
+    else:
+        with open(args.baseline) as b, open(args.candidate) as c:
+            compare(json.load(b), json.load(c))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import re
+import tempfile
+import threading
+import time
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from release.utils.progress import MB, TransferProgress
+from release.utils.transfer import TransferManager
+from release.utils.version import parse_version
+
+TAGS = ["10.3.0.82913", "ab-1.2.3-M4.567", "1.0.0+42", "8.9.10.12345", "bad version"]
+
+
+def legacy_parse(tag):
+    """Version parsing as done inline by GitHub.get_release_request before release.utils.version."""
+    pattern = re.compile(
+        r'^(?P<prefix>[a-zA-Z]+-)?'
+        r'\d+\.\d+\.\d+'
+        r'(?:-M\d+)?'
+        r'[-.+]'
+        r'(?P<build>\d+)$'
+    )
+    return pattern.match(tag)
+
+
+def run_version_parsing(number):
+    """Time of one parsing of a tag, in nanoseconds, per implementation."""
+    implementations = {
+        "legacy (compiled per call)": legacy_parse,
+        "structured Version, uncached": parse_version.__wrapped__,
+        "structured Version, lru_cache": parse_version,
+    }
+    results = {}
+    for name, parse in implementations.items():
+        seconds = min(timeit.repeat(lambda: [parse(tag) for tag in TAGS], number=number, repeat=5))
+        results[name] = seconds / (number * len(TAGS)) * 1e9
+    return results
+
+
+def print_version_parsing(results):
+    print(f"{'version parsing':<30} {'ns/tag':>8}")
+    for name, nanoseconds in results.items():
+        print(f"{name:<30} {nanoseconds:>8.0f}")
+
+
+class PayloadHandler(BaseHTTPRequestHandler):
+    """Serve `size` bytes of a repeated block on any path."""
+    protocol_version = "HTTP/1.1"
+    size = 0
+    block = b"\x5a" * MB
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(self.size))
+        self.end_headers()
+        remaining = self.size
+        while remaining:
+            sent = self.wfile.write(self.block[:min(remaining, len(self.block))])
+            remaining -= sent
+
+
+def iter_content_download(chunk_size):
+    """Download as done by Artifactory.download before the transfer manager: a bytes object per chunk."""
+    def download(url, local_file):
+        with requests.get(url, stream=True) as r, open(local_file, 'wb') as f:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+    return download
+
+
+def run_streaming(size_mb, repeat=3):
+    """Client CPU time of the download of `size_mb` MB from a local server, in seconds per GB, per implementation.
+
+    Only the CPU time of the downloading thread is measured (not the one of the server thread).
+    """
+    handler = type("Handler", (PayloadHandler,), {"size": size_mb * MB})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/payload.zip"
+    manager = TransferManager(progress=TransferProgress(interval=float("inf")))
+    implementations = {
+        "iter_content, 8 KiB (before)": iter_content_download(8192),
+        "iter_content, 1 MiB": iter_content_download(MB),
+        "pooled buffer, readinto": lambda url, local_file: manager.download(url, {}, local_file),
+    }
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            local_file = os.path.join(tmpdir, "payload.zip")
+            for name, download in implementations.items():
+                cpu_seconds = []
+                for _ in range(repeat):
+                    started_at = time.thread_time()
+                    download(url, local_file)
+                    cpu_seconds.append(time.thread_time() - started_at)
+                results[name] = min(cpu_seconds) * 1024 / size_mb
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def print_streaming(results):
+    print(f"{'download streaming':<30} {'CPU s/GB':>8}")
+    for name, seconds in results.items():
+        print(f"{name:<30} {seconds:>8.2f}")
@@ -0,0 +1,31 @@
+"""Run `release.main.main` once against the local stand-ins and write its metrics as JSON.
+
+Executed in a dedicated process by the suite so that the peak RSS and the module-level state
+(environment read at import time, class attributes) are isolated between runs.
+"""
+import json
+import resource
+import sys
+import time
+
+
+def run(repox_url, metrics_file):
+    from release import main as release_main
+    from release.utils.artifactory import Artifactory
+
+    Artifactory.url = repox_url
+    started_at = time.perf_counter()
+    cpu_started_at = time.process_time()
+    release_main.main()
+    metrics = {
+        "wall_seconds": time.perf_counter() - started_at,
+        "cpu_seconds": time.process_time() - cpu_started_at,
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    with open(metrics_file, "w") as f:
+        json.dump(metrics, f)
+
+
+if __name__ == "__main__":
+    run(sys.argv[1], sys.argv[2])
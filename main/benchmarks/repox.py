@@ -0,0 +1,235 @@
+import hashlib
+import json
+import re
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOCK_SIZE = 64 * 1024
+DEPLOY_REPO = "sonarsource-public-qa"
+GROUP_ID = "org.sonarsource.bench"
+CHECKSUMS = ("md5", "sha1", "sha256")
+
+
+class SyntheticArtifact:
+    """Deterministic content of a given size, streamed from a single repeated block (never held in memory)."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.block = (hashlib.sha256(name.encode()).digest() * (BLOCK_SIZE // 32))[:BLOCK_SIZE]
+        self._checksums = None
+        self._lock = threading.Lock()
+
+    def iter_bytes(self, start=0, end=None):
+        end = self.size if end is None else min(end, self.size)
+        position = start
+        while position < end:
+            offset = position % BLOCK_SIZE
+            length = min(BLOCK_SIZE - offset, end - position)
+            yield self.block[offset:offset + length]
+            position += length
+
+    def checksums(self):
+        with self._lock:
+            if self._checksums is None:
+                digests = {c: hashlib.new(c) for c in CHECKSUMS}
+                for chunk in self.iter_bytes():
+                    for digest in digests.values():
+                        digest.update(chunk)
+                self._checksums = {c: d.hexdigest() for c, d in digests.items()}
+            return self._checksums
+
+
+class SyntheticBuild:
+    """A build of `artifacts_count` jars of `artifact_size` bytes, each with a CycloneDX SBOM and a signature."""
+
+    def __init__(self, project, buildnumber, artifacts_count, artifact_size):
+        self.project = project
+        self.buildnumber = str(buildnumber)
+        self.version = f"1.0.0.{buildnumber}"
+        self.aids = [f"artifact-{i}" for i in range(artifacts_count)]
+        self.files = {}
+        for aid in self.aids:
+            folder = f"{GROUP_ID.replace('.', '/')}/{aid}/{self.version}"
+            jar = f"{aid}-{self.version}.jar"
+            sbom = f"{aid}-{self.version}-cyclonedx.json"
+            self.files[f"{folder}/{jar}"] = SyntheticArtifact(jar, artifact_size)
+            self.files[f"{folder}/{jar}.asc"] = SyntheticArtifact(f"{jar}.asc", 833)
+            self.files[f"{folder}/{sbom}"] = SyntheticArtifact(sbom, 16 * 1024)
+
+    def artifacts_to_publish(self):
+        return ",".join(f"{GROUP_ID}:{aid}:jar" for aid in self.aids)
+
+    def build_info(self):
+        return {
+            "buildInfo": {
+                "name": self.project,
+                "number": self.buildnumber,
+                "properties": {"buildInfo.env.ARTIFACTORY_DEPLOY_REPO": DEPLOY_REPO},
+                "statuses": [{"status": "it-passed", "repository": DEPLOY_REPO.replace("qa", "builds")}],
+                "modules": [{
+                    "id": f"{GROUP_ID}:{self.aids[0]}:{self.version}",
+                    "properties": {"artifactsToPublish": self.artifacts_to_publish()},
+                }],
+            }
+        }
+
+    def total_bytes(self):
+        return sum(f.size for f in self.files.values())
+
+    def children(self, folder):
+        prefix = f"{folder}/"
+        return [{"uri": f"/{path[len(prefix):]}", "folder": False}
+                for path in self.files if path.startswith(prefix) and "/" not in path[len(prefix):]]
+
+    def search(self, query):
+        """Evaluate the subset of AQL used by the release: files matching any of the {"repo", "path"} criteria."""
+        criteria = json.loads(query[query.index("(") + 1:query.index(").include")])
+        repos = {c["path"]: c["repo"] for c in criteria.get("$or", [criteria])}
+        results = []
+        for path in self.files:
+            folder, _, name = path.rpartition("/")
+            if folder in repos:
+                results.append({"repo": repos[folder], "path": folder, "name": name})
+        return results
+
+    def lookup(self, path):
+        """Resolve a repository path to (artifact, checksum) where checksum is set for a virtual checksum file."""
+        if path in self.files:
+            return self.files[path], None
+        base, _, ext = path.rpartition(".")
+        if ext in CHECKSUMS and base in self.files:
+            return self.files[base], ext
+        return None, None
+
+
+class RepoxHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "RepoxBench"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, kind):
+        with self.server.lock:
+            self.server.requests[kind] += 1
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_status(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _drain(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_POST(self):
+        body = self._drain()
+        if self.path.startswith("/api/build/promote/"):
+            self._count("promote")
+            self._send_json({"messages": []})
+        elif self.path.startswith("/api/search/aql"):
+            self._count("aql")
+            self._send_json({"results": self.server.build.search(body.decode())})
+        else:
+            self._count("other")
+            self._send_status(404)
+
+    def _serve(self, head):
+        build = self.server.build
+        path = self.path.split("?", 1)[0]
+        if path == f"/api/build/{build.project}/{build.buildnumber}":
+            self._count("build")
+            return self._send_json(build.build_info())
+        if path.startswith("/api/plugins/execute/multiRepoPromote"):
+            self._count("promote")
+            return self._send_json({"messages": []})
+        if path.startswith("/api/storage/"):
+            self._count("storage")
+            folder = path[len("/api/storage/"):].split("/", 1)[-1]
+            return self._send_json({"children": build.children(folder)})
+        repo_path = path.lstrip("/").split("/", 1)[-1]
+        artifact, checksum = build.lookup(repo_path)
+        if artifact is None:
+            self._count("missing")
+            return self._send_status(404)
+        if checksum:
+            self._count("checksum")
+            body = artifact.checksums()[checksum].encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if not head:
+                self.wfile.write(body)
+            return
+        self._count("head" if head else "download")
+        self._send_artifact(artifact, head)
+
+    def _send_artifact(self, artifact, head):
+        start, end = 0, artifact.size
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) + 1 if match.group(2) else artifact.size
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{min(end, artifact.size) - 1}/{artifact.size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(min(end, artifact.size) - start))
+        self.send_header("Content-Type", "application/octet-stream")
+        if not match:
+            checksums = artifact.checksums()
+            self.send_header("X-Checksum-Md5", checksums["md5"])
+            self.send_header("X-Checksum-Sha1", checksums["sha1"])
+            self.send_header("X-Checksum-Sha256", checksums["sha256"])
+        self.end_headers()
+        if head:
+            return
+        for chunk in artifact.iter_bytes(start, end):
+            self.wfile.write(chunk)
+
+
+class RepoxServer:
+    """Local stand-in for the Repox build, promotion, storage and download APIs used by the release."""
+
+    def __init__(self, build: SyntheticBuild):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), RepoxHandler)
+        self._server.daemon_threads = True
+        self._server.build = build
+        self._server.requests = Counter()
+        self._server.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return dict(self._server.requests)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
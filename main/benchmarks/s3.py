@@ -0,0 +1,57 @@
+import threading
+from collections import Counter
+
+import requests
+
+from moto.moto_server.werkzeug_app import DomainDispatcherApplication, create_backend_app
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, code="-", size="-"):
+        pass
+
+
+class CountingMiddleware:
+    """WSGI middleware counting the requests received by the S3 stand-in, per HTTP method."""
+
+    def __init__(self, app):
+        self.app = app
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            self.requests[environ["REQUEST_METHOD"]] += 1
+        return self.app(environ, start_response)
+
+
+class S3Server:
+    """Local moto server standing in for S3 (and CloudFront), reached through AWS_ENDPOINT_URL."""
+
+    def __init__(self):
+        self._app = CountingMiddleware(DomainDispatcherApplication(create_backend_app))
+        self._server = make_server("127.0.0.1", 0, self._app, threaded=True,
+                                   request_handler=QuietRequestHandler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return dict(self._app.requests)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        # moto keeps its backends per process: start every run from an empty S3
+        requests.post(f"{self.url}/moto-api/reset").raise_for_status()
+        self._app.requests.clear()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._thread.join()
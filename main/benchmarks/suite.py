@@ -0,0 +1,157 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import boto3
+
+from benchmarks.repox import SyntheticBuild, RepoxServer
+from benchmarks.s3 import S3Server
+
+# Version of the results format: bump it when a metric changes meaning, so that results are only compared
+# with results measured the same way.
+RESULTS_SCHEMA = 1
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+BUCKET = "bench-binaries"
+PROJECT = "bench-project"
+BUILD_NUMBER = 42
+
+# name -> (number of artifacts, size of each artifact)
+SCENARIOS = {
+    "1x1MB": (1, MB),
+    "20x1MB": (20, MB),
+    "200x1MB": (200, MB),
+    "20x100MB": (20, 100 * MB),
+    "1x1GB": (1, GB),
+}
+
+MAIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_describe():
+    try:
+        return subprocess.check_output(["git", "describe", "--tags", "--always", "--dirty"],
+                                       cwd=MAIN_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment():
+    return {
+        "version": git_describe(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_release(build, workdir):
+    """Run one release of `build` in a child process and return its metrics, with the request counts."""
+    repox = RepoxServer(build).start()
+    s3 = S3Server().start()
+    try:
+        boto3.client("s3", endpoint_url=s3.url, region_name="eu-central-1",
+                     aws_access_key_id="bench", aws_secret_access_key="bench") \
+            .create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "eu-central-1"})
+        event_file = os.path.join(workdir, "event.json")
+        with open(event_file, "w") as f:
+            json.dump({"repository": {"full_name": f"SonarSource/{PROJECT}", "default_branch": "master"},
+                       "release": {"tag_name": build.version, "target_commitish": "master"}}, f)
+        release_tmp = tempfile.mkdtemp(dir=workdir)
+        metrics_file = os.path.join(workdir, "metrics.json")
+        env = {
+            "PATH": os.environ.get("PATH", ""),
+            "PYTHONPATH": MAIN_DIR,
+            "TMPDIR": release_tmp,
+            "GITHUB_EVENT_NAME": "release",
+            "GITHUB_EVENT_PATH": event_file,
+            "GITHUB_OUTPUT": os.path.join(workdir, "output"),
+            "GITHUB_SHA": "0" * 40,
+            "ARTIFACTORY_ACCESS_TOKEN": "bench",
+            "INPUT_PUBLISH_TO_BINARIES": "true",
+            "BINARIES_AWS_DEPLOY": BUCKET,
+            "BINARIES_AWS_ACCESS_KEY_ID": "bench",
+            "BINARIES_AWS_SECRET_ACCESS_KEY": "bench",
+            "BINARIES_AWS_SESSION_TOKEN": "bench",
+            "BINARIES_AWS_DEFAULT_REGION": "eu-central-1",
+            "AWS_ENDPOINT_URL": s3.url,
+        }
+        started_at = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "benchmarks.release_run", repox.url, metrics_file],
+                       cwd=MAIN_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        process_seconds = time.perf_counter() - started_at
+        with open(metrics_file) as f:
+            metrics = json.load(f)
+        metrics["process_seconds"] = process_seconds
+        metrics["repox_requests"] = repox.requests
+        metrics["s3_requests"] = s3.requests
+        return metrics
+    finally:
+        repox.stop()
+        s3.stop()
+
+
+def run_scenario(name, repeat):
+    artifacts_count, artifact_size = SCENARIOS[name]
+    build = SyntheticBuild(PROJECT, BUILD_NUMBER, artifacts_count, artifact_size)
+    runs = []
+    for i in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="release-bench-") as workdir:
+            runs.append(run_release(build, workdir))
+        print(f"{name} run {i + 1}/{repeat}: {runs[-1]['wall_seconds']:.2f}s")
+    wall_seconds = statistics.median(r["wall_seconds"] for r in runs)
+    return {
+        "name": name,
+        "artifacts": artifacts_count,
+        "artifact_size": artifact_size,
+        "bytes": build.total_bytes(),
+        "wall_seconds": wall_seconds,
+        "cpu_seconds": statistics.median(r["cpu_seconds"] for r in runs),
+        "throughput_mb_s": build.total_bytes() / MB / wall_seconds,
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+        "repox_requests": runs[-1]["repox_requests"],
+        "s3_requests": runs[-1]["s3_requests"],
+        "runs": runs,
+    }
+
+
+def run_suite(names, repeat):
+    return {
+        "schema": RESULTS_SCHEMA,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": environment(),
+        "repeat": repeat,
+        "scenarios": [run_scenario(name, repeat) for name in names],
+    }
+
+
+def print_results(results):
+    print(f"{'scenario':<10} {'wall (s)':>9} {'cpu (s)':>8} {'MB/s':>8} {'RSS (MB)':>9} {'repox req':>10} {'s3 req':>7}")
+    for s in results["scenarios"]:
+        print(f"{s['name']:<10} {s['wall_seconds']:>9.2f} {s['cpu_seconds']:>8.2f} {s['throughput_mb_s']:>8.1f} "
+              f"{s['peak_rss_mb']:>9.1f} {sum(s['repox_requests'].values()):>10} {sum(s['s3_requests'].values()):>7}")
+
+
+def compare(baseline, candidate):
+    """Print the relative change of each metric for the scenarios measured in both results."""
+    if baseline["schema"] != candidate["schema"]:
+        raise ValueError(f"cannot compare results of schema {baseline['schema']} and {candidate['schema']}")
+    print(f"baseline: {baseline['environment']['version']}, candidate: {candidate['environment']['version']}")
+    baseline_scenarios = {s["name"]: s for s in baseline["scenarios"]}
+    for s in candidate["scenarios"]:
+        b = baseline_scenarios.get(s["name"])
+        if b is None:
+            continue
+        deltas = []
+        for metric in ("wall_seconds", "cpu_seconds", "peak_rss_mb"):
+            deltas.append(f"{metric} {b[metric]:.2f} -> {s[metric]:.2f} ({(s[metric] / b[metric] - 1) * 100:+.1f}%)")
+        deltas.append(f"requests {sum(b['repox_requests'].values()) + sum(b['s3_requests'].values())} -> "
+                      f"{sum(s['repox_requests'].values()) + sum(s['s3_requests'].values())}")
+        print(f"{s['name']}: " + ", ".join(deltas))
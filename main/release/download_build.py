@@ -0,0 +1,31 @@
+"""Entry point of the download-build action: download all artifacts and checksums of a build."""
+import os
+
+from release.exceptions.invalid_input_parameters_exception import InvalidInputParametersException
+from release.utils.artifact_cache import ArtifactCache
+from release.utils.bulk_download import BuildDownloader, DOWNLOAD_WORKERS
+
+DEFAULT_ARTIFACTORY_URL = 'https://repox.jfrog.io/repox'
+
+
+def main():
+    access_token = os.environ.get('ARTIFACTORY_ACCESS_TOKEN')
+    if not access_token:
+        raise InvalidInputParametersException("ARTIFACTORY_ACCESS_TOKEN is not defined")
+    build_name = os.environ.get('PROJECT_NAME') or os.environ.get('REPO_NAME')
+    build_number = os.environ.get('BUILD_NUMBER')
+    repo = os.environ.get('REMOTE_REPO', 'sonarsource-public-releases')
+    downloader = BuildDownloader(os.environ.get('ARTIFACTORY_URL') or DEFAULT_ARTIFACTORY_URL, access_token,
+                                 int(os.environ.get('DOWNLOAD_WORKERS') or DOWNLOAD_WORKERS), ArtifactCache.from_env())
+    files = downloader.list_build_files(repo, build_name, build_number,
+                                        os.environ.get('FILTER', ''), os.environ.get('EXCLUSIONS', ''))
+    if not files:
+        # same as `jfrog rt download --fail-no-op`
+        raise Exception(f"no files of build {build_name}/{build_number} found in {repo}")
+    downloader.download_all(files, os.getcwd(),
+                            flat=os.environ.get('FLAT_DOWNLOAD') == 'true',
+                            checksums=os.environ.get('DOWNLOAD_CHECKSUMS', 'true') == 'true')
+
+
+if __name__ == "__main__":
+    main()
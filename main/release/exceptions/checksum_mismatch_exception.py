@@ -0,0 +1,3 @@
+class ChecksumMismatchException(Exception):
+    """Raised when a downloaded file does not match the checksum known by Artifactory."""
+    pass
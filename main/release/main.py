@@ -8,8 +8,9 @@ from release.utils.binaries import Binaries
 from release.utils.buildinfo import BuildInfo
 from release.utils.dryrun import DryRunHelper
 from release.utils.github import GitHub
+from release.utils.probe import ReleaseProbe
 from release.utils.release import publish_all_artifacts_to_binaries, revoke_release, set_output
-from release.utils.slack import notify_slack
+from release.utils.slack import notify_progress, notify_slack
 from release.vars import binaries_bucket_name
 
 MANDATORY_ENV_VARIABLES = [
@@ -61,13 +62,21 @@ def main():
     github = GitHub()
     release_request = github.get_release_request()
     artifactory = Artifactory(os.environ.get('ARTIFACTORY_ACCESS_TOKEN'))
-    buildinfo = artifactory.receive_build_info(release_request)
+    if DryRunHelper.is_probe_enabled():
+        buildinfo = artifactory.get_build_info(release_request)
+    else:
+        buildinfo = artifactory.receive_build_info(release_request)
     check_params(buildinfo)
     binaries = None
+    if DryRunHelper.is_probe_enabled():
+        ReleaseProbe(artifactory, Binaries(binaries_bucket_name) if github.is_publish_to_binaries() else None) \
+            .run(release_request, buildinfo)
     # Set the project name output for use by dependent workflows
     set_output("project_name", release_request.project)
     try:
+        notify_progress("promote", f"promoting {release_request.project}:{release_request.version}")
         artifactory.promote(release_request, buildinfo)
+        notify_progress("promote", "done")
         set_output("promote", 'done')  # There is no value to do it except to not break existing workflows
         if github.is_publish_to_binaries():
             binaries = Binaries(binaries_bucket_name)
@@ -0,0 +1,18 @@
+"""Wait for a Central Portal deployment to reach a final state (maven-central-sync).
+
+Usage: python -m release.poll_central_deployment <central-url> <deployment-id>
+"""
+import os
+import sys
+
+from release.utils.central_status import DeploymentStatusPoller
+
+
+def main(argv):
+    central_url, deployment_id = argv
+    state = DeploymentStatusPoller(central_url, os.environ['CENTRAL_TOKEN']).wait(deployment_id)
+    print(f"✅ Deployment successful with state: {state}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
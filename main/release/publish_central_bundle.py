@@ -0,0 +1,23 @@
+"""Stream the bundle of a local Maven repository to the Central Portal (maven-central-sync).
+
+Usage: python -m release.publish_central_bundle <local-repo-dir> <central-url> <publishing-type> <deployment-name>
+The deployment ID is the only output on stdout, progress is reported on stderr.
+"""
+import os
+import sys
+import time
+
+from release.utils.central_bundle import StreamingBundleUpload
+
+
+def main(argv):
+    local_repo_dir, central_url, publishing_type, deployment_name = argv
+    start = time.monotonic()
+    upload = StreamingBundleUpload(central_url, os.environ['CENTRAL_TOKEN'])
+    deployment_id = upload.upload(local_repo_dir, publishing_type, deployment_name)
+    print(f"Bundle of {upload.entries} files uploaded in {time.monotonic() - start:.1f}s", file=sys.stderr)
+    print(deployment_id)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
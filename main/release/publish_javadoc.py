@@ -0,0 +1,16 @@
+"""Entry point of the javadoc-publication workflow: publish an extracted javadoc tree to the javadocs bucket."""
+import os
+
+from release.utils.binaries import aws_session, s3_client
+from release.utils.javadoc import JavadocPublisher
+
+
+def main():
+    session = aws_session(os.environ.get('AWS_ACCESS_KEY_ID'), os.environ.get('AWS_SECRET_ACCESS_KEY'),
+                          os.environ.get('AWS_SESSION_TOKEN'), os.environ.get('AWS_DEFAULT_REGION', 'eu-central-1'))
+    publisher = JavadocPublisher(s3_client(session), os.environ['JAVADOC_BUCKET'], os.environ['JAVADOC_DESTINATION'])
+    publisher.publish(os.environ['JAVADOC_DIR'], os.environ['VERSION'])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,27 @@
+from release.utils.version import parse_version
+
+
 class ReleaseRequest:
+    """Immutable, hashable request to release a build of a project."""
+    __slots__ = ('org', 'project', 'version', 'buildnumber', 'branch', 'sha')
+
     def __init__(self, org, project, version, buildnumber, branch, sha):
-        self.org = org
-        self.project = project
-        self.version = version
-        self.buildnumber = buildnumber
-        self.branch = branch
-        self.sha = sha
+        for name, value in zip(self.__slots__, (org, project, version, buildnumber, branch, sha)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _key(self):
+        return self.org, self.project, self.version, self.buildnumber, self.branch, self.sha
+
+    def __eq__(self, other):
+        return isinstance(other, ReleaseRequest) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    @property
+    def parsed_version(self):
+        """The version as a Version, None when it does not follow the release tag pattern (e.g. in dry-run)."""
+        return parse_version(self.version)
@@ -0,0 +1,99 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from release.utils.buffers import CHUNK_SIZE, read_chunks
+
+INDEX = "index.json"
+
+
+class ArtifactCache:
+    """Content-addressed cache of the files downloaded from Repox, shared by the jobs of a release workflow run.
+
+    A file is stored once under `objects/<sha256>` and found either by its checksum, when it is known before the
+    download (download-build gets it from the AQL query), or by its Repox path ("<repo>/<path>", see `index.json`).
+    The cache is a plain directory: the release job fills it and exports it as a workflow artifact, the publishers
+    restore it and only download from Repox what it lacks. Cached files are hard-linked when possible, and checked
+    against their sha256 when restored. With `repos`, only the files of these Repox repositories are stored, e.g. the
+    ones the publishers restoring the cache download.
+    """
+
+    def __init__(self, root, repos=None):
+        self.root = root
+        self.repos = repos
+        self.lock = threading.Lock()
+        self.index = {}
+        index_file = os.path.join(root, INDEX)
+        if os.path.exists(index_file):
+            with open(index_file) as f:
+                self.index = json.load(f)
+
+    @staticmethod
+    def from_env():
+        """The cache of the ARTIFACT_CACHE_DIR directory, None when it is not set, storing the files of the
+        comma-separated ARTIFACT_CACHE_REPOS repositories (every repository when not set)."""
+        root = os.environ.get('ARTIFACT_CACHE_DIR')
+        repos = os.environ.get('ARTIFACT_CACHE_REPOS')
+        return ArtifactCache(root, repos.split(",") if repos else None) if root else None
+
+    def object_path(self, sha256):
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def get(self, destination, repo_path=None, sha256=None):
+        """Write the cached file of checksum `sha256` (or else stored for `repo_path`) to `destination`.
+
+        Return False when the cache does not hold it, or holds a file not matching the checksum (e.g. truncated).
+        """
+        sha256 = sha256 or self.index.get(repo_path)
+        if not sha256 or not os.path.exists(self.object_path(sha256)):
+            return False
+        if file_sha256(self.object_path(sha256)) != sha256:
+            print(f"::warning::ignoring the cached {repo_path or sha256}, its sha256 does not match")
+            # replaced by the next put
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.object_path(sha256))
+            return False
+        link(self.object_path(sha256), destination)
+        print(f"{repo_path or sha256} restored from the artifact cache")
+        return True
+
+    def put(self, local_file, repo_path, sha256=None):
+        """Store `local_file` downloaded from `repo_path`. Its sha256 is computed unless given."""
+        if self.repos is not None and repo_path.split("/", 1)[0] not in self.repos:
+            return
+        sha256 = sha256 or file_sha256(local_file)
+        if not os.path.exists(self.object_path(sha256)):
+            os.makedirs(os.path.dirname(self.object_path(sha256)), exist_ok=True)
+            link(local_file, self.object_path(sha256))
+        with self.lock:
+            self.index[repo_path] = sha256
+            temp_index = os.path.join(self.root, f"{INDEX}.{uuid.uuid4()}")
+            with open(temp_index, 'w') as f:
+                json.dump(self.index, f, indent=1, sort_keys=True)
+            os.replace(temp_index, os.path.join(self.root, INDEX))
+
+
+def link(source, destination):
+    """Hard-link `source` to `destination` (copy it across file systems), replacing `destination` atomically."""
+    temp_destination = f"{destination}.{uuid.uuid4()}"
+    try:
+        os.link(source, temp_destination)
+    except OSError:
+        shutil.copyfile(source, temp_destination)
+    os.replace(temp_destination, destination)
+
+
+def file_sha256(local_file):
+    digest = hashlib.sha256()
+    buffer = memoryview(bytearray(CHUNK_SIZE))
+    with open(local_file, 'rb') as f:
+        for chunk in read_chunks(f, buffer):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+artifact_cache = ArtifactCache.from_env()
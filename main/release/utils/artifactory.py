@@ -1,12 +1,29 @@
 import json
+import os
+import polling
 import requests
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from dryable import Dryable
+from release.utils.artifact_cache import artifact_cache
+from release.utils.buffers import response_chunks
 from release.utils.buildinfo import BuildInfo
+from release.utils.profiles import profile_for
+from release.utils.transfer import transfer_manager
 
 SBOM_EXTENSIONS = ('.json', '.xml')
 
+# Per-repository promotions (parallel_promotion): a request taking longer than PROMOTION_REQUEST_TIMEOUT seconds
+# is left running on Artifactory and its completion is polled for, up to PROMOTION_TIMEOUT seconds.
+PROMOTION_REQUEST_TIMEOUT = 60
+PROMOTION_TIMEOUT = 30 * 60
+PROMOTION_POLL_STEP = 2
+PROMOTION_POLL_MAX_STEP = 30
+# Consecutive failed counts of the artifacts left in the source repository after which the polling gives up
+PROMOTION_MAX_FAILED_COUNTS = 3
+
 
 class Artifactory:
     url = 'https://repox.jfrog.io/repox'
@@ -16,9 +33,17 @@ class Artifactory:
     def __init__(self, access_token: str):
         self.access_token = access_token
         self.headers['Authorization'] = "Bearer "+access_token
+        # (repo, gid, aid, version) -> filenames of the version folder, shared by SBOM discovery and checksum probing
+        self.folder_listings = {}
+        # (repo, gid, aid, version) -> SBOM filename (None when the version folder has no SBOM)
+        self.sbom_index = {}
 
     @Dryable(logging_msg='{function}()')
     def receive_build_info(self, release_request):
+        return self.get_build_info(release_request)
+
+    def get_build_info(self, release_request):
+        """Fetch the build info without going through @Dryable (read-only, used by the dry-run probe)."""
         url = f"{self.url}/api/build/{release_request.project}/{release_request.buildnumber}"
         r = requests.get(url, headers=self.headers)
         buildinfo = r.json()
@@ -65,6 +90,12 @@ class Artifactory:
                     'src2': 'sonarsource-public-builds',
                     'target2': 'sonarsource-public-releases',
                 }
+            if Artifactory.is_parallel_promotion_enabled():
+                self.promote_per_repository(release_request, status, [
+                    (moreparams['src1'], moreparams['target1']),
+                    (moreparams['src2'], moreparams['target2']),
+                ])
+                return
             params = {
                 'buildName': release_request.project,
                 'buildNumber': release_request.buildnumber,
@@ -74,45 +105,148 @@ class Artifactory:
 
             print(f"Promoting to multiple repositories with {params}")
 
-            url = f"{self.url}/api/plugins/execute/multiRepoPromote?params=" + ";".join(
-                "{!s}={!s}".format(key, val) for (key, val) in params.items())
-            r = requests.get(url, headers=self.headers)
+            r = requests.get(self._multi_repo_promote_url(params), headers=self.headers)
             print(f"Successful promotion. Response: {r.text}")
         if not r.ok:
             raise Exception(f"Promotion failed with code: {r.status_code}. Response was: {r.text}")
 
-    def download(self, artifactory_repo, gid, aid, qual, ext, version, checksums=None):
-        gid_path = gid.replace(".", "/")
-        if gid.startswith('com.'):
-            artifactory_repo = artifactory_repo.replace('public', 'private')
-        artifactory = self.url + "/" + artifactory_repo
+    @staticmethod
+    def is_parallel_promotion_enabled():
+        return os.environ.get('INPUT_PARALLEL_PROMOTION', 'false').lower() == "true"
+
+    def _multi_repo_promote_url(self, params):
+        return f"{self.url}/api/plugins/execute/multiRepoPromote?params=" + ";".join(
+            "{!s}={!s}".format(key, val) for (key, val) in params.items())
+
+    def promote_per_repository(self, release_request, status, repositories):
+        """Promote each (source, target) repository pair with its own multiRepoPromote call, concurrently.
+
+        A request whose response times out is not a failure: the plugin keeps promoting on Artifactory, so its
+        completion is detected by polling until no artifact of the build is left in the source repository. A request
+        that could not connect (ConnectTimeout) never reached Artifactory and fails the promotion.
+        """
+        def promote_repository(sourcerepo, targetrepo):
+            params = {
+                'buildName': release_request.project,
+                'buildNumber': release_request.buildnumber,
+                'status': status,
+                'src1': sourcerepo,
+                'target1': targetrepo,
+            }
+            print(f"Promoting {sourcerepo} to {targetrepo} with {params}")
+            try:
+                r = requests.get(self._multi_repo_promote_url(params), headers=self.headers,
+                                 timeout=PROMOTION_REQUEST_TIMEOUT)
+            except requests.exceptions.ReadTimeout:
+                print(f"Promotion of {sourcerepo} to {targetrepo} is still running, waiting for its completion")
+                self.wait_for_promotion(release_request, sourcerepo)
+                return
+            if not r.ok:
+                raise Exception(f"Promotion of {sourcerepo} to {targetrepo} failed with code: {r.status_code}. "
+                                f"Response was: {r.text}")
+            print(f"Successful promotion of {sourcerepo} to {targetrepo}. Response: {r.text}")
 
+        with ThreadPoolExecutor(max_workers=len(repositories)) as executor:
+            futures = [executor.submit(promote_repository, sourcerepo, targetrepo)
+                       for sourcerepo, targetrepo in repositories]
+        for future in futures:
+            future.result()
+
+    def count_build_artifacts(self, release_request, repo):
+        """Count the artifacts of the build stored in `repo`, or None when the AQL query fails."""
+        criteria = {
+            "repo": repo,
+            "artifact.module.build.name": release_request.project,
+            "artifact.module.build.number": release_request.buildnumber,
+        }
+        r = requests.post(f"{self.url}/api/search/aql", data=f'items.find({json.dumps(criteria)}).include("name")',
+                          headers=dict(self.headers, **{'content-type': 'text/plain'}))
+        if r.status_code != 200:
+            print(f"could not count the artifacts of the build in {repo} (status {r.status_code})")
+            return None
+        return len(r.json().get('results', []))
+
+    def wait_for_promotion(self, release_request, sourcerepo):
+        started_at = time.monotonic()
+        failed_counts = 0
+
+        def is_promoted():
+            nonlocal failed_counts
+            count = self.count_build_artifacts(release_request, sourcerepo)
+            failed_counts = failed_counts + 1 if count is None else 0
+            if failed_counts == PROMOTION_MAX_FAILED_COUNTS:
+                raise Exception(f"Could not check the promotion from {sourcerepo}: "
+                                f"{failed_counts} searches of its artifacts failed in a row")
+            return count == 0
+
+        try:
+            polling.poll(is_promoted,
+                         step=PROMOTION_POLL_STEP,
+                         step_function=lambda step: min(step * 2, PROMOTION_POLL_MAX_STEP),
+                         timeout=PROMOTION_TIMEOUT)
+        except polling.TimeoutException:
+            raise Exception(f"Promotion from {sourcerepo} did not complete within {PROMOTION_TIMEOUT} seconds")
+        print(f"Promotion from {sourcerepo} completed after {time.monotonic() - started_at:.0f}s")
+
+    def artifact_url(self, artifactory_repo, gid, aid, qual, ext, version):
+        gid_path = gid.replace(".", "/")
+        repo = self._resolve_repo(artifactory_repo, gid)
         filename = f"{aid}-{version}.{ext}"
         if qual:
             filename = f"{aid}-{version}-{qual}.{ext}"
-        url = f"{artifactory}/{gid_path}/{aid}/{version}/{filename}"
+        return f"{self.url}/{repo}/{gid_path}/{aid}/{version}/{filename}"
+
+    def head_artifact(self, artifactory_repo, gid, aid, qual, ext, version):
+        """Return the size in bytes of an artifact on Repox, or None when it is missing (HEAD only, no download)."""
+        url = self.artifact_url(artifactory_repo, gid, aid, qual, ext, version)
+        r = requests.head(url, headers=self.headers, allow_redirects=True)
+        if r.status_code != 200:
+            print(f"could not find {url} (status {r.status_code})")
+            return None
+        return int(r.headers.get('Content-Length', 0))
+
+    def measure_download_throughput(self, url, max_bytes):
+        """Read at most `max_bytes` of `url` without storing them and return the observed bytes per second."""
+        headers = dict(self.headers, Range=f"bytes=0-{max_bytes - 1}")
+        started_at = time.monotonic()
+        received = 0
+        with requests.get(url, headers=headers, stream=True) as r, transfer_manager().buffers.buffer() as buffer:
+            r.raise_for_status()
+            for chunk in response_chunks(r, buffer):
+                received += len(chunk)
+                if received >= max_bytes:
+                    break
+        elapsed = time.monotonic() - started_at
+        return received / elapsed if elapsed > 0 else None
+
+    def download(self, artifactory_repo, gid, aid, qual, ext, version, checksums=None):
+        url = self.artifact_url(artifactory_repo, gid, aid, qual, ext, version)
         print(url)
-        # for sonarqube rename artifact from sonar-application.zip to sonarqube.zip
-        if aid == "sonar-application":
-            filename = f"sonarqube-{version}.zip"
+        # named after the file on binaries, e.g. sonarqube-<version>.zip for sonar-application
+        filename, _ = profile_for(gid, aid).binaries_filename(aid, version, ext, qual)
         temp_file = f"{tempfile.gettempdir()}/{filename}"
-        r = requests.get(url, headers=self.headers, stream=True)
-        r.raise_for_status()
-        with open(temp_file, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
+        self._download_to_file(url, temp_file)
         print(f'downloaded {temp_file}')
 
         for checksum in (checksums or []):
             checksum_url = f"{url}.{checksum}"
             checksum_file = f"{temp_file}.{checksum}"
-            r = requests.get(checksum_url, headers=self.headers)
+            r = transfer_manager().get(checksum_url, self.headers)
             r.raise_for_status()
             with open(checksum_file, 'wb') as f:
                 f.write(r.content)
             print(f'downloaded {checksum_file}')
         return temp_file
 
+    def _download_to_file(self, url, temp_file):
+        # the artifacts downloaded by the release are cached for the publishers of the workflow run (download-build)
+        repo_path = url[len(self.url) + 1:]
+        if artifact_cache is not None and artifact_cache.get(temp_file, repo_path):
+            return
+        transfer_manager().download(url, self.headers, temp_file)
+        if artifact_cache is not None:
+            artifact_cache.put(temp_file, repo_path)
+
     def _resolve_repo(self, artifactory_repo, gid):
         if gid.startswith('com.'):
             return artifactory_repo.replace('public', 'private')
@@ -135,6 +269,51 @@ class Artifactory:
         lowered = name.lower()
         return (0 if 'cyclonedx' in lowered else 1, 0 if lowered.endswith('.json') else 1, lowered)
 
+    @classmethod
+    def _pick_sbom_filename(cls, names):
+        candidates = sorted((n for n in names if cls._is_sbom_candidate(n)), key=cls._sbom_sort_key)
+        if not candidates:
+            return None
+        if len(candidates) > 1:
+            print(f"multiple SBOM candidates found, using {candidates[0]} (from {candidates})")
+        return candidates[0]
+
+    def index_sbom_filenames(self, artifactory_repo, artifacts, version):
+        """Discover the SBOMs of all the (gid, aid) `artifacts` of a release with a single AQL query.
+
+        The files of every version folder are fetched in one round trip and cached in
+        `folder_listings`, which find_sbom_filename() and download_named() consult before any request.
+        Only the folders found in the results are cached: when the query fails or its results are truncated (AQL
+        result limit), the other folders are listed one by one.
+        """
+        folders = {}
+        for gid, aid in artifacts:
+            repo = self._resolve_repo(artifactory_repo, gid)
+            folders[(repo, f"{gid.replace('.', '/')}/{aid}/{version}")] = (repo, gid, aid, version)
+        if not folders:
+            return
+        criteria = [{"repo": repo, "path": path} for repo, path in folders]
+        query = f'items.find({json.dumps({"$or": criteria, "type": "file"})}).include("repo","path","name")'
+        r = requests.post(f"{self.url}/api/search/aql", data=query,
+                          headers=dict(self.headers, **{'content-type': 'text/plain'}))
+        if r.status_code != 200:
+            print(f"could not search the SBOMs with AQL (status {r.status_code}), listing version folders instead")
+            return
+        body = r.json()
+        results = body.get('results', [])
+        total = body.get('range', {}).get('total', len(results))
+        if total > len(results):
+            print(f"the AQL search of the SBOMs returned {len(results)} of {total} files, "
+                  f"listing version folders instead")
+            return
+        names = {}
+        for item in results:
+            folder = (item.get('repo'), item.get('path'))
+            if folder in folders:
+                names.setdefault(folder, []).append(item.get('name', ''))
+        for folder, folder_names in names.items():
+            self.folder_listings[folders[folder]] = frozenset(folder_names)
+
     def find_sbom_filename(self, artifactory_repo, gid, aid, version):
         """Discover the SBOM file co-located with the artifact in its Repox version folder.
 
@@ -143,51 +322,66 @@ class Artifactory:
         '.json'/'.xml' child whose name mentions 'cyclonedx' or 'sbom' and is not a checksum or
         signature. Returns the filename or None when no SBOM is published for this artifact.
         """
+        key = (self._resolve_repo(artifactory_repo, gid), gid, aid, version)
+        if key not in self.sbom_index:
+            names = self.list_version_folder(artifactory_repo, gid, aid, version)
+            if names is None:
+                return None
+            self.sbom_index[key] = self._pick_sbom_filename(names)
+        return self.sbom_index[key]
+
+    def list_version_folder(self, artifactory_repo, gid, aid, version):
+        """Return the filenames of a Repox version folder, listed once and then served from `folder_listings`.
+
+        Returns None when the folder cannot be listed; failures are not cached.
+        """
         repo = self._resolve_repo(artifactory_repo, gid)
-        gid_path = gid.replace(".", "/")
-        url = f"{self.url}/api/storage/{repo}/{gid_path}/{aid}/{version}"
-        r = requests.get(url, headers=self.headers)
-        if r.status_code != 200:
-            print(f"could not list {url} (status {r.status_code}) to find an SBOM")
-            return None
-        names = (c.get('uri', '').lstrip('/') for c in r.json().get('children', []) if not c.get('folder'))
-        candidates = sorted((n for n in names if self._is_sbom_candidate(n)), key=self._sbom_sort_key)
-        if not candidates:
-            return None
-        if len(candidates) > 1:
-            print(f"multiple SBOM candidates found, using {candidates[0]} (from {candidates})")
-        return candidates[0]
+        key = (repo, gid, aid, version)
+        if key not in self.folder_listings:
+            gid_path = gid.replace(".", "/")
+            url = f"{self.url}/api/storage/{repo}/{gid_path}/{aid}/{version}"
+            r = requests.get(url, headers=self.headers)
+            if r.status_code != 200:
+                print(f"could not list {url} (status {r.status_code})")
+                return None
+            self.folder_listings[key] = frozenset(
+                c.get('uri', '').lstrip('/') for c in r.json().get('children', []) if not c.get('folder'))
+        return self.folder_listings[key]
 
-    def download_named(self, artifactory_repo, gid, aid, version, filename, checksums=None,
+    def download_named(self, artifactory_repo, gid, aid, version, filename, directory, checksums=None,
                        optional_checksums=None):
-        """Download an exact filename (and its checksum siblings) from a Repox version folder.
+        """Download an exact filename (and its checksum siblings) from a Repox version folder into `directory`.
 
         Unlike download(), the filename is provided verbatim (used for SBOMs whose name does not
         follow the {aid}-{version}.{ext} pattern). Checksums in `optional_checksums` are fetched
-        best-effort and skipped when absent (e.g. a product that does not sign its SBOM).
+        best-effort and skipped when absent (e.g. a product that does not sign its SBOM). When the
+        version folder listing is cached, optional checksums missing from it are not requested at all.
+
+        The caller owns `directory`: artifacts differing only by their qualifier share their SBOM filename, each
+        download needs its own.
         """
         repo = self._resolve_repo(artifactory_repo, gid)
         gid_path = gid.replace(".", "/")
         url = f"{self.url}/{repo}/{gid_path}/{aid}/{version}/{filename}"
         print(url)
-        temp_file = f"{tempfile.gettempdir()}/{filename}"
-        r = requests.get(url, headers=self.headers, stream=True)
-        r.raise_for_status()
-        with open(temp_file, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
+        temp_file = os.path.join(directory, filename)
+        self._download_to_file(url, temp_file)
         print(f'downloaded {temp_file}')
 
         for checksum in (checksums or []):
-            r = requests.get(f"{url}.{checksum}", headers=self.headers)
+            r = transfer_manager().get(f"{url}.{checksum}", self.headers)
             r.raise_for_status()
             with open(f"{temp_file}.{checksum}", 'wb') as f:
                 f.write(r.content)
             print(f'downloaded {temp_file}.{checksum}')
 
         downloaded_optional = []
+        listing = self.folder_listings.get((repo, gid, aid, version))
         for checksum in (optional_checksums or []):
-            r = requests.get(f"{url}.{checksum}", headers=self.headers)
+            if listing is not None and f"{filename}.{checksum}" not in listing:
+                print(f"skipping optional {filename}.{checksum} (absent from the version folder)")
+                continue
+            r = transfer_manager().get(f"{url}.{checksum}", self.headers)
             if r.status_code != 200:
                 print(f"skipping optional {filename}.{checksum} (status {r.status_code})")
                 continue
@@ -1,12 +1,17 @@
+import io
 import os
 import tempfile
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
+from botocore.config import Config
 from datetime import datetime, timezone
-from importlib import resources
-from release import resources as file_resources
-from xml.dom.minidom import parseString
+from release.utils.cloudfront import InvalidationManager
+from release.utils.p2_composite import (COMPOSITE_FILES, P2_SITE_RELEASES, composite_template, read_composite,
+                                       rolling_children)
+from release.utils.profiles import ANY_GROUP, ECLIPSE_UPDATE_SITE, P2_COMPOSITE, profile_for
+from release.utils.transfer import transfer_manager
 
 from release.vars import binaries_aws_region_name, binaries_aws_session_token, binaries_aws_secret_access_key, binaries_aws_access_key_id
 
@@ -14,15 +19,14 @@ OSS_REPO = "Distribution"
 COMMERCIAL_REPO = "CommercialDistribution"
 DISTRIBUTION_ID_PROD = 'E2WHX4O0Y6Z6C6'
 SONARLINT_AID = "org.sonarlint.eclipse.site"
-REDDEER_AID = "org.eclipse.reddeer.site"
 UPLOAD_CHECKSUMS = ["md5", "sha1", "sha256", "asc"]
-
-# Hierarchical S3 layout (product/version/platform/file) for qualified artifacts is limited to
-# sonarqube-cli only (PREQ-4535). All other artifact IDs keep the legacy flat path.
-SONARQUBE_CLI_AID = "sonarqube-cli"
+# Concurrent S3 requests of a publication: also the size of the connection pool of the S3 client
+S3_MAX_WORKERS = 16
+# Maximum number of keys of a DeleteObjects request
+DELETE_BATCH_SIZE = 1000
 
 # Map artifact qualifier (e.g. linux-x64, darwin-arm64) to folder name for hierarchical S3 structure
-# (used only when aid == SONARQUBE_CLI_AID and qual is set).
+# (used only for the qualified artifacts of the products with the "platform" layout, see profiles).
 QUAL_TO_PLATFORM_FOLDER = {
     "linux": "linux",
     "linux-x64": "linux",
@@ -42,17 +46,70 @@ QUAL_TO_PLATFORM_FOLDER = {
 }
 
 
+def aws_session(aws_access_key_id, aws_secret_access_key, aws_session_token, region_name):
+    return boto3.Session(
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+        aws_session_token=aws_session_token,
+        region_name=region_name
+    )
+
+
+def s3_client(session, max_workers=S3_MAX_WORKERS):
+    """S3 client whose connection pool can serve `max_workers` threads without discarding connections."""
+    return session.client('s3', config=Config(max_pool_connections=max_workers))
+
+
+def delete_keys(s3_client, bucket, keys):
+    """Delete `keys` with batched DeleteObjects requests and return the keys deleted by S3.
+
+    S3 acknowledges the deletion of a key that does not exist: the result is what is no longer on the bucket.
+    """
+    deleted = []
+    for i in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[i:i + DELETE_BATCH_SIZE]
+        response = s3_client.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': k} for k in batch]})
+        errors = response.get('Errors', [])
+        if errors:
+            raise Exception(f"could not delete {len(errors)} objects of s3://{bucket}, e.g. {errors[0]}")
+        deleted += [d['Key'] for d in response.get('Deleted', [])]
+    return deleted
+
+
+def existing_keys(s3_client, bucket, keys):
+    """The `keys` present on the bucket, listed with one request per prefix: a file and its siblings (checksums,
+    signature) are found at once."""
+    prefixes = []
+    for key in sorted(keys):
+        if not prefixes or not key.startswith(prefixes[-1]):
+            prefixes.append(key)
+    listed = {o['Key'] for prefix in prefixes
+              for o in s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix).get('Contents', [])}
+    return [key for key in keys if key in listed]
+
+
+def delete_prefix(s3_client, bucket, prefix, max_workers=S3_MAX_WORKERS):
+    """Delete every key under `prefix` and return the deleted keys.
+
+    Each page of the listing (up to 1000 keys) is deleted with one DeleteObjects request, concurrently with the
+    listing of the next pages.
+    """
+    paginator = s3_client.get_paginator('list_objects_v2')
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(delete_keys, s3_client, bucket, [o['Key'] for o in page.get('Contents', [])])
+                   for page in paginator.paginate(Bucket=bucket, Prefix=prefix)]
+    return [key for future in futures for key in future.result()]
+
+
 class Binaries:
     def __init__(self, binaries_bucket_name: str):
         self.binaries_bucket_name = binaries_bucket_name
-        self.binaries_session = boto3.Session(
-            aws_access_key_id=binaries_aws_access_key_id,
-            aws_secret_access_key=binaries_aws_secret_access_key,
-            aws_session_token=binaries_aws_session_token,
-            region_name=binaries_aws_region_name
-        )
-        self.s3_client = self.binaries_session.client('s3')
+        self.binaries_session = aws_session(binaries_aws_access_key_id, binaries_aws_secret_access_key,
+                                            binaries_aws_session_token, binaries_aws_region_name)
+        # the uploads of the transfer manager share the connection pool of this client
+        self.s3_client = s3_client(self.binaries_session, max(S3_MAX_WORKERS, transfer_manager().max_connections))
         self.cloudfront_client = self.binaries_session.client('cloudfront')
+        self.invalidations = InvalidationManager(self.cloudfront_client)
 
     @staticmethod
     def get_binaries_repo(gid):
@@ -61,13 +118,6 @@ class Binaries:
         else:
             return OSS_REPO
 
-    @staticmethod
-    def get_actual_checksums(aid):
-        if aid == REDDEER_AID:
-            # Eclipse RedDeer does not have a ".asc" signature
-            return UPLOAD_CHECKSUMS[:-1]
-        return UPLOAD_CHECKSUMS
-
     @staticmethod
     def qual_to_platform_folder(qual):
         """Map artifact qualifier to platform folder for hierarchical S3 structure."""
@@ -80,8 +130,8 @@ class Binaries:
         return qual.split("-")[0].lower() if "-" in qual else qual.lower()
 
     @staticmethod
-    def use_hierarchical_qualifier_layout(aid, qual):
-        return bool(qual) and aid == SONARQUBE_CLI_AID
+    def use_hierarchical_qualifier_layout(aid, qual, gid=ANY_GROUP, profile=None):
+        return (profile or profile_for(gid, aid)).is_hierarchical(qual)
 
     def get_flat_bucket_key(self, root_bucket_key, filename):
         return f"{root_bucket_key}/{filename}"
@@ -90,36 +140,46 @@ class Binaries:
         platform_folder = self.qual_to_platform_folder(qual)
         return f"{root_bucket_key}/{version}/{platform_folder}/{filename}"
 
-    def get_bucket_key(self, aid, gid, filename, version, qual=None):
-        root_bucket_key = self.get_file_bucket_key(aid, gid)
-        if Binaries.use_hierarchical_qualifier_layout(aid, qual):
+    def get_bucket_key(self, aid, gid, filename, version, qual=None, profile=None):
+        root_bucket_key = self.get_file_bucket_key(aid, gid, profile)
+        if Binaries.use_hierarchical_qualifier_layout(aid, qual, gid, profile):
             return self.get_hierarchical_bucket_key(root_bucket_key, filename, version, qual)
         return self.get_flat_bucket_key(root_bucket_key, filename)
 
-    def _upload_with_checksums(self, local_file, bucket_key, checksums):
-        self.s3_client.upload_file(local_file, self.binaries_bucket_name, bucket_key)
+    def list_destination(self, filename, gid, aid, version, qual=None, profile=None):
+        """List the objects already present at the destination of a file (the file itself and its checksum siblings)."""
+        bucket_key = self.get_bucket_key(aid, gid, filename, version, qual, profile)
+        response = self.s3_client.list_objects_v2(Bucket=self.binaries_bucket_name, Prefix=bucket_key)
+        return [o['Key'] for o in response.get('Contents', [])]
+
+    def _upload_with_checksums(self, local_file, bucket_key, checksums, extra_args=None):
+        transfer_manager().upload(self.s3_client, local_file, self.binaries_bucket_name, bucket_key,
+                                extra_args=extra_args)
         print(f'uploaded {local_file} to s3://{self.binaries_bucket_name}/{bucket_key}')
         for checksum in checksums:
-            self.s3_client.upload_file(f'{local_file}.{checksum}', self.binaries_bucket_name, f'{bucket_key}.{checksum}')
+            transfer_manager().upload(self.s3_client, f'{local_file}.{checksum}', self.binaries_bucket_name,
+                                    f'{bucket_key}.{checksum}', report_progress=False)
             print(f'uploaded {local_file}.{checksum} to s3://{self.binaries_bucket_name}/{bucket_key}.{checksum}')
 
-    def s3_upload(self, artifact_file, filename, gid, aid, version, qual=None):
-        root_bucket_key = self.get_file_bucket_key(aid, gid)
-        file_bucket_key = self.get_bucket_key(aid, gid, filename, version, qual)
-        self._upload_with_checksums(artifact_file, file_bucket_key, Binaries.get_actual_checksums(aid))
+    def s3_upload(self, artifact_file, filename, gid, aid, version, qual=None, profile=None):
+        """Upload an artifact and run the hooks of its publishing profile.
 
-        version_bucket_key = f"{root_bucket_key}/{version}"
+        `aid` is the artifact ID on binaries: pass the `profile` of the Repox artifact ID when it is renamed.
+        """
+        profile = profile or profile_for(gid, aid)
+        root_bucket_key = self.get_file_bucket_key(aid, gid, profile)
+        file_bucket_key = self.get_bucket_key(aid, gid, filename, version, qual, profile)
+        self._upload_with_checksums(artifact_file, file_bucket_key, profile.checksums)
 
-        if aid == SONARLINT_AID:
-            # SonarQube for IDE (formerly SonarLint)
-            self.upload_eclipse_update_site_unzip(version_bucket_key, artifact_file)
-            self.upload_sonarlint_p2_site(root_bucket_key, version_bucket_key)
-            self.update_sonarlint_p2_site(DISTRIBUTION_ID_PROD, version)
-        elif aid == REDDEER_AID:
-            # Eclipse RedDeer fork. Does not require the composite XML files as it is only used
-            # internally anyway and the update process inside SonarSource/sonarlint-eclipse is done
-            # manually to not break something by relying on the "latest" released artifact!
-            self.upload_eclipse_update_site_unzip(version_bucket_key, artifact_file)
+        version_bucket_key = f"{root_bucket_key}/{version}"
+        hooks = {
+            ECLIPSE_UPDATE_SITE: [lambda: self.upload_eclipse_update_site_unzip(version_bucket_key, artifact_file)],
+            P2_COMPOSITE: [lambda: self.upload_sonarlint_p2_site(root_bucket_key, version_bucket_key),
+                           lambda: self.update_sonarlint_p2_site(DISTRIBUTION_ID_PROD, profile)],
+        }
+        for hook in profile.hooks:
+            for step in hooks[hook]:
+                step()
 
     @staticmethod
     def sbom_filename_for(binary_filename):
@@ -127,25 +187,21 @@ class Binaries:
         base = os.path.splitext(binary_filename)[0]
         return f"{base}.sbom.json"
 
-    def s3_upload_sbom(self, sbom_file, sbom_filename, gid, aid, version, qual=None, checksums=None):
-        bucket_key = self.get_bucket_key(aid, gid, sbom_filename, version, qual)
-        self._upload_with_checksums(sbom_file, bucket_key, checksums or [])
+    def s3_upload_sbom(self, sbom_file, sbom_filename, gid, aid, version, qual=None, checksums=None, extra_args=None,
+                       profile=None):
+        bucket_key = self.get_bucket_key(aid, gid, sbom_filename, version, qual, profile)
+        self._upload_with_checksums(sbom_file, bucket_key, checksums or [], extra_args)
 
-    def s3_delete_sbom(self, sbom_filename, gid, aid, version, qual=None):
-        self.s3_delete(sbom_filename, gid, aid, version, qual)
+    def s3_delete_sbom(self, sbom_filename, gid, aid, version, qual=None, profile=None):
         # Also remove the checksum/signature siblings written at upload time so a revoke does not
         # leave orphaned objects referencing a deleted SBOM.
-        for checksum in UPLOAD_CHECKSUMS:
-            self.s3_delete(f"{sbom_filename}.{checksum}", gid, aid, version, qual)
-
-    def get_file_bucket_key(self, aid, gid):
-        # SonarLint Eclipse is uploaded to a special directory
-        if aid == SONARLINT_AID:
-            return "SonarLint-for-Eclipse/releases"
-        elif aid == REDDEER_AID:
-            return "RedDeer/releases"
-        binaries_repo = Binaries.get_binaries_repo(gid)
-        return f"{binaries_repo}/{aid}"
+        bucket_keys = []
+        for filename in [sbom_filename] + [f"{sbom_filename}.{checksum}" for checksum in UPLOAD_CHECKSUMS]:
+            bucket_keys += self.get_delete_bucket_keys(filename, gid, aid, version, qual, profile)
+        return self._delete(bucket_keys)
+
+    def get_file_bucket_key(self, aid, gid, profile=None):
+        return (profile or profile_for(gid, aid)).root_bucket_key(Binaries.get_binaries_repo(gid), aid)
 
     def upload_eclipse_update_site_unzip(self, version_bucket_key, zip_file):
         """
@@ -159,66 +215,64 @@ class Binaries:
                     local_file = os.path.join(root, filename)
                     s3_file = os.path.join(version_bucket_key, os.path.relpath(local_file, tmpdirname))
                     print(f"upload {s3_file}")
-                    self.s3_client.upload_file(local_file, self.binaries_bucket_name, s3_file)
+                    transfer_manager().upload(self.s3_client, local_file, self.binaries_bucket_name, s3_file,
+                                            report_progress=False)
         print(f'uploaded content of {zip_file} to s3://{self.binaries_bucket_name}/{version_bucket_key}')
 
-    def upload_sonarlint_p2_site(self, root_bucket_key, version_bucket_key):
+    def upload_sonarlint_p2_site(self, root_bucket_key, version_bucket_key, keep=P2_SITE_RELEASES):
         """
-        Add the release to the SonarLint Eclipse P2 update site and upload
+        Add the release to the SonarLint Eclipse P2 update site and upload, keeping the `keep` latest releases
         """
         now_as_epoch_millis = str(round(datetime.now(timezone.utc).timestamp() * 1000))
-        for composite_file in ['compositeContent.xml', 'compositeArtifacts.xml']:
-            template = resources.read_text(file_resources, composite_file)
-            document = parseString(template)
-            document.getElementsByTagName('property')[0].setAttribute('value', now_as_epoch_millis)
-            document.getElementsByTagName('child')[-1] \
-                .setAttribute('location', f"https://binaries.sonarsource.com/{version_bucket_key}/")
-            temp_file = f"{tempfile.gettempdir()}/{composite_file}"
-            with open(temp_file, 'w') as output:
-                document.writexml(output, encoding='UTF-8')
+        location = f"https://binaries.sonarsource.com/{version_bucket_key}/"
+        for composite_file in COMPOSITE_FILES:
+            template = composite_template(composite_file)
             composite_bucket_key = f"{root_bucket_key}/{composite_file}"
-            self.s3_client.upload_file(temp_file, self.binaries_bucket_name, composite_bucket_key)
+            previous = []
+            if keep > 1:
+                current = read_composite(self.s3_client, self.binaries_bucket_name, composite_bucket_key)
+                previous = template.released_children(current) if current else []
+            content = template.render(now_as_epoch_millis, rolling_children(previous, location, keep))
+            self.s3_client.put_object(Bucket=self.binaries_bucket_name, Key=composite_bucket_key,
+                                      Body=io.BytesIO(content), ContentType='application/xml')
             print(f'uploaded {composite_file} to s3://{self.binaries_bucket_name}/{composite_bucket_key}')
 
-    def update_sonarlint_p2_site(self, distribution_id, version):
+    def update_sonarlint_p2_site(self, distribution_id, profile=None):
         """
-        Create CloudFront invalidation to update the cache of SonarLint Eclipse P2 update site files
+        Register the CloudFront invalidation updating the cache of SonarLint Eclipse P2 update site files (declared by
+        its publishing profile), submitted with the other invalidations of the release once every artifact is published
         """
-        client = self.cloudfront_client
-        response = client.create_invalidation(
-            DistributionId=distribution_id,
-            InvalidationBatch={
-                'Paths': {
-                    'Quantity': 2,
-                    'Items': [
-                        '/SonarLint-for-Eclipse/releases/compositeContent.xml',
-                        '/SonarLint-for-Eclipse/releases/compositeArtifacts.xml'
-                    ]
-                },
-                'CallerReference': f"gh-action_release-SonarLint-{version}"
-            }
-        )
-        invalidation_uri = response['Location']
-        print(f'CloudFront invalidation: {invalidation_uri}')
-
-    def s3_delete(self, filename, gid, aid, version, qual=None):
-        root_bucket_key = self.get_file_bucket_key(aid, gid)
+        profile = profile or profile_for(ANY_GROUP, SONARLINT_AID)
+        self.invalidations.add(distribution_id, *profile.invalidations)
+
+    def get_delete_bucket_keys(self, filename, gid, aid, version, qual=None, profile=None):
+        root_bucket_key = self.get_file_bucket_key(aid, gid, profile)
         bucket_keys = [self.get_flat_bucket_key(root_bucket_key, filename)]
-        if Binaries.use_hierarchical_qualifier_layout(aid, qual):
+        if Binaries.use_hierarchical_qualifier_layout(aid, qual, gid, profile):
             bucket_keys = [self.get_hierarchical_bucket_key(root_bucket_key, filename, version, qual)]
         elif qual:
             # Backward compatibility for artifacts published by v6.4.0, where all qualifiers
             # used the hierarchical version/platform layout.
             bucket_keys.append(self.get_hierarchical_bucket_key(root_bucket_key, filename, version, qual))
+        return bucket_keys
 
-        for bucket_key in dict.fromkeys(bucket_keys):
-            self.s3_client.delete_object(Bucket=self.binaries_bucket_name, Key=bucket_key)
+    def _delete(self, bucket_keys):
+        """Delete the existing `bucket_keys` and return them: S3 also acknowledges the deletion of missing keys."""
+        bucket_keys = existing_keys(self.s3_client, self.binaries_bucket_name, list(dict.fromkeys(bucket_keys)))
+        deleted = delete_keys(self.s3_client, self.binaries_bucket_name, bucket_keys)
+        for bucket_key in deleted:
             print(f'deleted {bucket_key}')
+        return deleted
+
+    def s3_delete(self, filename, gid, aid, version, qual=None, profile=None):
+        """Delete a published file and return the deleted keys, the ones that existed on the bucket."""
+        profile = profile or profile_for(gid, aid)
+        deleted = self._delete(self.get_delete_bucket_keys(filename, gid, aid, version, qual, profile))
 
-        if aid == SONARLINT_AID:
+        if profile.delete_version_folder:
+            root_bucket_key = self.get_file_bucket_key(aid, gid, profile)
             version_bucket_key = f"{root_bucket_key}/{version}/"
-            s3 = boto3.resource('s3')
-            bucket = s3.Bucket(self.binaries_bucket_name)
-            objects = bucket.objects.filter(Prefix=f'{version_bucket_key}')
-            objects.delete()
-            print(f'deleted {version_bucket_key}')
+            folder = delete_prefix(self.s3_client, self.binaries_bucket_name, version_bucket_key)
+            print(f'deleted {len(folder)} objects of {version_bucket_key}')
+            deleted += folder
+        return deleted
@@ -0,0 +1,65 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+from urllib3.response import BaseHTTPResponse
+
+# Bytes read at once by the streaming reads
+CHUNK_SIZE = 1024 * 1024
+MAX_BUFFERS = 8
+
+
+class BufferPool:
+    """Preallocated buffers reused by the streaming reads, filled with `readinto` instead of allocating a bytes object
+    per chunk.
+
+    At most `max_buffers` buffers of `chunk_size` bytes are allocated, lazily: `buffer` blocks while all of them are in
+    use, so that the memory of the transfers stays bounded whatever their number.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, max_buffers=MAX_BUFFERS):
+        self.chunk_size = chunk_size
+        self.available = threading.BoundedSemaphore(max_buffers)
+        self.free = queue.LifoQueue()
+
+    @contextmanager
+    def buffer(self):
+        with self.available:
+            try:
+                buffer = self.free.get_nowait()
+            except queue.Empty:
+                buffer = memoryview(bytearray(self.chunk_size))
+            try:
+                yield buffer
+            finally:
+                self.free.put(buffer)
+
+
+def read_chunks(source, buffer):
+    """Yield the content of the binary file object `source`, read into `buffer`.
+
+    A chunk is a view of `buffer`: it is only valid until the next one is read.
+    """
+    while size := source.readinto(buffer):
+        yield buffer[:size]
+
+
+def response_chunks(response, buffer):
+    """Yield the body of a streamed requests `response`, read into `buffer` (see `read_chunks`).
+
+    The body is read with the `readinto` of the urllib3 response. It falls back to `iter_content` when the body has to
+    be decoded (Content-Encoding). The urllib3 errors are raised as the requests ones `iter_content` would raise: a body
+    cut short by the server raises a `ChunkedEncodingError` instead of ending silently.
+    """
+    raw = getattr(response, 'raw', None)
+    if not isinstance(raw, BaseHTTPResponse) or response.headers.get('Content-Encoding', 'identity') != 'identity':
+        yield from response.iter_content(chunk_size=len(buffer))
+        return
+    try:
+        yield from read_chunks(raw, buffer)
+    except ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e)
+    except ReadTimeoutError as e:
+        raise requests.exceptions.ConnectionError(e)
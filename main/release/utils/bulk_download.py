@@ -0,0 +1,145 @@
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from release.exceptions.checksum_mismatch_exception import ChecksumMismatchException
+
+CHECKSUMS = ('md5', 'sha1', 'sha256')
+# AQL field holding each checksum of an item
+AQL_CHECKSUM_FIELDS = {'md5': 'actual_md5', 'sha1': 'actual_sha1', 'sha256': 'sha256'}
+# Files that are checksums or signatures of another artifact: they get no checksum siblings of their own
+SIBLING_EXTENSIONS = ('.asc', '.md5', '.sha1', '.sha256')
+
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_ATTEMPTS = 3
+CHUNK_SIZE = 1024 * 1024
+
+
+class BuildFile:
+    def __init__(self, repo, path, name, size, checksums):
+        self.repo = repo
+        self.path = path
+        self.name = name
+        self.size = size
+        self.checksums = checksums
+
+    @property
+    def repo_path(self):
+        return f"{self.path}/{self.name}" if self.path and self.path != '.' else self.name
+
+    def local_path(self, flat):
+        return self.name if flat else self.repo_path
+
+    def has_checksum_siblings(self):
+        return not self.name.endswith(SIBLING_EXTENSIONS)
+
+
+class BuildDownloader:
+    """Download the files of a build from Artifactory, in place of `jfrog rt download --build` (download-build action).
+
+    The files of the build and their checksums are listed with a single AQL query, then downloaded concurrently
+    over a pooled session. Every download is verified against the checksums of Artifactory, and the md5/sha1/sha256
+    siblings are written from them instead of being downloaded one by one. With an `ArtifactCache`, the files it holds
+    are taken from it instead of Repox.
+    """
+
+    def __init__(self, url, access_token, workers=DOWNLOAD_WORKERS, cache=None):
+        self.url = url.rstrip('/')
+        self.workers = workers
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"Bearer {access_token}"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def list_build_files(self, repo, build_name, build_number, filter_path='', exclusions=''):
+        """List the files of the build deployed in `repo`, under `filter_path`, minus the `exclusions` (as jfrog does)."""
+        query = 'items.find(' + json.dumps({
+            "repo": repo,
+            "type": "file",
+            "artifact.module.build.name": build_name,
+            "artifact.module.build.number": str(build_number),
+        }) + ').include("repo","path","name","size","actual_md5","actual_sha1","sha256")'
+        r = self.session.post(f"{self.url}/api/search/aql", data=query, headers={'content-type': 'text/plain'})
+        r.raise_for_status()
+        files = {}
+        for item in r.json().get('results', []):
+            checksums = {c: item.get(field) for c, field in AQL_CHECKSUM_FIELDS.items() if item.get(field)}
+            build_file = BuildFile(item['repo'], item['path'], item['name'], item.get('size'), checksums)
+            # a file shared by several modules of the build is returned once per module
+            files[build_file.repo_path] = build_file
+        return [f for f in files.values()
+                if self._is_under(f, filter_path) and not self._is_excluded(f, exclusions)]
+
+    @staticmethod
+    def _is_under(build_file, filter_path):
+        prefix = filter_path.strip('/')
+        return not prefix or build_file.repo_path.startswith(f"{prefix}/")
+
+    @staticmethod
+    def _is_excluded(build_file, exclusions):
+        patterns = [p for p in (exclusions or '').split(';') if p]
+        full_path = f"{build_file.repo}/{build_file.repo_path}"
+        return any(fnmatch.fnmatchcase(full_path, p) or fnmatch.fnmatchcase(build_file.repo_path, p) for p in patterns)
+
+    def download_all(self, files, local_dir, flat=False, checksums=True):
+        """Download the files into `local_dir` and return the number of bytes downloaded (not taken from the cache)."""
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            sizes = list(executor.map(lambda f: self.download(f, local_dir, flat, checksums), files))
+        elapsed = time.monotonic() - start
+        total_bytes = sum(sizes)
+        print(f"downloaded {len(files)} files ({total_bytes} bytes) in {elapsed:.1f}s")
+        return total_bytes
+
+    def download(self, build_file, local_dir, flat=False, checksums=True):
+        destination = os.path.join(local_dir, build_file.local_path(flat))
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        repo_path = f"{build_file.repo}/{build_file.repo_path}"
+        sha256 = build_file.checksums.get('sha256')
+        if self.cache is not None and self.cache.get(destination, repo_path, sha256):
+            size = 0
+        else:
+            for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+                try:
+                    size = self._fetch(build_file, destination)
+                    break
+                except (requests.ConnectionError, requests.Timeout, ChecksumMismatchException) as e:
+                    if attempt == DOWNLOAD_ATTEMPTS:
+                        raise
+                    print(f"::warning::download of {build_file.repo_path} failed ({e}), retrying")
+            if self.cache is not None:
+                self.cache.put(destination, repo_path, sha256)
+        if checksums and build_file.has_checksum_siblings():
+            for checksum in CHECKSUMS:
+                if checksum in build_file.checksums:
+                    with open(f"{destination}.{checksum}", 'w') as f:
+                        f.write(build_file.checksums[checksum])
+        print(f"downloaded {build_file.repo_path}")
+        return size
+
+    def _fetch(self, build_file, destination):
+        digests = {c: hashlib.new(c) for c in build_file.checksums}
+        size = 0
+        url = f"{self.url}/{build_file.repo}/{build_file.repo_path}"
+        with self.session.get(url, stream=True, timeout=60) as r:
+            r.raise_for_status()
+            with open(destination, 'wb') as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+                    for digest in digests.values():
+                        digest.update(chunk)
+        for checksum, digest in digests.items():
+            if digest.hexdigest() != build_file.checksums[checksum]:
+                raise ChecksumMismatchException(
+                    f"{checksum} of {build_file.repo_path} is {digest.hexdigest()}, "
+                    f"expected {build_file.checksums[checksum]}")
+        return size
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+import uuid
+import zipfile
+
+import requests
+
+from release.utils.buffers import CHUNK_SIZE, read_chunks
+
+# Files skipped in the bundle, as with `zip -r . -x ".*" ".DS_Store" "Thumbs.db"`
+IGNORED_FILES = ('.DS_Store', 'Thumbs.db')
+# Archives are already compressed: deflating them again costs CPU for no size gain, they are written without compression
+STORED_EXTENSIONS = ('.jar', '.war', '.ear', '.zip', '.gz', '.tgz', '.nupkg')
+# Checksums that Central requires next to every file, generated when the local repository lacks them
+REQUIRED_CHECKSUMS = ('md5', 'sha1')
+SIBLING_EXTENSIONS = ('.asc', '.md5', '.sha1', '.sha256', '.sha512')
+
+
+def bundle_entries(local_repo_dir):
+    """Paths of the files to bundle, relative to `local_repo_dir` and with "/" separators."""
+    entries = []
+    for root, dirs, files in os.walk(local_repo_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for filename in sorted(files):
+            if filename.startswith('.') or filename in IGNORED_FILES:
+                continue
+            entries.append(os.path.relpath(os.path.join(root, filename), local_repo_dir).replace(os.sep, '/'))
+    return entries
+
+
+def missing_checksums(entries):
+    """{entry: [checksums to generate]} for the files of the bundle lacking a required checksum sibling."""
+    present = set(entries)
+    missing = {}
+    for entry in entries:
+        if entry.endswith(SIBLING_EXTENSIONS):
+            continue
+        checksums = [c for c in REQUIRED_CHECKSUMS if f"{entry}.{c}" not in present]
+        if checksums:
+            missing[entry] = checksums
+    return missing
+
+
+def write_bundle(local_repo_dir, output):
+    """Write the zip bundle of `local_repo_dir` to the (possibly unseekable) binary stream `output`.
+
+    Every file is read once: the missing checksums are computed while the file is written to the bundle, and added
+    right after it. Archives are not compressed again, the other files are deflated.
+    Return the number of entries written.
+
+    On an unseekable stream, the CRC and size of an entry follow its data (data descriptor).
+    """
+    entries = bundle_entries(local_repo_dir)
+    missing = missing_checksums(entries)
+    count = 0
+    # every file is read into the same buffer
+    buffer = memoryview(bytearray(CHUNK_SIZE))
+    with zipfile.ZipFile(output, 'w', allowZip64=True) as bundle:
+        for entry in entries:
+            info = zipfile.ZipInfo.from_file(os.path.join(local_repo_dir, entry), entry)
+            info.compress_type = zipfile.ZIP_STORED if entry.endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+            digests = {c: hashlib.new(c) for c in missing.get(entry, [])}
+            # ZIP64 is decided from the file size of `info`, known before the entry is written
+            with open(os.path.join(local_repo_dir, entry), 'rb') as src, bundle.open(info, 'w') as dst:
+                for chunk in read_chunks(src, buffer):
+                    dst.write(chunk)
+                    for digest in digests.values():
+                        digest.update(chunk)
+            count += 1
+            for checksum, digest in digests.items():
+                bundle.writestr(zipfile.ZipInfo(f"{entry}.{checksum}", info.date_time), digest.hexdigest(),
+                                compress_type=zipfile.ZIP_DEFLATED)
+                count += 1
+    return count
+
+
+class StreamingBundleUpload:
+    """Upload the bundle of a local Maven repository to the Central Portal while it is being built.
+
+    The bundle is written by a thread into a pipe and sent as the `bundle` part of a chunked multipart request, so that
+    it is never stored on disk and its creation overlaps with its upload. If the bundle cannot be written, the request
+    is aborted before its closing boundary, so that a truncated bundle is never accepted.
+    """
+
+    def __init__(self, central_url, token):
+        self.central_url = central_url.rstrip('/')
+        self.token = token
+        self.entries = 0
+        self.error = None
+
+    def upload(self, local_repo_dir, publishing_type, deployment_name):
+        read_fd, write_fd = os.pipe()
+        writer = threading.Thread(target=self._write, args=(local_repo_dir, write_fd), daemon=True)
+        writer.start()
+        boundary = uuid.uuid4().hex
+        try:
+            with os.fdopen(read_fd, 'rb') as bundle:
+                r = requests.post(f"{self.central_url}/api/v1/publisher/upload",
+                                  params={'publishingType': publishing_type, 'name': deployment_name},
+                                  headers={'Authorization': f"Bearer {self.token}",
+                                           'Content-Type': f"multipart/form-data; boundary={boundary}"},
+                                  data=self._multipart(bundle, boundary, writer))
+        finally:
+            # closing the read end unblocks the writer if the upload stopped early
+            writer.join()
+        if r.status_code != 201:
+            raise Exception(f"upload failed with status {r.status_code}: {r.text}")
+        return r.text.strip()
+
+    def _write(self, local_repo_dir, write_fd):
+        try:
+            with os.fdopen(write_fd, 'wb') as output:
+                self.entries = write_bundle(local_repo_dir, output)
+        except Exception as e:
+            self.error = e
+
+    def _multipart(self, bundle, boundary, writer):
+        yield (f"--{boundary}\r\n"
+               f"Content-Disposition: form-data; name=\"bundle\"; filename=\"central-bundle.zip\"\r\n"
+               f"Content-Type: application/zip\r\n\r\n").encode()
+        while chunk := bundle.read(CHUNK_SIZE):
+            yield chunk
+        # the pipe is also closed when the writer fails: raising here aborts the chunked request
+        writer.join()
+        if self.error is not None:
+            raise Exception(f"failed to create the bundle: {self.error}")
+        yield f"\r\n--{boundary}--\r\n".encode()
@@ -0,0 +1,94 @@
+import sys
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import polling
+import requests
+
+SUCCESS_STATES = ('VALIDATED', 'PUBLISHING', 'PUBLISHED')
+FAILURE_STATES = ('FAILED',)
+# Deployments are usually validated within a minute: poll fast first, then back off, more slowly while validating
+FIRST_STEP = 1
+BACKOFF = 1.5
+MAX_STEP = {'PENDING': 5, 'VALIDATING': 15}
+DEFAULT_MAX_STEP = 30
+STATUS_TIMEOUT = 2 * 60 * 60
+# Transient failures of a status check (connection error, body that is not JSON): the poll goes on
+TRANSIENT_ERRORS = (requests.RequestException, ValueError)
+
+
+def retry_after_seconds(value):
+    """Seconds to wait from a Retry-After header (delay in seconds or HTTP date), None if absent or invalid."""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class DeploymentStatusPoller:
+    """Wait for a Central Portal deployment to be validated (or published), recording the time spent in each state."""
+
+    def __init__(self, central_url, token, timeout=STATUS_TIMEOUT):
+        self.central_url = central_url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+        self.state = None
+        self.state_started_at = None
+        self.retry_after = None
+        self.last_response = None
+        self.timings = {}
+        self.requests = 0
+
+    def wait(self, deployment_id):
+        started_at = time.monotonic()
+        try:
+            state = polling.poll(lambda: self.check(deployment_id), step=FIRST_STEP, timeout=self.timeout,
+                                 step_function=self.next_step, ignore_exceptions=TRANSIENT_ERRORS)
+        finally:
+            self._record_state(None)
+            print(f"{self.requests} status requests in {time.monotonic() - started_at:.1f}s, time per state: "
+                  + ", ".join(f"{s} {seconds:.1f}s" for s, seconds in self.timings.items()), file=sys.stderr)
+        if state in FAILURE_STATES:
+            raise Exception(f"deployment {deployment_id} failed: {self.last_response}")
+        return state
+
+    def check(self, deployment_id):
+        """Return the final state of the deployment, or None while it is being processed."""
+        self.requests += 1
+        self.retry_after = None
+        try:
+            r = requests.post(f"{self.central_url}/api/v1/publisher/status", params={'id': deployment_id},
+                              headers={'Authorization': f"Bearer {self.token}"})
+            self.retry_after = retry_after_seconds(r.headers.get('Retry-After'))
+            self.last_response = r.text
+            if not r.ok:
+                print(f"Warning: status check failed with HTTP {r.status_code}: {r.text}", file=sys.stderr)
+                return None
+            state = r.json().get('deploymentState')
+        except TRANSIENT_ERRORS as e:
+            print(f"Warning: status check failed: {e}", file=sys.stderr)
+            raise
+        self._record_state(state)
+        if state in SUCCESS_STATES or state in FAILURE_STATES:
+            return state
+        return None
+
+    def next_step(self, step):
+        if self.retry_after is not None:
+            return self.retry_after
+        return min(step * BACKOFF, MAX_STEP.get(self.state, DEFAULT_MAX_STEP))
+
+    def _record_state(self, state):
+        if state == self.state:
+            return
+        now = time.monotonic()
+        if self.state is not None:
+            self.timings[self.state] = self.timings.get(self.state, 0) + now - self.state_started_at
+        if state is not None:
+            print(f"Deployment state: {state}", file=sys.stderr)
+        self.state, self.state_started_at = state, now
@@ -0,0 +1,62 @@
+import os
+import uuid
+
+# Maximum number of paths of one CloudFront invalidation
+INVALIDATION_MAX_PATHS = 3000
+# An invalidation usually completes within a few minutes: check every INVALIDATION_POLL_DELAY seconds, up to 30 minutes
+INVALIDATION_POLL_DELAY = 10
+INVALIDATION_POLL_MAX_ATTEMPTS = 180
+
+
+class InvalidationManager:
+    """Collect the CloudFront paths touched during a release and invalidate them at once.
+
+    Paths are collected per distribution with `add` and submitted by `submit`, as one invalidation per distribution
+    (split when above the CloudFront limit of paths), each with a unique caller reference so that a retried release
+    is not mistaken for the previous one. `submit` can wait for the invalidations to complete, so that a successful
+    release means the CDN serves the new content.
+    """
+
+    def __init__(self, cloudfront_client, reference_prefix="gh-action_release"):
+        self.cloudfront_client = cloudfront_client
+        self.reference_prefix = reference_prefix
+        # distribution ID -> paths, in the order they were added
+        self.paths = {}
+
+    def add(self, distribution_id, *paths):
+        distribution_paths = self.paths.setdefault(distribution_id, {})
+        for path in paths:
+            distribution_paths[path] = None
+
+    def submit(self, wait=False):
+        """Create the invalidations of the collected paths, and return their (distribution ID, invalidation ID)."""
+        invalidations = []
+        for distribution_id, paths in self.paths.items():
+            paths = list(paths)
+            for i in range(0, len(paths), INVALIDATION_MAX_PATHS):
+                batch = paths[i:i + INVALIDATION_MAX_PATHS]
+                response = self.cloudfront_client.create_invalidation(
+                    DistributionId=distribution_id,
+                    InvalidationBatch={
+                        'Paths': {'Quantity': len(batch), 'Items': batch},
+                        'CallerReference': f"{self.reference_prefix}-{uuid.uuid4()}"
+                    }
+                )
+                print(f"CloudFront invalidation: {response['Location']}")
+                invalidations.append((distribution_id, response['Invalidation']['Id']))
+        self.paths = {}
+        if wait and invalidations:
+            self.wait(invalidations)
+        return invalidations
+
+    def wait(self, invalidations):
+        waiter = self.cloudfront_client.get_waiter('invalidation_completed')
+        for distribution_id, invalidation_id in invalidations:
+            print(f"waiting for CloudFront invalidation {invalidation_id} to complete")
+            waiter.wait(DistributionId=distribution_id, Id=invalidation_id,
+                        WaiterConfig={'Delay': INVALIDATION_POLL_DELAY, 'MaxAttempts': INVALIDATION_POLL_MAX_ATTEMPTS})
+            print(f"CloudFront invalidation {invalidation_id} completed")
+
+    @staticmethod
+    def is_wait_enabled():
+        return os.environ.get('INPUT_WAIT_FOR_INVALIDATION', 'false').lower() == "true"
@@ -32,6 +32,11 @@ It won't actually do anything having impacts, but will still report what would h
     def is_dry_run_enabled():
         return os.environ.get('INPUT_DRY_RUN', 'false').lower() == "true"
 
+    @staticmethod
+    def is_probe_enabled():
+        """The probe only reads from Repox and S3, it is only effective along with `dry_run=true`."""
+        return DryRunHelper.is_dry_run_enabled() and os.environ.get('INPUT_DRY_RUN_PROBE', 'false').lower() == "true"
+
     @classmethod
     def __print_disclaimer(cls):
         print(cls.disclaimer_message)
@@ -1,21 +1,84 @@
 import json
 import os
-import re
 import logging
+import time
 import requests
 
 from release.utils.dryrun import DryRunHelper
 from release.steps.ReleaseRequest import ReleaseRequest
+from release.utils.version import is_commit_sha, parse_version
 from dryable import Dryable
 
 
 ALLOWED_GITHUB_ACTIONS = set(['release', 'workflow_dispatch'])
 
+GITHUB_API_URL = 'https://api.github.com'
+GITHUB_API_TIMEOUT = 30
+# Attempts of a request throttled by the (primary or secondary) rate limit, waiting at most RATE_LIMIT_MAX_WAIT seconds
+RATE_LIMIT_ATTEMPTS = 4
+RATE_LIMIT_MAX_WAIT = 60
+
 
 class GitHubException(Exception):
     pass
 
 
+class GitHubApiClient:
+    """Read-only GitHub REST API client sharing one session (and its connections) between requests.
+
+    Responses are cached with their ETag: a request already made is revalidated with If-None-Match, and a
+    304 Not Modified does not count against the rate limit. Requests throttled by the rate limit are retried
+    after the delay given by GitHub (Retry-After or X-RateLimit-Reset), or with an exponential backoff.
+    """
+
+    def __init__(self, token):
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"token {token}"
+        self.session.headers['Accept'] = 'application/vnd.github+json'
+        # url -> (etag, json)
+        self.cache = {}
+
+    def get_json(self, path):
+        """Return the JSON of a GET on the API `path`, None if the request failed."""
+        url = f"{GITHUB_API_URL}{path}"
+        cached = self.cache.get(url)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        for attempt in range(1, RATE_LIMIT_ATTEMPTS + 1):
+            resp = self.session.get(url, headers=headers, timeout=GITHUB_API_TIMEOUT)
+            if not self.is_rate_limited(resp) or attempt == RATE_LIMIT_ATTEMPTS:
+                break
+            wait = self.rate_limit_wait(resp, attempt)
+            print(f"::warning::GitHub API rate limit reached, retrying {url} in {wait:.0f}s")
+            time.sleep(wait)
+        if resp.status_code == 304 and cached:
+            return cached[1]
+        if not resp.ok:
+            return None
+        body = resp.json()
+        etag = resp.headers.get('ETag')
+        if etag:
+            self.cache[url] = (etag, body)
+        return body
+
+    @staticmethod
+    def is_rate_limited(resp):
+        if resp.status_code == 429:
+            return True
+        # the secondary rate limit answers 403 with Retry-After, the primary one with no remaining requests
+        return resp.status_code == 403 and (
+            'Retry-After' in resp.headers or resp.headers.get('X-RateLimit-Remaining') == '0')
+
+    @staticmethod
+    def rate_limit_wait(resp, attempt):
+        if resp.headers.get('Retry-After', '').isdigit():
+            wait = int(resp.headers['Retry-After'])
+        elif resp.headers.get('X-RateLimit-Remaining') == '0' and resp.headers.get('X-RateLimit-Reset', '').isdigit():
+            wait = int(resp.headers['X-RateLimit-Reset']) - time.time()
+        else:
+            wait = 2 ** attempt
+        return min(max(wait, 1), RATE_LIMIT_MAX_WAIT)
+
+
 class GitHub:
     token: str
     event: {}
@@ -23,6 +86,7 @@ class GitHub:
 
     def __init__(self):
         self.token = os.environ.get('GITHUB_TOKEN')
+        self.api = GitHubApiClient(self.token)
         self.logger = logging.getLogger('gh-action')
         github_event = os.environ.get('GITHUB_EVENT_NAME')
         if github_event in ALLOWED_GITHUB_ACTIONS or DryRunHelper.is_dry_run_enabled():
@@ -32,7 +96,7 @@ class GitHub:
             raise GitHubException(f"The action was neither triggered on {ALLOWED_GITHUB_ACTIONS} events (is: '{github_event}'), neither with dry_run=true")
 
     def get_release_request(self) -> ReleaseRequest:
-        if DryRunHelper.is_dry_run_enabled():
+        if DryRunHelper.is_dry_run_enabled() and not DryRunHelper.is_probe_enabled():
             return self.__fake_release_request()
         else:
             repo = self._get_repository()["full_name"]
@@ -42,17 +106,10 @@ class GitHub:
             release = self._get_release()
             version = self.event['inputs']['version'] if release is None else release['tag_name']
 
-            # This is an explicit requirement for project SLVSCODE
+            # The tag pattern is an explicit requirement for project SLVSCODE
             # see https://sonarsource.atlassian.net/browse/BUILD-4915
-            version_pattern = re.compile(
-                r'^(?P<prefix>[a-zA-Z]+-)?'   # Optional ProjectName- prefix (required by sonar-scanner-azdo; see https://sonarsource.atlassian.net/browse/BUILD-5293)
-                r'\d+\.\d+\.\d+'              # Major.Minor.Patch version
-                r'(?:-M\d+)?'                 # Optional -Mx suffix
-                r'[-.+]'                       # Separator (+ is required by sonarlint-vscode; see https://sonarsource.atlassian.net/browse/BUILD-4915)
-                r'(?P<build>\d+)$'            # Build number in a captured group
-            )
-            version_match = version_pattern.match(version)
-            if version_match is None:
+            parsed_version = parse_version(version)
+            if parsed_version is None:
                 raise GitHubException(
                     'The tag must follow this pattern: [ProjectName-]Major.Minor.Patch[-Mx][.+]BuildNumber\n'
                     'Where:\n'
@@ -67,17 +124,16 @@ class GitHub:
                 branch_name = DEFAULT_BRANCH
             else:
                 branch_name = release['target_commitish']
-                if re.compile("^([a-f0-9]{40})$").match(branch_name):
+                if is_commit_sha(branch_name):
                     branch_name = DEFAULT_BRANCH
 
-            prefix = version_match.group("prefix")
-            if prefix:
+            if parsed_version.prefix:
                 # Required for sonar-scanner-azdo to support two artifacts in repox
                 # https://sonarsource.atlassian.net/browse/BUILD-5506
-                project = f'{project}-{prefix[:-1]}'
+                project = f'{project}-{parsed_version.prefix}'
 
             return ReleaseRequest(organisation, project,
-                                  version, version_match.group("build"),
+                                  version, parsed_version.build,
                                   branch_name, os.environ.get('GITHUB_SHA'))
 
     def __fake_release_request(self) -> ReleaseRequest:
@@ -86,8 +142,6 @@ class GitHub:
         organisation, project = repo.split("/")
         version = '?.?.?.????'
         branch_name = 'master'
-        if re.compile("^([a-f0-9]{40})$").match(branch_name):
-            branch_name = 'master'
         return ReleaseRequest(organisation, project,
                               version, "????",
                               branch_name, os.environ.get('GITHUB_SHA'))
@@ -120,12 +174,10 @@ class GitHub:
         tag = os.environ.get("INPUT_VERSION")
         if not tag:
             return None
+        # get_release_request and revoke_release both look the release up: the second lookup is revalidated
+        # with its ETag instead of being fetched again
         repo = self.event["repository"]["full_name"]
-        resp = requests.get(
-            f"https://api.github.com/repos/{repo}/releases/tags/{tag}",
-            headers={"Authorization": f"token {self.token}"},
-        )
-        return resp.json() if resp.ok else None
+        return self.api.get_json(f"/repos/{repo}/releases/tags/{tag}")
 
     def _get_repository(self) -> {}:
         return self.event["repository"]
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import mimetypes
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from release.utils.binaries import S3_MAX_WORKERS, delete_keys
+
+LATEST = "latest"
+# Content hashes of the files of latest, stored next to it: {"version": <version of latest>, "files": {path: sha256}}
+MANIFEST = "javadoc-manifest.json"
+
+
+class JavadocPublisher:
+    """Publish an extracted javadoc tree to `<destination>/<version>` and `<destination>/latest` (javadoc-publication).
+
+    The local tree is uploaded once. `latest` is then overwritten in place with server-side copies of the version
+    tree, so that it is never missing, and only the keys of `latest` that are not part of the new version are pruned.
+
+    Consecutive versions share most of their files: the content hashes of the tree are compared with the manifest of
+    the previous publication, and the unchanged files are copied server-side from the previous version instead of
+    being uploaded (they are already up-to-date in `latest`). The manifest is deleted before `latest` is changed and
+    written once it is complete: after a failed publication, the next one uploads and copies every file again.
+    """
+
+    def __init__(self, s3_client, bucket, destination, max_workers=S3_MAX_WORKERS):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.destination = destination.strip('/')
+        self.max_workers = max_workers
+
+    def publish(self, javadoc_dir, version):
+        timings = {}
+        start = time.monotonic()
+        files = {f: self.hash_file(os.path.join(javadoc_dir, f)) for f in self.list_local_files(javadoc_dir)}
+        if not files:
+            raise Exception(f"no javadoc files found in {javadoc_dir}")
+        manifest = self.read_manifest()
+        previous_files = manifest['files'] if manifest and manifest['version'] != version else {}
+        unchanged = [f for f, sha256 in files.items() if previous_files.get(f) == sha256]
+        changed = [f for f in files if previous_files.get(f) != files[f]]
+        version_prefix = f"{self.destination}/{version}"
+        latest_prefix = f"{self.destination}/{LATEST}"
+        timings['hash'] = time.monotonic() - start
+        print(f"{len(changed)} files changed since {manifest['version'] if previous_files else 'no previous version'}")
+
+        start = time.monotonic()
+        self._run(lambda f: self.upload(os.path.join(javadoc_dir, f), f"{version_prefix}/{f}"), changed)
+        timings['upload'] = time.monotonic() - start
+        print(f"uploaded {len(changed)} files to s3://{self.bucket}/{version_prefix}")
+
+        start = time.monotonic()
+        previous_prefix = f"{self.destination}/{manifest['version']}" if previous_files else None
+        self._run(lambda f: self.copy(f"{previous_prefix}/{f}", f"{version_prefix}/{f}"), unchanged)
+        if manifest:
+            # latest no longer matches the manifest until the publication completes
+            self.delete_manifest()
+        self._run(lambda f: self.copy(f"{version_prefix}/{f}", f"{latest_prefix}/{f}"), changed)
+        timings['copy'] = time.monotonic() - start
+        print(f"copied {len(unchanged)} unchanged files to s3://{self.bucket}/{version_prefix} "
+              f"and {len(changed)} files to s3://{self.bucket}/{latest_prefix}")
+
+        start = time.monotonic()
+        stale_keys = self.list_keys(latest_prefix) - {f"{latest_prefix}/{f}" for f in files}
+        delete_keys(self.s3_client, self.bucket, sorted(stale_keys))
+        self.write_manifest(version, files)
+        timings['prune'] = time.monotonic() - start
+        print(f"deleted {len(stale_keys)} stale files from s3://{self.bucket}/{latest_prefix}")
+
+        print("javadoc publication timings: " + ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in timings.items()))
+        return timings
+
+    @staticmethod
+    def hash_file(local_file):
+        with open(local_file, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+
+    def read_manifest(self):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=f"{self.destination}/{MANIFEST}")
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                # first publication with a manifest: every file is uploaded
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def write_manifest(self, version, files):
+        self.s3_client.put_object(Bucket=self.bucket, Key=f"{self.destination}/{MANIFEST}",
+                                  Body=json.dumps({"version": version, "files": files}).encode(),
+                                  ContentType='application/json')
+
+    def delete_manifest(self):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=f"{self.destination}/{MANIFEST}")
+
+    @staticmethod
+    def list_local_files(javadoc_dir):
+        """Paths of the files of the tree, relative to `javadoc_dir` and with "/" separators."""
+        files = []
+        for root, _, filenames in os.walk(javadoc_dir):
+            for filename in filenames:
+                files.append(os.path.relpath(os.path.join(root, filename), javadoc_dir).replace(os.sep, '/'))
+        return sorted(files)
+
+    def _run(self, action, files):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(action, files))
+
+    def upload(self, local_file, key):
+        # Served as is by the CDN: the content type must match the file, as `aws s3 cp` used to guess it
+        content_type = mimetypes.guess_type(local_file)[0] or 'binary/octet-stream'
+        self.s3_client.upload_file(local_file, self.bucket, key, ExtraArgs={'ContentType': content_type})
+
+    def copy(self, source_key, key):
+        # The metadata, and so the content type, is copied along with the object
+        self.s3_client.copy_object(Bucket=self.bucket, Key=key, CopySource={'Bucket': self.bucket, 'Key': source_key})
+
+    def list_keys(self, prefix):
+        keys = set()
+        for page in self.s3_client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=f"{prefix}/"):
+            keys.update(o['Key'] for o in page.get('Contents', []))
+        return keys
+
@@ -0,0 +1,73 @@
+import re
+from functools import lru_cache
+from importlib import resources
+from xml.sax.saxutils import quoteattr
+
+from botocore.exceptions import ClientError
+
+from release import resources as file_resources
+
+COMPOSITE_FILES = ['compositeContent.xml', 'compositeArtifacts.xml']
+# Number of releases listed by the composite update site after the pinned children of the template
+P2_SITE_RELEASES = 1
+
+TIMESTAMP_PATTERN = re.compile(r'(<property name="p2.timestamp" value=")[^"]*(")')
+# The last child of the template is the slot of the released versions, the children before it are pinned
+CHILDREN_PATTERN = re.compile(r'<children size="\d+">(.*)(\n[ \t]*)<child location="[^"]*"/>(\s*</children>)', re.DOTALL)
+CHILD_LOCATION_PATTERN = re.compile(r'<child location="([^"]*)"/>')
+
+
+class CompositeTemplate:
+    """A composite P2 repository file, split once around its timestamp and released children.
+
+    Rendering only joins the static parts of the template with the timestamp and the child locations: no DOM is built,
+    and the comments and layout of the template are kept as they are.
+    """
+
+    def __init__(self, text):
+        timestamp = TIMESTAMP_PATTERN.search(text)
+        children = CHILDREN_PATTERN.search(text, timestamp.end()) if timestamp else None
+        if children is None:
+            raise Exception("Composite template without p2.timestamp property or children")
+        self.pinned = CHILD_LOCATION_PATTERN.findall(children.group(1))
+        self.head = text[:timestamp.end(1)]
+        self.middle = text[timestamp.start(2):children.start()]
+        self.pinned_children = children.group(1)
+        self.indent = children.group(2)
+        self.tail = text[children.start(3):]
+
+    def render(self, timestamp, locations):
+        """Render the template with the given p2.timestamp and released child locations, as UTF-8 bytes."""
+        parts = [self.head, timestamp, self.middle,
+                 f'<children size="{len(self.pinned) + len(locations)}">', self.pinned_children]
+        for location in locations:
+            parts += [self.indent, f'<child location={quoteattr(location)}/>']
+        parts.append(self.tail)
+        return "".join(parts).encode('utf-8')
+
+    def released_children(self, text):
+        """The released child locations listed by a rendered composite file."""
+        return [location for location in CHILD_LOCATION_PATTERN.findall(text) if location not in self.pinned]
+
+
+@lru_cache(maxsize=None)
+def composite_template(composite_file):
+    return CompositeTemplate(resources.files(file_resources).joinpath(composite_file).read_text(encoding='utf-8'))
+
+
+def rolling_children(previous, location, keep=P2_SITE_RELEASES):
+    """The `keep` most recent released child locations once `location` is released."""
+    children = [child for child in previous if child != location]
+    children.append(location)
+    return children[-keep:]
+
+
+def read_composite(s3_client, bucket, key):
+    """The current content of a composite file of the update site, None if it was never published."""
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+    return response['Body'].read().decode('utf-8')
@@ -0,0 +1,94 @@
+from release.utils.artifactory import Artifactory
+from release.utils.binaries import Binaries
+from release.utils.profiles import profile_for
+from release.utils.release import parse_artifact, set_output
+
+# Amount of data read from the largest artifact to measure the Repox download throughput.
+PROBE_SAMPLE_BYTES = 16 * 1024 * 1024
+
+
+class ArtifactProbe:
+    def __init__(self, artifact_to_publish, url, size, sbom_filename, destination_keys):
+        self.artifact_to_publish = artifact_to_publish
+        self.url = url
+        self.size = size
+        self.sbom_filename = sbom_filename
+        self.destination_keys = destination_keys
+
+    def is_missing(self):
+        return self.size is None
+
+
+class ReleaseProbe:
+    """Measure what a release would transfer, without any write (used by `dry_run_probe`).
+
+    The build is not promoted during a dry run, so artifacts are looked up in the builds repository
+    they currently live in. Every artifact is HEADed on Repox to get its size, its binaries
+    destination is listed on S3 (when publishing to binaries), and a bounded sample of the largest
+    artifact is read to measure the throughput of this runner.
+    """
+
+    def __init__(self, artifactory: Artifactory, binaries: Binaries = None, sample_bytes=PROBE_SAMPLE_BYTES):
+        self.artifactory = artifactory
+        self.binaries = binaries
+        self.sample_bytes = sample_bytes
+
+    def run(self, release_request, buildinfo):
+        print(f"probing artifacts for {release_request.project}#{release_request.buildnumber}")
+        repo = buildinfo.get_property('buildInfo.env.ARTIFACTORY_DEPLOY_REPO')
+        allartifacts = buildinfo.get_artifacts_to_publish()
+        if not repo or not allartifacts:
+            print("::warning::nothing to probe: ARTIFACTORY_DEPLOY_REPO or the artifacts to publish are not defined")
+            return []
+        repo = repo.replace('qa', 'builds')
+        version = buildinfo.get_version()
+        artifacts = allartifacts.split(",")
+        self.artifactory.index_sbom_filenames(repo, [parse_artifact(a)[:2] for a in artifacts], version)
+        probes = [self.probe_artifact(artifact, repo, version) for artifact in artifacts]
+        self.report(probes)
+        return probes
+
+    def probe_artifact(self, artifact_to_publish, repo, version):
+        gid, aid, ext, qual = parse_artifact(artifact_to_publish)
+        url = self.artifactory.artifact_url(repo, gid, aid, qual, ext, version)
+        size = self.artifactory.head_artifact(repo, gid, aid, qual, ext, version)
+        sbom_filename = self.artifactory.find_sbom_filename(repo, gid, aid, version)
+        destination_keys = None
+        if self.binaries is not None:
+            profile = profile_for(gid, aid)
+            filename, s3_aid = profile.binaries_filename(aid, version, ext, qual)
+            destination_keys = self.binaries.list_destination(filename, gid, s3_aid, version, qual, profile=profile)
+        return ArtifactProbe(artifact_to_publish, url, size, sbom_filename, destination_keys)
+
+    def measure_throughput(self, probes):
+        available = [p for p in probes if not p.is_missing() and p.size > 0]
+        if not available:
+            return None
+        largest = max(available, key=lambda p: p.size)
+        return self.artifactory.measure_download_throughput(largest.url, min(largest.size, self.sample_bytes))
+
+    def report(self, probes):
+        for probe in probes:
+            if probe.is_missing():
+                print(f"::warning::{probe.artifact_to_publish} is missing on Repox ({probe.url})")
+                continue
+            print(f"{probe.artifact_to_publish}: {probe.size} bytes, "
+                  f"SBOM: {probe.sbom_filename or 'none'}")
+            if probe.destination_keys:
+                print(f"  would overwrite {len(probe.destination_keys)} object(s) on binaries: {probe.destination_keys}")
+
+        missing = [p.artifact_to_publish for p in probes if p.is_missing()]
+        total_bytes = sum(p.size for p in probes if not p.is_missing())
+        print(f"{len(probes)} artifacts, {len(missing)} missing, {total_bytes} bytes to transfer")
+        set_output("probe_total_bytes", total_bytes)
+        set_output("probe_missing_artifacts", ",".join(missing))
+
+        throughput = self.measure_throughput(probes)
+        if not throughput:
+            print("could not measure the download throughput")
+            return
+        # The upload throughput to S3 cannot be measured without writing: it is assumed to match the download one.
+        estimated_seconds = round(2 * total_bytes / throughput)
+        print(f"measured download throughput: {throughput / (1024 * 1024):.1f} MB/s, "
+              f"estimated transfer time: {estimated_seconds}s (download + upload)")
+        set_output("probe_estimated_seconds", estimated_seconds)
@@ -0,0 +1,80 @@
+import json
+from functools import lru_cache
+from importlib import resources
+
+from release import resources as file_resources
+
+PROFILES = "profiles.json"
+# Files at the root of the product folder
+FLAT = "flat"
+# Qualified files in <version>/<platform> folders
+PLATFORM = "platform"
+LAYOUTS = (FLAT, PLATFORM)
+# Unzip the artifact, an Eclipse update site, in the version folder
+ECLIPSE_UPDATE_SITE = "eclipse_update_site"
+# Add the version folder to the P2 composite update site of the product
+P2_COMPOSITE = "p2_composite"
+HOOKS = (ECLIPSE_UPDATE_SITE, P2_COMPOSITE)
+# Group ID of the profiles matching an artifact ID whatever its group
+ANY_GROUP = "*"
+
+
+class PublishingProfile:
+    """How the artifacts of a product are published on binaries: their folder (`root`, formatted with the binaries
+    repo and the artifact ID) and layout, their name, the checksums uploaded next to them, the hooks run once they are
+    uploaded and the CloudFront paths invalidated when their P2 composite site is updated.
+
+    Profiles are declared in resources/profiles.json for a group ID and an artifact ID, or for an artifact ID of any
+    group with the "*" group ID: the artifacts of the products without a profile are published with the default one.
+    """
+
+    def __init__(self, root, layout, checksums, hooks, invalidations, delete_version_folder, s3_aid=None,
+                 filename=None, description=None):
+        if layout not in LAYOUTS:
+            raise Exception(f"unknown layout {layout}, expected one of {', '.join(LAYOUTS)}")
+        unknown_hooks = [hook for hook in hooks if hook not in HOOKS]
+        if unknown_hooks:
+            raise Exception(f"unknown hooks {', '.join(unknown_hooks)}, expected {', '.join(HOOKS)}")
+        self.root = root
+        self.layout = layout
+        self.checksums = checksums
+        self.hooks = hooks
+        self.invalidations = invalidations
+        self.delete_version_folder = delete_version_folder
+        self.s3_aid = s3_aid
+        self.filename = filename
+        self.description = description
+
+    def binaries_filename(self, aid, version, ext, qual):
+        """Return the filename and artifact ID used on binaries for an artifact."""
+        if self.filename:
+            return self.filename.format(aid=aid, version=version, ext=ext, qual=qual), self.s3_aid or aid
+        if qual:
+            return f"{aid}-{version}-{qual}.{ext}", self.s3_aid or aid
+        return f"{aid}-{version}.{ext}", self.s3_aid or aid
+
+    def root_bucket_key(self, binaries_repo, aid):
+        return self.root.format(repo=binaries_repo, aid=aid)
+
+    def is_hierarchical(self, qual):
+        return bool(qual) and self.layout == PLATFORM
+
+
+@lru_cache(maxsize=None)
+def registry():
+    """The default profile and the profiles indexed by (gid, aid), loaded once. `gid` may be ANY_GROUP."""
+    declared = json.loads(resources.files(file_resources).joinpath(PROFILES).read_text(encoding='utf-8'))
+    defaults = declared['default']
+    profiles = {}
+    for profile in declared['profiles']:
+        key = (profile.pop('gid'), profile.pop('aid'))
+        if key in profiles:
+            raise Exception(f"duplicate publishing profile for {':'.join(key)}")
+        profiles[key] = PublishingProfile(**{**defaults, **profile})
+    return PublishingProfile(**defaults), profiles
+
+
+def profile_for(gid, aid):
+    """The profile of the artifact `aid` of the group `gid`, else of `aid` in any group, else the default one."""
+    default, profiles = registry()
+    return profiles.get((gid, aid)) or profiles.get((ANY_GROUP, aid), default)
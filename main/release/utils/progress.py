@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+MB = 1024 * 1024
+# Seconds between two progress lines of a transfer
+PROGRESS_INTERVAL = 10
+
+
+class Transfer:
+    def __init__(self, name, direction, total, started_at):
+        self.name = name
+        self.direction = direction
+        self.total = total
+        self.done = 0
+        self.started_at = started_at
+        self.finished_at = None
+        self.reported_at = started_at
+
+    def seconds(self, now):
+        return max((self.finished_at or now) - self.started_at, 1e-9)
+
+
+class TransferProgress:
+    """Report the progress of the downloads from Repox and the uploads to S3 in the action log.
+
+    A transfer prints a line with the bytes done, its throughput and ETA at most every `interval` seconds (nothing
+    for short transfers), along with the aggregated throughput when several transfers run concurrently. `report`
+    prints the throughput of every finished transfer, to tell a slow runner from a slow Repox or S3.
+    Thread-safe: the transfer manager reports uploads from the transfer threads of boto3.
+    """
+
+    def __init__(self, interval=PROGRESS_INTERVAL, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.transfers = []
+
+    def start(self, name, direction, total=None):
+        with self.lock:
+            transfer = Transfer(name, direction, total, self.clock())
+            self.transfers.append(transfer)
+            return transfer
+
+    def update(self, transfer, amount):
+        with self.lock:
+            transfer.done += amount
+            now = self.clock()
+            if now - transfer.reported_at < self.interval:
+                return
+            transfer.reported_at = now
+            line = self._progress_line(transfer, now)
+            active = [t for t in self.transfers if t.finished_at is None]
+            if len(active) > 1:
+                total_done = sum(t.done for t in active)
+                first_start = min(t.started_at for t in active)
+                line += (f" | {len(active)} transfers: {total_done / MB:.1f} MB, "
+                         f"{total_done / MB / max(now - first_start, 1e-9):.1f} MB/s")
+        print(line)
+
+    def finish(self, transfer):
+        with self.lock:
+            transfer.finished_at = self.clock()
+
+    @staticmethod
+    def _progress_line(transfer, now):
+        seconds = transfer.seconds(now)
+        throughput = transfer.done / seconds
+        line = f"{transfer.direction} {transfer.name}: {transfer.done / MB:.1f}"
+        if transfer.total:
+            line += f"/{transfer.total / MB:.1f} MB ({transfer.done * 100 // transfer.total}%)"
+        else:
+            line += " MB"
+        line += f", {throughput / MB:.1f} MB/s"
+        if transfer.total and throughput > 0:
+            line += f", ETA {(transfer.total - transfer.done) / throughput:.0f}s"
+        return line
+
+    def report(self):
+        """Print the throughput of the finished transfers and forget them."""
+        with self.lock:
+            finished = [t for t in self.transfers if t.finished_at is not None]
+            self.transfers = [t for t in self.transfers if t.finished_at is None]
+        if not finished:
+            return
+        width = max(len(t.name) for t in finished)
+        print(f"{'transfer':<{width}} {'direction':>9} {'MB':>9} {'seconds':>8} {'MB/s':>8}")
+        for t in finished:
+            seconds = t.seconds(t.finished_at)
+            print(f"{t.name:<{width}} {t.direction:>9} {t.done / MB:>9.1f} {seconds:>8.1f} {t.done / MB / seconds:>8.1f}")
+
+
+def file_size(path):
+    """Size of a local file, None if it cannot be read (the progress is then reported without ETA)."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+transfer_progress = TransferProgress()
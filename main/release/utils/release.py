@@ -1,33 +1,58 @@
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 from dryable import Dryable
 
 from release.steps import ReleaseRequest
 from release.utils.artifactory import Artifactory
 from release.utils.binaries import Binaries
+from release.utils.cloudfront import InvalidationManager
+from release.utils.profiles import profile_for
+from release.utils.progress import transfer_progress
+from release.utils.sbom import compress_sbom, is_compression_enabled
+from release.utils.slack import notify_progress
 
 REVOKE = True
+# Artifacts deleted concurrently from binaries when a release is revoked
+REVOKE_MAX_WORKERS = 8
 
 # Checksums uploaded next to the SBOM on binaries.sonarsource.com. md5/sha1/sha256 are served
 # virtually by Artifactory for any artifact; the GPG signature (.asc) is fetched best-effort since
 # not every product signs its SBOM.
 SBOM_REQUIRED_CHECKSUMS = ["md5", "sha1", "sha256"]
 SBOM_OPTIONAL_CHECKSUMS = ["asc"]
+# SBOMs published concurrently with the binaries, see SbomStage
+SBOM_MAX_WORKERS = 4
+SBOM_PUBLISHED = "published"
+SBOM_MISSING = "no SBOM"
+SBOM_FAILED = "failed"
 
 
 def revoke_release(artifactory: Artifactory, binaries, release_request: ReleaseRequest):
+    """Unpromote the build and delete its artifacts from binaries, concurrently: a revoke runs when a release is
+    already failing, and the deletion from binaries does not depend on the promotion status in Artifactory."""
     buildinfo = artifactory.receive_build_info(release_request)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        unpromotion = executor.submit(artifactory.promote, release_request, buildinfo, True)
+        deletion = None
+        if binaries is not None:
+            deletion = executor.submit(publish_all_artifacts_to_binaries, artifactory, binaries, release_request,
+                                       buildinfo, REVOKE)
+    errors = []
     try:
-        artifactory.promote(release_request, buildinfo, True)
+        unpromotion.result()
     except Exception as e:
         print(f"Error could not unpromote {release_request.project} {release_request.buildnumber} {str(e)}")
-        raise e
+        errors.append(e)
     try:
-        if binaries is not None:
-            publish_all_artifacts_to_binaries(artifactory, binaries, release_request, buildinfo, REVOKE)
+        if deletion is not None:
+            deletion.result()
     except Exception as e:
         print(f"Error could not delete {release_request.project} {release_request.buildnumber} {str(e)}")
-        raise e
+        errors.append(e)
+    if errors:
+        raise errors[0]
 
 
 def get_action(revoke):
@@ -48,40 +73,88 @@ def publish_all_artifacts_to_binaries(artifactory, binaries, release_request, bu
         artifacts = allartifacts.split(",")
         artifacts_count = len(artifacts)
         print(f"{artifacts_count} artifacts")
-        for i in range(0, artifacts_count):
-            print(f"artifact {artifacts[i]}")
-            publish_artifact(artifactory, binaries, artifacts[i], version, repo, revoke)
-
-
-def publish_artifact(artifactory, binaries, artifact_to_publish, version, repo, revoke=False):
-    print(f"{get_action(revoke)} {artifact_to_publish}#{version}")
+        if revoke:
+            revoke_artifacts(artifactory, binaries, artifacts, version, repo)
+            return
+        try:
+            artifactory.index_sbom_filenames(repo.replace('builds', 'releases'),
+                                             [parse_artifact(a)[:2] for a in artifacts], version)
+        except Exception as e:
+            # SBOM publishing is best-effort: find_sbom_filename lists the version folders one by one instead
+            print(f"::warning::could not index the SBOMs ({e}), listing version folders instead")
+        sbom_stage = SbomStage(artifactory, binaries)
+        try:
+            for i in range(0, artifacts_count):
+                print(f"artifact {artifacts[i]}")
+                notify_progress("publish", f"{i}/{artifacts_count} artifacts, publishing {artifacts[i]}")
+                publish_artifact(artifactory, binaries, artifacts[i], version, repo, sbom_stage=sbom_stage)
+        except Exception:
+            # the SBOMs being uploaded would outlive the revoke of their binaries (see abort_release)
+            sbom_stage.cancel()
+            raise
+        notify_progress("publish", f"{artifacts_count}/{artifacts_count} artifacts")
+        sbom_stage.finish()
+        transfer_progress.report()
+        binaries.invalidations.submit(wait=InvalidationManager.is_wait_enabled())
+
+
+def revoke_artifacts(artifactory, binaries, artifacts, version, repo):
+    """Delete the artifacts from binaries over a bounded pool and report the removed objects.
+
+    A failing artifact does not stop the deletion of the others: the failures are raised once every artifact is done.
+    """
+    def revoke_artifact(artifact):
+        print(f"artifact {artifact}")
+        return publish_artifact(artifactory, binaries, artifact, version, repo, REVOKE)
+
+    with ThreadPoolExecutor(max_workers=min(REVOKE_MAX_WORKERS, len(artifacts))) as executor:
+        futures = {artifact: executor.submit(revoke_artifact, artifact) for artifact in artifacts}
+    removed = []
+    failures = []
+    for artifact, future in futures.items():
+        try:
+            removed += future.result()
+        except Exception as e:
+            failures.append(f"{artifact}: {e}")
+    print(f"removed {len(removed)} objects from binaries")
+    for bucket_key in removed:
+        print(f"  {bucket_key}")
+    if failures:
+        raise Exception(f"could not delete {len(failures)} artifacts from binaries: {'; '.join(failures)}")
+    return removed
+
+
+def parse_artifact(artifact_to_publish):
+    """Split an artifact to publish ("gid:aid:ext[:qual]") into its gid, aid, ext and qual ('' when absent)."""
     artifact = artifact_to_publish.split(":")
-    gid = artifact[0]
-    aid = artifact[1]
-    ext = artifact[2]
     qual = ''
     if len(artifact) > 3:
         qual = artifact[3]
+    return artifact[0], artifact[1], artifact[2], qual
+
+
+def publish_artifact(artifactory, binaries, artifact_to_publish, version, repo, revoke=False, sbom_stage=None):
+    """Publish (or revoke) an artifact on binaries. Its SBOM is then published in the background by `sbom_stage`, or
+    right away without one."""
+    print(f"{get_action(revoke)} {artifact_to_publish}#{version}")
+    gid, aid, ext, qual = parse_artifact(artifact_to_publish)
     artifactory_repo = repo.replace('builds', 'releases')
     print(f"{gid} {aid} {ext} {qual}")
 
-    filename = f"{aid}-{version}.{ext}"
-    if qual:
-        filename = f"{aid}-{version}-{qual}.{ext}"
-
-    if aid == "sonar-application":
-        filename = f"sonarqube-{version}.zip"
-        s3_aid = "sonarqube"
-    else:
-        s3_aid = aid
+    profile = profile_for(gid, aid)
+    filename, s3_aid = profile.binaries_filename(aid, version, ext, qual)
 
     if revoke:
-        binaries.s3_delete(filename, gid, s3_aid, version, qual)
-        binaries.s3_delete_sbom(Binaries.sbom_filename_for(filename), gid, s3_aid, version, qual)
+        return [*binaries.s3_delete(filename, gid, s3_aid, version, qual, profile=profile),
+                *binaries.s3_delete_sbom(Binaries.sbom_filename_for(filename), gid, s3_aid, version, qual,
+                                         profile=profile)]
     else:
-        artifact_file = artifactory.download(artifactory_repo, gid, aid, qual, ext, version, Binaries.get_actual_checksums(aid))
-        binaries.s3_upload(artifact_file, filename, gid, s3_aid, version, qual)
-        publish_sbom(artifactory, binaries, artifactory_repo, gid, aid, s3_aid, version, qual, filename)
+        artifact_file = artifactory.download(artifactory_repo, gid, aid, qual, ext, version, profile.checksums)
+        binaries.s3_upload(artifact_file, filename, gid, s3_aid, version, qual, profile=profile)
+        if sbom_stage is None:
+            publish_sbom(artifactory, binaries, artifactory_repo, gid, aid, s3_aid, version, qual, filename)
+        else:
+            sbom_stage.submit(artifactory_repo, gid, aid, s3_aid, version, qual, filename)
 
 
 def publish_sbom(artifactory, binaries, artifactory_repo, gid, aid, s3_aid, version, qual, binary_filename):
@@ -91,21 +164,72 @@ def publish_sbom(artifactory, binaries, artifactory_repo, gid, aid, s3_aid, vers
     not publish one, the step is skipped without failing the release. SBOM publishing is
     best-effort: any error (download, checksum, S3) is logged and swallowed so it cannot abort an
     already-published binary release (the binary is uploaded before this step runs).
+
+    Return SBOM_PUBLISHED, SBOM_MISSING or SBOM_FAILED.
     """
     try:
         sbom_repox_filename = artifactory.find_sbom_filename(artifactory_repo, gid, aid, version)
         if not sbom_repox_filename:
             print(f"no SBOM found for {gid}:{aid}:{version} - skipping SBOM upload")
-            return
-        sbom_file, optional_checksums = artifactory.download_named(
-            artifactory_repo, gid, aid, version, sbom_repox_filename,
-            checksums=SBOM_REQUIRED_CHECKSUMS, optional_checksums=SBOM_OPTIONAL_CHECKSUMS)
-        sbom_s3_filename = Binaries.sbom_filename_for(binary_filename)
-        binaries.s3_upload_sbom(sbom_file, sbom_s3_filename, gid, s3_aid, version, qual,
-                                checksums=SBOM_REQUIRED_CHECKSUMS + optional_checksums)
+            notify_progress("sbom", f"{aid}: {SBOM_MISSING}")
+            return SBOM_MISSING
+        # the SBOM, its checksums and its compressed copy are removed once uploaded
+        with tempfile.TemporaryDirectory(prefix="sbom-") as directory:
+            sbom_file, optional_checksums = artifactory.download_named(
+                artifactory_repo, gid, aid, version, sbom_repox_filename, directory,
+                checksums=SBOM_REQUIRED_CHECKSUMS, optional_checksums=SBOM_OPTIONAL_CHECKSUMS)
+            compressed = compress_sbom(sbom_file, SBOM_REQUIRED_CHECKSUMS) if is_compression_enabled() else None
+            extra_args = None
+            if compressed is not None:
+                # the signature of the original SBOM does not match the compressed one
+                (sbom_file, extra_args), optional_checksums = compressed, []
+            sbom_s3_filename = Binaries.sbom_filename_for(binary_filename)
+            binaries.s3_upload_sbom(sbom_file, sbom_s3_filename, gid, s3_aid, version, qual,
+                                    checksums=SBOM_REQUIRED_CHECKSUMS + optional_checksums, extra_args=extra_args,
+                                    profile=profile_for(gid, aid))
+        notify_progress("sbom", f"{aid}: {SBOM_PUBLISHED}")
+        return SBOM_PUBLISHED
     except Exception as e:
         print(f"::warning::SBOM publishing failed for {gid}:{aid}:{version} - "
               f"continuing release: {e}")
+        notify_progress("sbom", f"{aid}: {SBOM_FAILED}")
+        return SBOM_FAILED
+
+
+class SbomStage:
+    """Publish the SBOMs of the artifacts in the background, overlapping with the upload of the next binaries.
+
+    An SBOM is submitted once its binary is published. `finish` waits for every SBOM and prints one summary of the
+    results: as `publish_sbom` is best-effort, a failing SBOM never fails the release.
+    """
+
+    def __init__(self, artifactory, binaries, max_workers=SBOM_MAX_WORKERS):
+        self.artifactory = artifactory
+        self.binaries = binaries
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # binary filename -> future result of publish_sbom
+        self.results = {}
+
+    def submit(self, artifactory_repo, gid, aid, s3_aid, version, qual, binary_filename):
+        self.results[binary_filename] = self.executor.submit(publish_sbom, self.artifactory, self.binaries,
+                                                             artifactory_repo, gid, aid, s3_aid, version, qual,
+                                                             binary_filename)
+
+    def cancel(self):
+        """Drop the SBOMs not started yet and wait for the ones being published."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def finish(self):
+        """Wait for every SBOM, print the summary and return the result of each binary filename."""
+        self.executor.shutdown(wait=True)
+        results = {filename: future.result() for filename, future in self.results.items()}
+        statuses = list(results.values())
+        print(f"SBOMs of {len(statuses)} artifacts: {statuses.count(SBOM_PUBLISHED)} published, "
+              f"{statuses.count(SBOM_MISSING)} missing, {statuses.count(SBOM_FAILED)} failed")
+        failed = [filename for filename, status in results.items() if status == SBOM_FAILED]
+        if failed:
+            print(f"::warning::SBOM publishing failed for {', '.join(failed)}")
+        return results
 
 
 def set_output(output_name, value):
@@ -0,0 +1,42 @@
+import gzip
+import hashlib
+import json
+import os
+
+# Extension of the compressed SBOM written next to the downloaded one
+COMPRESSED_EXTENSION = "gz"
+CONTENT_TYPE = "application/json"
+
+
+def is_compression_enabled():
+    return os.environ.get('INPUT_COMPRESS_SBOM', 'false').lower() == "true"
+
+
+def compress_sbom(sbom_file, checksums):
+    """Write a JSON SBOM minified and gzipped to a new file, along with its `checksums`, and return the file and the
+    S3 arguments of its upload (Content-Encoding: gzip). Return None for the other SBOMs, published unchanged.
+
+    The checksums are those of the minified JSON, i.e. the file saved by the HTTP clients decoding the gzip
+    Content-Encoding, not those of the gzip bytes stored on S3. A GPG signature cannot be kept, as it signs the
+    original document.
+
+    The downloaded SBOM is never modified: it may be a hard link to the artifact cache.
+    """
+    with open(sbom_file, 'rb') as f:
+        content = f.read()
+    try:
+        content = json.dumps(json.loads(content), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    except ValueError:
+        # e.g. a CycloneDX XML document: the SBOMs are served under a .json name, only JSON ones are compressed
+        print(f"{sbom_file} is not a JSON SBOM, it is not compressed")
+        return None
+    compressed_file = f"{sbom_file}.{COMPRESSED_EXTENSION}"
+    with open(compressed_file, 'wb') as f:
+        # no file name nor timestamp in the header: the same SBOM always compresses to the same bytes
+        f.write(gzip.compress(content, mtime=0))
+    for checksum in checksums:
+        with open(f"{compressed_file}.{checksum}", 'w') as f:
+            f.write(hashlib.new(checksum, content).hexdigest())
+    print(f"compressed {sbom_file} from {os.path.getsize(sbom_file)} to {os.path.getsize(compressed_file)} bytes")
+    return compressed_file, {'ContentEncoding': 'gzip', 'ContentType': CONTENT_TYPE}
+
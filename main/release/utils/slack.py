@@ -1,14 +1,126 @@
+import atexit
+import threading
+from collections import deque
+
 from dryable import Dryable
 from release.vars import slack_channel, slack_client
 from slack_sdk.errors import SlackApiError
 
+# Seconds given to the pending notifications to be sent when the process exits
+SLACK_FLUSH_TIMEOUT = 10
+# Messages waiting to be sent: the oldest ones are dropped beyond, e.g. while Slack is unreachable
+SLACK_MAX_PENDING_MESSAGES = 100
 
-@Dryable(logging_msg='{function}({args}{kwargs})')
-def notify_slack(msg):
-    if slack_channel is not None:
+
+class SlackNotifier:
+    """Send Slack notifications from a background thread, so that Slack latency stays off the release (and rollback) path.
+
+    Progress updates of the release phases are gathered in a single message, edited in place: only the latest pending
+    progress is sent, however many updates happened while Slack was busy, so that their number does not depend on the
+    number of artifacts. Messages (e.g. the outcome of the release) are sent before any pending progress: at most
+    `max_pending_messages` of them wait to be sent, the oldest are dropped beyond. The pending notifications are sent
+    when the process exits, for at most `flush_timeout` seconds. The notifications dropped or not sent are counted in the
+    log.
+    """
+
+    def __init__(self, client, channel, flush_timeout=SLACK_FLUSH_TIMEOUT,
+                 max_pending_messages=SLACK_MAX_PENDING_MESSAGES):
+        self.client = client
+        self.channel = channel
+        self.flush_timeout = flush_timeout
+        self.condition = threading.Condition()
+        self.messages = deque(maxlen=max_pending_messages)
+        self.dropped_messages = 0
+        self.pending_progress = None
+        self.stopping = False
+        self.thread = None
+        # phase -> status, in the order the phases started
+        self.phases = {}
+        # channel ID and timestamp of the progress message, once posted
+        self.progress_message = None
+
+    def notify(self, msg):
+        if self.channel is None:
+            return
+        with self.condition:
+            if len(self.messages) == self.messages.maxlen:
+                self.dropped_messages += 1
+            self.messages.append(msg)
+            self._start()
+
+    def progress(self, phase, status):
+        if self.channel is None:
+            return
+        with self.condition:
+            self.phases[phase] = status
+            self.pending_progress = "\n".join(f"{p}: {s}" for p, s in self.phases.items())
+            self._start()
+
+    def _start(self):
+        """Wake the background thread up, starting it first if needed (the condition is held)."""
+        if self.thread is None:
+            self.stopping = False
+            self.thread = threading.Thread(target=self._run, name='slack-notifier', daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+        self.condition.notify()
+
+    def _next(self):
+        """The next notification to send, messages first, or None once stopping with nothing left to send."""
+        with self.condition:
+            while not self.messages and self.pending_progress is None and not self.stopping:
+                self.condition.wait()
+            if self.messages:
+                return 'post', self.messages.popleft()
+            if self.pending_progress is not None:
+                text, self.pending_progress = self.pending_progress, None
+                return 'progress', text
+            return None
+
+    def _run(self):
+        while notification := self._next():
+            self._send(*notification)
+
+    def _send(self, kind, text):
         try:
-            return slack_client.chat_postMessage(
-                channel=slack_channel,
-                text=msg)
+            if kind == 'progress' and self.progress_message is not None:
+                channel, ts = self.progress_message
+                self.client.chat_update(channel=channel, ts=ts, text=text)
+                return
+            response = self.client.chat_postMessage(channel=self.channel, text=text)
+            if kind == 'progress':
+                self.progress_message = (response['channel'], response['ts'])
         except SlackApiError as e:
             print(f"Could not notify slack: {e.response['error']}")
+        except Exception as e:
+            print(f"Could not notify slack: {e}")
+
+    def flush(self, timeout=None):
+        """Wait for the pending notifications to be sent and stop the background thread."""
+        with self.condition:
+            thread, self.thread = self.thread, None
+            self.stopping = True
+            self.condition.notify()
+        if thread is not None:
+            thread.join(timeout or self.flush_timeout)
+        with self.condition:
+            if self.dropped_messages:
+                print(f"Could not notify slack: {self.dropped_messages} messages were dropped, "
+                      f"more than {self.messages.maxlen} were waiting to be sent")
+                self.dropped_messages = 0
+            if thread is not None and thread.is_alive():
+                unsent = len(self.messages) + (self.pending_progress is not None)
+                print(f"Could not notify slack: {unsent} pending notifications were not sent in time")
+
+
+notifier = SlackNotifier(slack_client, slack_channel)
+
+
+@Dryable(logging_msg='{function}({args}{kwargs})')
+def notify_slack(msg):
+    notifier.notify(msg)
+
+
+@Dryable(logging_msg='{function}({args}{kwargs})')
+def notify_progress(phase, status):
+    notifier.progress(phase, status)
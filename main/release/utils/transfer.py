@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from boto3.s3.transfer import TransferConfig
+
+from release.utils.buffers import CHUNK_SIZE, BufferPool, response_chunks
+from release.utils.progress import MB, file_size, transfer_progress
+
+# Files transferred at once during a release, unless set by the max_transfers input
+MAX_TRANSFERS = 8
+# Size of the parts of the multipart uploads to S3
+S3_PART_SIZE = 16 * MB
+# Attempts of a download failing with a connection error or a server error, waiting RETRY_BACKOFF^attempt seconds
+TRANSFER_ATTEMPTS = 3
+RETRY_BACKOFF = 2
+
+
+class BandwidthLimiter:
+    """Cap the throughput of every transfer of the release to `bytes_per_second` bytes per second, in total.
+
+    Each transferred chunk reserves the time it takes at the cap, after the chunks reserved before it: `consume`
+    blocks until the end of the reservation. No cap when `bytes_per_second` is not set.
+    """
+
+    def __init__(self, bytes_per_second=None, clock=time.monotonic, sleep=time.sleep):
+        self.bytes_per_second = bytes_per_second
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.available_at = clock()
+
+    def consume(self, amount):
+        if not self.bytes_per_second:
+            return
+        with self.lock:
+            now = self.clock()
+            self.available_at = max(now, self.available_at) + amount / self.bytes_per_second
+            delay = self.available_at - now
+        if delay > 0:
+            self.sleep(delay)
+
+
+class RetryPolicy:
+    """Retry a transfer failing with a connection error or a server error, with an exponential backoff."""
+
+    def __init__(self, attempts=TRANSFER_ATTEMPTS, backoff=RETRY_BACKOFF, sleep=time.sleep):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.sleep = sleep
+
+    def run(self, description, function):
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return function()
+            except Exception as e:
+                if attempt == self.attempts or not RetryPolicy.is_retryable(e):
+                    raise
+                delay = self.backoff ** attempt
+                print(f"{description} failed ({e}), retrying in {delay}s ({attempt}/{self.attempts})")
+                self.sleep(delay)
+
+    @staticmethod
+    def is_retryable(error):
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code >= 500
+        return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+
+class TransferManager:
+    """Move every byte of a release: the downloads from Repox and the uploads to binaries.
+
+    The limits are shared by all the transfers, to be tuned in one place for the runner: at most `max_transfers`
+    files at once, `max_bandwidth` bytes per second in total, downloads read into a pool of buffers of `chunk_size`
+    bytes and retried by `retry`. The uploads are retried by botocore, the S3 client retrying each request of the transfer.
+    """
+
+    def __init__(self, max_transfers=MAX_TRANSFERS, max_bandwidth=None, chunk_size=CHUNK_SIZE, retry=None,
+                 progress=transfer_progress):
+        self.max_transfers = max_transfers
+        self.slots = threading.BoundedSemaphore(max_transfers)
+        self.limiter = BandwidthLimiter(max_bandwidth)
+        self.buffers = BufferPool(chunk_size, max_transfers)
+        self.retry = retry or RetryPolicy()
+        self.progress = progress
+        self.s3_config = TransferConfig(max_concurrency=max_transfers, multipart_chunksize=S3_PART_SIZE)
+
+    @property
+    def max_connections(self):
+        """Connections to S3 of the uploads at most: `max_transfers` uploads of `max_concurrency` parts each."""
+        return self.max_transfers * self.s3_config.max_concurrency
+
+    @staticmethod
+    def from_env():
+        max_transfers = int(os.environ.get('INPUT_MAX_TRANSFERS') or MAX_TRANSFERS)
+        max_bandwidth = float(os.environ.get('INPUT_MAX_BANDWIDTH') or 0) * MB
+        chunk_size = int(os.environ.get('INPUT_TRANSFER_CHUNK_SIZE') or CHUNK_SIZE // 1024) * 1024
+        return TransferManager(max_transfers, max_bandwidth or None, chunk_size)
+
+    def download(self, url, headers, local_file):
+        """Download `url` to `local_file`, reporting its progress."""
+        with self.slots:
+            self.retry.run(f"download {url}", lambda: self._download(url, headers, local_file))
+
+    def _download(self, url, headers, local_file):
+        with requests.get(url, headers=headers, stream=True) as r:
+            r.raise_for_status()
+            content_length = r.headers.get('Content-Length')
+            transfer = self.progress.start(os.path.basename(local_file), 'download',
+                                           int(content_length) if content_length else None)
+            try:
+                with open(local_file, 'wb') as f, self.buffers.buffer() as buffer:
+                    for chunk in response_chunks(r, buffer):
+                        f.write(chunk)
+                        self.progress.update(transfer, len(chunk))
+                        self.limiter.consume(len(chunk))
+            finally:
+                self.progress.finish(transfer)
+
+    def get(self, url, headers):
+        """GET a small file (e.g. a checksum) and return the response, retried on server errors."""
+        def get():
+            r = requests.get(url, headers=headers)
+            if r.status_code >= 500:
+                raise requests.HTTPError(f"{r.status_code} Server Error for url: {url}", response=r)
+            return r
+
+        with self.slots:
+            return self.retry.run(f"download {url}", get)
+
+    def upload(self, s3_client, local_file, bucket, key, report_progress=True, extra_args=None):
+        """Upload `local_file` to s3://`bucket`/`key`, reporting its progress unless `report_progress` is False.
+
+        `extra_args` are the S3 arguments of the upload, e.g. its ContentEncoding.
+        """
+        with self.slots:
+            transfer = None
+            if report_progress:
+                transfer = self.progress.start(os.path.basename(local_file), 'upload', file_size(local_file))
+
+            def callback(amount):
+                if transfer is not None:
+                    self.progress.update(transfer, amount)
+                self.limiter.consume(amount)
+
+            upload_args = {'ExtraArgs': extra_args} if extra_args else {}
+            try:
+                s3_client.upload_file(local_file, bucket, key, Callback=callback, Config=self.s3_config,
+                                      **upload_args)
+            finally:
+                if transfer is not None:
+                    self.progress.finish(transfer)
+
+
+@lru_cache(maxsize=None)
+def transfer_manager():
+    """The transfer manager of the release, built from the action inputs on first use."""
+    return TransferManager.from_env()
@@ -0,0 +1,71 @@
+import math
+import re
+from functools import lru_cache, total_ordering
+
+# Numbers are ASCII digits without leading zeros, so that a version is written in a single way
+NUMBER = r'(?:0|[1-9][0-9]*)'
+# [ProjectName-]Major.Minor.Patch[-Mx][.+-]BuildNumber
+VERSION_PATTERN = re.compile(
+    r'^(?:(?P<prefix>[a-zA-Z]+)-)?'   # Optional ProjectName- prefix (required by sonar-scanner-azdo; see https://sonarsource.atlassian.net/browse/BUILD-5293)
+    rf'(?P<major>{NUMBER})\.(?P<minor>{NUMBER})\.(?P<patch>{NUMBER})'  # Major.Minor.Patch version
+    rf'(?:-M(?P<milestone>{NUMBER}))?'  # Optional -Mx suffix
+    r'(?P<separator>[-.+])'           # Separator (+ is required by sonarlint-vscode; see https://sonarsource.atlassian.net/browse/BUILD-4915)
+    rf'(?P<build>{NUMBER})$'          # Build number
+)
+COMMIT_SHA_PATTERN = re.compile(r'^[a-f0-9]{40}$')
+
+
+@total_ordering
+class Version:
+    """Immutable, hashable release version, ordered by prefix, Major.Minor.Patch, milestone and build number.
+
+    A milestone comes before the final version: 10.0.0-M1.1 < 10.0.0.2.
+    The build number is kept as written in the tag (it names the build on Artifactory) and compared as a number.
+    """
+    __slots__ = ('prefix', 'major', 'minor', 'patch', 'milestone', 'separator', 'build')
+
+    def __init__(self, prefix, major, minor, patch, milestone, separator, build):
+        for name, value in zip(self.__slots__, (prefix, major, minor, patch, milestone, separator, build)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _key(self):
+        return (self.prefix or '', self.major, self.minor, self.patch,
+                math.inf if self.milestone is None else self.milestone, int(self.build))
+
+    def __eq__(self, other):
+        return isinstance(other, Version) and self._key() == other._key()
+
+    def __lt__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self._key() < other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __str__(self):
+        prefix = f"{self.prefix}-" if self.prefix else ''
+        milestone = f"-M{self.milestone}" if self.milestone is not None else ''
+        return f"{prefix}{self.major}.{self.minor}.{self.patch}{milestone}{self.separator}{self.build}"
+
+    def __repr__(self):
+        return f"Version('{self}')"
+
+
+@lru_cache(maxsize=256)
+def parse_version(tag):
+    """Parse a release tag, None if it does not follow [ProjectName-]Major.Minor.Patch[-Mx][.+-]BuildNumber."""
+    match = VERSION_PATTERN.match(tag)
+    if match is None:
+        return None
+    milestone = match.group('milestone')
+    return Version(match.group('prefix'), int(match.group('major')), int(match.group('minor')),
+                   int(match.group('patch')), int(milestone) if milestone is not None else None,
+                   match.group('separator'), match.group('build'))
+
+
+def is_commit_sha(ref):
+    return COMMIT_SHA_PATTERN.match(ref) is not None
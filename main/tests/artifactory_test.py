@@ -1,8 +1,13 @@
+import os
 import tempfile
-from unittest.mock import patch
+from unittest.mock import ANY, patch
+
+import requests
+import pytest
 from pytest import fixture
 
 from release.steps.ReleaseRequest import ReleaseRequest
+from release.utils.artifact_cache import ArtifactCache
 from release.utils.artifactory import Artifactory
 from release.utils.buildinfo import BuildInfo
 
@@ -46,11 +51,16 @@ class RepoxResponse:
         self.status_code = status_code
         self.text = "{ 'message' : 'done' }"
         self.ok = True
+        self.headers = {}
     def json(self):
         return {'message': 'done'}
     def raise_for_status(self):
         if self.status_code >= 400:
             raise Exception(f"HTTP {self.status_code}")
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        pass
 
 
 def test_notify(release_request):
@@ -214,7 +224,7 @@ def test_find_sbom_filename_none_on_listing_error():
         assert Artifactory("token").find_sbom_filename('repo', TEST_GID, 'aid', '1.0') is None
 
 
-def test_download_named_with_optional_checksum_present_and_absent():
+def test_download_named_with_optional_checksum_present_and_absent(tmp_path):
     main_response = RepoxResponse(200)
     main_response.iter_content = lambda chunk_size: [b'sbom data']
     md5_response = RepoxResponse(200)
@@ -228,9 +238,230 @@ def test_download_named_with_optional_checksum_present_and_absent():
          patch('builtins.open', create=True):
         request.side_effect = [main_response, md5_response, sha1_response, sha256_response, asc_missing]
         temp_file, optional = Artifactory("token").download_named(
-            'repo', TEST_GID, 'aid', '1.0', 'aid-1.0-cyclonedx.json',
+            'repo', TEST_GID, 'aid', '1.0', 'aid-1.0-cyclonedx.json', str(tmp_path),
             checksums=['md5', 'sha1', 'sha256'], optional_checksums=['asc'])
-        assert temp_file == f"{tempfile.gettempdir()}/aid-1.0-cyclonedx.json"
+        assert temp_file == str(tmp_path / "aid-1.0-cyclonedx.json")
         assert optional == []  # .asc was absent (404) -> skipped, not fatal
         assert request.call_args_list[0][0][0] == \
             f"{Artifactory.url}/repo/org/x/aid/1.0/aid-1.0-cyclonedx.json"
+
+
+def test_download_named_downloads_into_the_given_folder(tmp_path):
+    def sbom_response(*args, **kwargs):
+        response = RepoxResponse(200)
+        response.iter_content = lambda chunk_size: [b'sbom data']
+        return response
+    (tmp_path / "first").mkdir()
+    (tmp_path / "second").mkdir()
+    with patch('release.utils.artifactory.requests.get', side_effect=sbom_response):
+        first, _ = Artifactory("token").download_named('repo', TEST_GID, 'aid', '1.0', 'aid-1.0-cyclonedx.json',
+                                                       str(tmp_path / "first"))
+        second, _ = Artifactory("token").download_named('repo', TEST_GID, 'aid', '1.0', 'aid-1.0-cyclonedx.json',
+                                                        str(tmp_path / "second"))
+    assert first == str(tmp_path / "first" / "aid-1.0-cyclonedx.json")
+    with open(second, 'rb') as f:
+        assert f.read() == b'sbom data'
+
+
+def test_head_artifact():
+    response = RepoxResponse(200)
+    response.headers = {'Content-Length': '1234'}
+    with patch('release.utils.artifactory.requests.head', return_value=response) as request:
+        size = Artifactory("token").head_artifact('sonarsource-public-builds', 'com.sonarsource.foo', 'bar', '', 'zip', '1.0')
+        assert size == 1234
+        request.assert_called_once_with(
+            f"{Artifactory.url}/sonarsource-private-builds/com/sonarsource/foo/bar/1.0/bar-1.0.zip",
+            headers={'content-type': 'application/json', 'Authorization': 'Bearer token'},
+            allow_redirects=True
+        )
+
+
+def test_head_artifact_missing():
+    with patch('release.utils.artifactory.requests.head', return_value=RepoxResponse(404)):
+        assert Artifactory("token").head_artifact('repo', TEST_GID, 'aid', 'qual', 'jar', '1.0') is None
+
+
+class AqlResponse:
+    def __init__(self, status_code, results, total=None):
+        self.status_code = status_code
+        self._results = results
+        self._total = len(results) if total is None else total
+    def json(self):
+        return {'results': self._results, 'range': {'start_pos': 0, 'end_pos': len(self._results),
+                                                    'total': self._total}}
+
+
+def test_index_sbom_filenames_single_query():
+    results = [
+        {'repo': 'sonarsource-public-releases', 'path': 'org/x/a/1.0', 'name': 'a-1.0.jar'},
+        {'repo': 'sonarsource-public-releases', 'path': 'org/x/a/1.0', 'name': 'a-1.0-cyclonedx.json'},
+        {'repo': 'sonarsource-public-releases', 'path': 'org/x/a/1.0', 'name': 'a-1.0-cyclonedx.json.asc'},
+        {'repo': 'sonarsource-private-releases', 'path': 'com/x/b/1.0', 'name': 'b-1.0.zip'},
+    ]
+    artifactory = Artifactory("token")
+    with patch('release.utils.artifactory.requests.post', return_value=AqlResponse(200, results)) as post, \
+         patch('release.utils.artifactory.requests.get') as get:
+        artifactory.index_sbom_filenames('sonarsource-public-releases', [('org.x', 'a'), ('com.x', 'b')], '1.0')
+        post.assert_called_once()
+        assert post.call_args[0][0] == f"{Artifactory.url}/api/search/aql"
+        query = post.call_args[1]['data']
+        assert '{"repo": "sonarsource-public-releases", "path": "org/x/a/1.0"}' in query
+        assert '{"repo": "sonarsource-private-releases", "path": "com/x/b/1.0"}' in query
+        assert post.call_args[1]['headers']['content-type'] == 'text/plain'
+
+        assert artifactory.find_sbom_filename('sonarsource-public-releases', 'org.x', 'a', '1.0') == 'a-1.0-cyclonedx.json'
+        assert artifactory.find_sbom_filename('sonarsource-public-releases', 'com.x', 'b', '1.0') is None
+        get.assert_not_called()
+
+
+def test_index_sbom_filenames_falls_back_to_listing_on_error():
+    artifactory = Artifactory("token")
+    with patch('release.utils.artifactory.requests.post', return_value=AqlResponse(400, [])), \
+         patch('release.utils.artifactory.requests.get',
+               return_value=StorageResponse(200, [_child('a-1.0-cyclonedx.json')])) as get:
+        artifactory.index_sbom_filenames('repo', [('org.x', 'a')], '1.0')
+        assert artifactory.find_sbom_filename('repo', 'org.x', 'a', '1.0') == 'a-1.0-cyclonedx.json'
+        get.assert_called_once()
+
+
+def test_index_sbom_filenames_lists_the_folders_missing_from_the_results():
+    results = [{'repo': 'repo', 'path': 'org/x/a/1.0', 'name': 'a-1.0-cyclonedx.json'}]
+    artifactory = Artifactory("token")
+    with patch('release.utils.artifactory.requests.post', return_value=AqlResponse(200, results)), \
+         patch('release.utils.artifactory.requests.get',
+               return_value=StorageResponse(200, [_child('b-1.0-cyclonedx.json')])) as get:
+        artifactory.index_sbom_filenames('repo', [('org.x', 'a'), ('org.x', 'b')], '1.0')
+        assert artifactory.find_sbom_filename('repo', 'org.x', 'a', '1.0') == 'a-1.0-cyclonedx.json'
+        assert artifactory.find_sbom_filename('repo', 'org.x', 'b', '1.0') == 'b-1.0-cyclonedx.json'
+        get.assert_called_once()
+
+
+def test_index_sbom_filenames_ignores_truncated_results(capsys):
+    results = [{'repo': 'repo', 'path': 'org/x/a/1.0', 'name': 'a-1.0.jar'}]
+    artifactory = Artifactory("token")
+    with patch('release.utils.artifactory.requests.post', return_value=AqlResponse(200, results, total=3)):
+        artifactory.index_sbom_filenames('repo', [('org.x', 'a')], '1.0')
+    assert artifactory.folder_listings == {}
+    assert "returned 1 of 3 files" in capsys.readouterr().out
+
+
+def test_list_version_folder_is_cached():
+    children = [_child('aid-1.0.jar'), _child('aid-1.0-cyclonedx.json')]
+    artifactory = Artifactory("token")
+    with patch('release.utils.artifactory.requests.get', return_value=StorageResponse(200, children)) as request:
+        assert artifactory.find_sbom_filename('repo', TEST_GID, 'aid', '1.0') == 'aid-1.0-cyclonedx.json'
+        assert artifactory.list_version_folder('repo', TEST_GID, 'aid', '1.0') == {'aid-1.0.jar', 'aid-1.0-cyclonedx.json'}
+        request.assert_called_once()
+
+
+def test_download_named_skips_optional_checksum_absent_from_listing(tmp_path):
+    main_response = RepoxResponse(200)
+    main_response.iter_content = lambda chunk_size: [b'sbom data']
+    artifactory = Artifactory("token")
+    artifactory.folder_listings[('repo', TEST_GID, 'aid', '1.0')] = frozenset({'aid-1.0-cyclonedx.json'})
+    with patch('release.utils.artifactory.requests.get', return_value=main_response) as request, \
+         patch('builtins.open', create=True):
+        _, optional = artifactory.download_named('repo', TEST_GID, 'aid', '1.0', 'aid-1.0-cyclonedx.json',
+                                                 str(tmp_path), optional_checksums=['asc'])
+        assert optional == []
+        request.assert_called_once()
+
+
+def test_download_named_fetches_optional_checksum_present_in_listing(tmp_path):
+    main_response = RepoxResponse(200)
+    main_response.iter_content = lambda chunk_size: [b'sbom data']
+    asc_response = RepoxResponse(200)
+    asc_response.content = b'signature'
+    artifactory = Artifactory("token")
+    artifactory.folder_listings[('repo', TEST_GID, 'aid', '1.0')] = frozenset(
+        {'aid-1.0-cyclonedx.json', 'aid-1.0-cyclonedx.json.asc'})
+    with patch('release.utils.artifactory.requests.get', side_effect=[main_response, asc_response]) as request, \
+         patch('builtins.open', create=True):
+        _, optional = artifactory.download_named('repo', TEST_GID, 'aid', '1.0', 'aid-1.0-cyclonedx.json',
+                                                 str(tmp_path), optional_checksums=['asc'])
+        assert optional == ['asc']
+        assert request.call_args_list[1][0][0] == f"{Artifactory.url}/repo/org/x/aid/1.0/aid-1.0-cyclonedx.json.asc"
+
+
+@patch.dict(os.environ, {'INPUT_PARALLEL_PROMOTION': 'true'})
+def test_multi_promote_parallel(release_request, buildinfo_multi):
+    with patch('release.utils.artifactory.requests.get', return_value=RepoxResponse(200)) as request:
+        Artifactory("token").promote(release_request, buildinfo_multi)
+        urls = sorted(c[0][0] for c in request.call_args_list)
+        assert urls == [
+            f"{Artifactory.url}/api/plugins/execute/multiRepoPromote?params=buildName=project;buildNumber=buildnumber;"
+            "status=released;src1=sonarsource-private-builds;target1=sonarsource-private-releases",
+            f"{Artifactory.url}/api/plugins/execute/multiRepoPromote?params=buildName=project;buildNumber=buildnumber;"
+            "status=released;src1=sonarsource-public-builds;target1=sonarsource-public-releases",
+        ]
+        assert all(c[1]['timeout'] for c in request.call_args_list)
+
+
+@patch.dict(os.environ, {'INPUT_PARALLEL_PROMOTION': 'true'})
+def test_multi_promote_parallel_revoke_waits_for_timed_out_promotion(release_request, buildinfo_multi):
+    def promote(url, headers, timeout):
+        if 'src1=sonarsource-public-releases' in url:
+            raise requests.exceptions.ReadTimeout()
+        return RepoxResponse(200)
+
+    with patch('release.utils.artifactory.requests.get', side_effect=promote) as request, \
+         patch('release.utils.artifactory.requests.post',
+               side_effect=[AqlResponse(200, [{'name': 'a.jar'}]), AqlResponse(200, [])]) as aql, \
+         patch('polling.time.sleep'):
+        Artifactory("token").promote(release_request, buildinfo_multi, True)
+        assert request.call_count == 2
+        # polled until no artifact of the build is left in the source repository
+        assert aql.call_count == 2
+        query = aql.call_args[1]['data']
+        assert '"repo": "sonarsource-public-releases"' in query
+        assert '"artifact.module.build.name": "project"' in query
+        assert '"artifact.module.build.number": "buildnumber"' in query
+
+
+@patch.dict(os.environ, {'INPUT_PARALLEL_PROMOTION': 'true'})
+def test_multi_promote_parallel_fails_when_artifactory_cannot_be_reached(release_request, buildinfo_multi):
+    with patch('release.utils.artifactory.requests.get', side_effect=requests.exceptions.ConnectTimeout()), \
+         patch('release.utils.artifactory.requests.post') as aql:
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            Artifactory("token").promote(release_request, buildinfo_multi, True)
+        aql.assert_not_called()
+
+
+@patch.dict(os.environ, {'INPUT_PARALLEL_PROMOTION': 'true'})
+def test_multi_promote_parallel_stops_polling_after_failed_counts(release_request, buildinfo_multi):
+    def promote(url, headers, timeout):
+        if 'src1=sonarsource-public-releases' in url:
+            raise requests.exceptions.ReadTimeout()
+        return RepoxResponse(200)
+
+    with patch('release.utils.artifactory.requests.get', side_effect=promote), \
+         patch('release.utils.artifactory.requests.post', return_value=AqlResponse(500, [])) as aql, \
+         patch('polling.time.sleep'):
+        with pytest.raises(Exception, match="3 searches of its artifacts failed in a row"):
+            Artifactory("token").promote(release_request, buildinfo_multi, True)
+        assert aql.call_count == 3
+
+
+@patch.dict(os.environ, {'INPUT_PARALLEL_PROMOTION': 'true'})
+def test_multi_promote_parallel_failure(release_request, buildinfo_multi):
+    failure = RepoxResponse(500)
+    failure.ok = False
+    with patch('release.utils.artifactory.requests.get', return_value=failure):
+        with pytest.raises(Exception, match="failed with code: 500"):
+            Artifactory("token").promote(release_request, buildinfo_multi)
+
+
+def test_download_is_taken_from_the_artifact_cache(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    main_response = RepoxResponse(200)
+    main_response.iter_content = lambda chunk_size: [b'jar content']
+    with patch('release.utils.artifactory.artifact_cache', cache), \
+         patch('release.utils.artifactory.tempfile.gettempdir', return_value=str(tmp_path)), \
+         patch('release.utils.artifactory.requests.get', return_value=main_response) as request:
+        Artifactory("token").download('repo', 'org.sonarsource.foo', 'foo', '', 'jar', '1.0')
+        os.remove(tmp_path / "foo-1.0.jar")
+        temp_file = Artifactory("token").download('repo', 'org.sonarsource.foo', 'foo', '', 'jar', '1.0')
+    request.assert_called_once()
+    assert cache.index == {"repo/org/sonarsource/foo/foo/1.0/foo-1.0.jar": ANY}
+    with open(temp_file, 'rb') as f:
+        assert f.read() == b'jar content'
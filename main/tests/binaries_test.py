@@ -1,36 +1,70 @@
-import os
 import tempfile
-from unittest.mock import patch, MagicMock, call
-from xml.dom.minidom import parse
+from unittest.mock import ANY, patch, MagicMock
+from xml.dom.minidom import parseString
 
 import pytest
 
 from release.utils.binaries import Binaries, SONARLINT_AID
+from release.utils.profiles import ANY_GROUP, profile_for
 
 SONARQUBE_GID = 'org.sonarsource.sonarqube'
 
 
+def deleting_client(*stored_keys):
+    client = MagicMock()
+    client.list_objects_v2.side_effect = lambda Bucket, Prefix: {
+        'Contents': [{'Key': k} for k in stored_keys if k.startswith(Prefix)]}
+    client.delete_objects.side_effect = lambda Bucket, Delete: {'Deleted': Delete['Objects']}
+    return client
+
+
+def deleted_keys(client):
+    return [o['Key'] for _, kwargs in client.delete_objects.call_args_list for o in kwargs['Delete']['Objects']]
+
+
 def test_upload_sonarlint_p2_site(capsys):
     binaries_session = MagicMock()
     client = MagicMock()
     binaries_session.client.return_value = client
     with patch('boto3.Session', return_value=binaries_session), \
-        patch.object(client, 'upload_file') as upload_file:
+        patch.object(client, 'put_object') as put_object:
         binaries = Binaries("test_bucket")
         binaries.upload_sonarlint_p2_site('SonarLint-for-Eclipse/releases', 'SonarLint-for-Eclipse/releases/7.9.0.63244')
         captured = capsys.readouterr().out.split('\n')
         assert captured[0] == 'uploaded compositeContent.xml to s3://test_bucket/SonarLint-for-Eclipse/releases/compositeContent.xml'
         assert captured[
                    1] == 'uploaded compositeArtifacts.xml to s3://test_bucket/SonarLint-for-Eclipse/releases/compositeArtifacts.xml'
-        upload_file.assert_has_calls([
-            call(f'{tempfile.gettempdir()}/compositeContent.xml', 'test_bucket', 'SonarLint-for-Eclipse/releases/compositeContent.xml'),
-            call(f'{tempfile.gettempdir()}/compositeArtifacts.xml', 'test_bucket',
-                 'SonarLint-for-Eclipse/releases/compositeArtifacts.xml')
-        ])
-        for composite_file in ['compositeContent.xml', 'compositeArtifacts.xml']:
-            document = parse(os.path.join(tempfile.gettempdir(), composite_file))
-            assert document.getElementsByTagName('child')[-1].getAttribute(
-                'location') == "https://binaries.sonarsource.com/SonarLint-for-Eclipse/releases/7.9.0.63244/"
+        assert [kwargs['Key'] for _, kwargs in put_object.call_args_list] == [
+            'SonarLint-for-Eclipse/releases/compositeContent.xml',
+            'SonarLint-for-Eclipse/releases/compositeArtifacts.xml'
+        ]
+        client.get_object.assert_not_called()
+        for _, kwargs in put_object.call_args_list:
+            assert kwargs['Bucket'] == 'test_bucket'
+            document = parseString(kwargs['Body'].getvalue())
+            children = document.getElementsByTagName('child')
+            assert len(children) == 2
+            assert children[-1].getAttribute('location') == \
+                "https://binaries.sonarsource.com/SonarLint-for-Eclipse/releases/7.9.0.63244/"
+            assert document.getElementsByTagName('children')[0].getAttribute('size') == '2'
+
+
+def test_upload_sonarlint_p2_site_keeps_the_previous_releases():
+    binaries_session = MagicMock()
+    client = MagicMock()
+    binaries_session.client.return_value = client
+    with patch('boto3.Session', return_value=binaries_session):
+        binaries = Binaries("test_bucket")
+        binaries.upload_sonarlint_p2_site('SonarLint-for-Eclipse/releases', 'SonarLint-for-Eclipse/releases/7.8.0.1')
+        previous = client.put_object.call_args.kwargs['Body'].getvalue()
+        client.get_object.return_value = {'Body': MagicMock(**{'read.return_value': previous})}
+        binaries.upload_sonarlint_p2_site('SonarLint-for-Eclipse/releases', 'SonarLint-for-Eclipse/releases/7.9.0.63244',
+                                          keep=2)
+    document = parseString(client.put_object.call_args.kwargs['Body'].getvalue())
+    assert [c.getAttribute('location') for c in document.getElementsByTagName('child')][1:] == [
+        "https://binaries.sonarsource.com/SonarLint-for-Eclipse/releases/7.8.0.1/",
+        "https://binaries.sonarsource.com/SonarLint-for-Eclipse/releases/7.9.0.63244/"
+    ]
 
 
 def test_update_sonarlint_p2_site(capsys):
@@ -39,27 +73,63 @@ def test_update_sonarlint_p2_site(capsys):
     binaries_session.client.return_value = client
     with patch('boto3.Session', return_value=binaries_session):
         with patch.object(client, 'create_invalidation') as create_invalidation:
-            create_invalidation.return_value = {'Location': 'URI_123'}
+            create_invalidation.return_value = {'Location': 'URI_123', 'Invalidation': {'Id': 'I123'}}
             binaries = Binaries("test_bucket")
-            binaries.update_sonarlint_p2_site('1234567890', '7.9.0.63244')
+            binaries.update_sonarlint_p2_site('1234567890')
+            create_invalidation.assert_not_called()
+            binaries.invalidations.submit()
             captured = capsys.readouterr().out.split('\n')
             assert captured[0] == 'CloudFront invalidation: URI_123'
-            create_invalidation.assert_called()
+            create_invalidation.assert_called_once()
 
 
-def test_s3_delete_sonarlint_eclipse():
+def test_sonarlint_p2_site_invalidation(capsys):
     binaries_session = MagicMock()
     client = MagicMock()
     binaries_session.client.return_value = client
     with patch('boto3.Session', return_value=binaries_session):
-        resource = MagicMock()
-        with patch('boto3.resource', return_value=resource):
-            bucket = MagicMock()
-            with patch.object(resource, 'Bucket', return_value=bucket):
-                Binaries('bucket').s3_delete('filename', 'whatever', SONARLINT_AID, 'version')
-    client.delete_object.assert_called_once_with(Bucket='bucket', Key='SonarLint-for-Eclipse/releases/filename')
-    bucket.objects.filter.assert_called_once_with(Prefix='SonarLint-for-Eclipse/releases/version/')
-    bucket.objects.filter.return_value.delete.assert_called_once()
+        with patch.object(client, 'create_invalidation') as create_invalidation:
+            create_invalidation.return_value = {'Location': 'URI_123', 'Invalidation': {'Id': 'I123'}}
+            binaries = Binaries("test_bucket")
+            with patch.object(binaries, 'upload_eclipse_update_site_unzip'), \
+                    patch.object(binaries, 'upload_sonarlint_p2_site'), \
+                    patch('release.utils.binaries.transfer_manager'):
+                binaries.s3_upload('/tmp/site.zip', 'org.sonarlint.eclipse.site-7.9.0.63244.zip',
+                                   'org.sonarsource.sonarlint.eclipse', 'org.sonarlint.eclipse.site', '7.9.0.63244')
+            create_invalidation.assert_not_called()
+            capsys.readouterr()
+            binaries.invalidations.submit()
+            captured = capsys.readouterr().out.split('\n')
+            assert captured[0] == 'CloudFront invalidation: URI_123'
+            create_invalidation.assert_called_once()
+            assert create_invalidation.call_args.kwargs['DistributionId'] == 'E2WHX4O0Y6Z6C6'
+            assert create_invalidation.call_args.kwargs['InvalidationBatch']['Paths']['Items'] == [
+                '/SonarLint-for-Eclipse/releases/compositeContent.xml',
+                '/SonarLint-for-Eclipse/releases/compositeArtifacts.xml']
+
+
+def test_s3_delete_sonarlint_eclipse(capsys):
+    binaries_session = MagicMock()
+    client = deleting_client('SonarLint-for-Eclipse/releases/filename')
+    binaries_session.client.return_value = client
+    client.get_paginator.return_value.paginate.return_value = [
+        {'Contents': [{'Key': 'SonarLint-for-Eclipse/releases/version/content.jar'},
+                      {'Key': 'SonarLint-for-Eclipse/releases/version/artifacts.jar'}]},
+        {'Contents': [{'Key': 'SonarLint-for-Eclipse/releases/version/plugins/a.jar'}]},
+    ]
+    with patch('boto3.Session', return_value=binaries_session):
+        deleted = Binaries('bucket').s3_delete('filename', 'whatever', SONARLINT_AID, 'version')
+    client.get_paginator.assert_called_once_with('list_objects_v2')
+    client.get_paginator.return_value.paginate.assert_called_once_with(
+        Bucket='bucket', Prefix='SonarLint-for-Eclipse/releases/version/')
+    assert client.delete_objects.call_count == 3
+    assert sorted(deleted) == sorted(deleted_keys(client)) == [
+        'SonarLint-for-Eclipse/releases/filename',
+        'SonarLint-for-Eclipse/releases/version/artifacts.jar',
+        'SonarLint-for-Eclipse/releases/version/content.jar',
+        'SonarLint-for-Eclipse/releases/version/plugins/a.jar',
+    ]
+    assert 'deleted 3 objects of SonarLint-for-Eclipse/releases/version/' in capsys.readouterr().out
 
 
 def test_sbom_filename_for():
@@ -79,10 +149,10 @@ def test_s3_upload_sbom_flat_layout(capsys):
         binaries.s3_upload_sbom(sbom, 'sonarqube-10.0.sbom.json', SONARQUBE_GID,
                                 'sonarqube', '10.0', '', checksums=['md5', 'sha256', 'asc'])
         key = 'Distribution/sonarqube/sonarqube-10.0.sbom.json'
-        upload_file.assert_any_call(sbom, 'test_bucket', key)
-        upload_file.assert_any_call(f"{sbom}.md5", 'test_bucket', f"{key}.md5")
-        upload_file.assert_any_call(f"{sbom}.sha256", 'test_bucket', f"{key}.sha256")
-        upload_file.assert_any_call(f"{sbom}.asc", 'test_bucket', f"{key}.asc")
+        upload_file.assert_any_call(sbom, 'test_bucket', key, Callback=ANY, Config=ANY)
+        upload_file.assert_any_call(f"{sbom}.md5", 'test_bucket', f"{key}.md5", Callback=ANY, Config=ANY)
+        upload_file.assert_any_call(f"{sbom}.sha256", 'test_bucket', f"{key}.sha256", Callback=ANY, Config=ANY)
+        upload_file.assert_any_call(f"{sbom}.asc", 'test_bucket', f"{key}.asc", Callback=ANY, Config=ANY)
 
 
 def test_s3_upload_sbom_hierarchical_layout_for_sonarqube_cli():
@@ -98,7 +168,7 @@ def test_s3_upload_sbom_hierarchical_layout_for_sonarqube_cli():
                                 checksums=['md5'])
         upload_file.assert_any_call(
             sbom, 'test_bucket',
-            'Distribution/sonarqube-cli/1.0/linux/sonarqube-cli-1.0-linux-x64.sbom.json')
+            'Distribution/sonarqube-cli/1.0/linux/sonarqube-cli-1.0-linux-x64.sbom.json', Callback=ANY, Config=ANY)
 
 
 def test_qual_to_platform_folder():
@@ -117,6 +187,17 @@ def test_use_hierarchical_qualifier_layout():
     assert Binaries.use_hierarchical_qualifier_layout('dummy', 'cyclonedx') is False
 
 
+def test_bucket_key_uses_the_profile_of_the_repox_artifact():
+    platform = profile_for(ANY_GROUP, 'sonarqube-cli')
+    with patch('boto3.Session'):
+        binaries = Binaries('bucket')
+    # a renamed artifact has no profile of its own on binaries
+    assert binaries.get_bucket_key('renamed', 'org.whatever', 'renamed-1.0-linux-x64.zip', '1.0', 'linux-x64') == \
+           'Distribution/renamed/renamed-1.0-linux-x64.zip'
+    assert binaries.get_bucket_key('renamed', 'org.whatever', 'renamed-1.0-linux-x64.zip', '1.0', 'linux-x64',
+                                   platform) == 'Distribution/renamed/1.0/linux/renamed-1.0-linux-x64.zip'
+
+
 @pytest.mark.parametrize(
     'group_id, root_bucket_key',
     [
@@ -126,33 +207,70 @@ def test_use_hierarchical_qualifier_layout():
 )
 def test_s3_delete_common_case(group_id, root_bucket_key):
     binaries_session = MagicMock()
-    client = MagicMock()
+    client = deleting_client(f'{root_bucket_key}/aid/filename', f'{root_bucket_key}/aid/filename.md5')
     binaries_session.client.return_value = client
     with patch('boto3.Session', return_value=binaries_session):
         Binaries('bucket').s3_delete('filename', group_id, "aid", 'version')
-    client.delete_object.assert_called_once_with(Bucket='bucket', Key=f'{root_bucket_key}/aid/filename')
+    client.delete_objects.assert_called_once_with(Bucket='bucket', Delete={'Objects': [{'Key': f'{root_bucket_key}/aid/filename'}]})
+
+
+def test_s3_delete_returns_only_the_existing_keys(capsys):
+    binaries_session = MagicMock()
+    client = deleting_client('Distribution/other/1.0.0/linux/other-1.0.0-linux-x64.zip')
+    binaries_session.client.return_value = client
+    with patch('boto3.Session', return_value=binaries_session):
+        deleted = Binaries('bucket').s3_delete(
+            'other-1.0.0-linux-x64.zip', 'org.sonarsource.foo', 'other', '1.0.0', 'linux-x64')
+        missing = Binaries('bucket').s3_delete('filename', 'org.whatever', 'aid', 'version')
+    assert deleted == deleted_keys(client) == ['Distribution/other/1.0.0/linux/other-1.0.0-linux-x64.zip']
+    assert missing == []
+    client.delete_objects.assert_called_once()
+    assert 'deleted Distribution/other/other-1.0.0-linux-x64.zip' not in capsys.readouterr().out
 
 
 def test_s3_delete_sonarqube_cli_qualified():
     binaries_session = MagicMock()
-    client = MagicMock()
+    client = deleting_client('Distribution/sonarqube-cli/1.0.0/linux/sonarqube-cli-1.0.0-linux-x64.zip')
     binaries_session.client.return_value = client
     with patch('boto3.Session', return_value=binaries_session):
         Binaries('bucket').s3_delete(
             'sonarqube-cli-1.0.0-linux-x64.zip', 'org.sonarsource.sonarqube', 'sonarqube-cli', '1.0.0', 'linux-x64')
-    client.delete_object.assert_called_once_with(
-        Bucket='bucket', Key='Distribution/sonarqube-cli/1.0.0/linux/sonarqube-cli-1.0.0-linux-x64.zip')
+    assert deleted_keys(client) == ['Distribution/sonarqube-cli/1.0.0/linux/sonarqube-cli-1.0.0-linux-x64.zip']
 
 
 def test_s3_delete_non_cli_qualified_deletes_flat_and_legacy_hierarchical():
     binaries_session = MagicMock()
-    client = MagicMock()
+    client = deleting_client('Distribution/other/other-1.0.0-linux-x64.zip',
+                             'Distribution/other/1.0.0/linux/other-1.0.0-linux-x64.zip')
     binaries_session.client.return_value = client
     with patch('boto3.Session', return_value=binaries_session):
         Binaries('bucket').s3_delete(
             'other-1.0.0-linux-x64.zip', 'org.sonarsource.foo', 'other', '1.0.0', 'linux-x64')
-    client.delete_object.assert_has_calls([
-        call(Bucket='bucket', Key='Distribution/other/other-1.0.0-linux-x64.zip'),
-        call(Bucket='bucket', Key='Distribution/other/1.0.0/linux/other-1.0.0-linux-x64.zip')
-    ])
-    assert client.delete_object.call_count == 2
+    assert deleted_keys(client) == [
+        'Distribution/other/other-1.0.0-linux-x64.zip',
+        'Distribution/other/1.0.0/linux/other-1.0.0-linux-x64.zip'
+    ]
+    client.delete_objects.assert_called_once()
+
+
+def test_s3_delete_sbom_deletes_the_sbom_and_its_siblings_at_once():
+    binaries_session = MagicMock()
+    sbom_key = 'Distribution/sonarqube/sonarqube-10.0.sbom.json'
+    client = deleting_client(sbom_key, *[f'{sbom_key}.{checksum}' for checksum in ['md5', 'sha1', 'sha256', 'asc']])
+    binaries_session.client.return_value = client
+    with patch('boto3.Session', return_value=binaries_session):
+        deleted = Binaries('bucket').s3_delete_sbom('sonarqube-10.0.sbom.json', SONARQUBE_GID, 'sonarqube', '10.0')
+    # the SBOM and its siblings are found by listing one prefix
+    client.list_objects_v2.assert_called_once_with(Bucket='bucket', Prefix=sbom_key)
+    assert deleted == [sbom_key] + [f'{sbom_key}.{checksum}' for checksum in ['md5', 'sha1', 'sha256', 'asc']]
+    client.delete_objects.assert_called_once()
+
+
+def test_s3_delete_raises_on_errors():
+    binaries_session = MagicMock()
+    client = deleting_client('Distribution/aid/filename')
+    client.delete_objects.side_effect = None
+    client.delete_objects.return_value = {'Errors': [{'Key': 'k', 'Code': 'AccessDenied'}]}
+    binaries_session.client.return_value = client
+    with patch('boto3.Session', return_value=binaries_session), pytest.raises(Exception, match="could not delete 1"):
+        Binaries('bucket').s3_delete('filename', 'org.whatever', 'aid', 'version')
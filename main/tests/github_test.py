@@ -4,7 +4,7 @@ import re
 import pytest
 import requests as real_requests
 
-from release.utils.github import GitHub, GitHubException, ALLOWED_GITHUB_ACTIONS
+from release.utils.github import GitHub, GitHubApiClient, GitHubException, ALLOWED_GITHUB_ACTIONS
 
 
 def make_exception_str_for_event(event):
@@ -307,18 +307,19 @@ def test_get_release_reads_from_event_on_release_event(mock_load):
     },
 )
 def test_get_release_fetches_via_api_on_workflow_dispatch(mock_load):
-    mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response = MagicMock(ok=True, status_code=200, headers={})
     mock_response.json.return_value = {"id": 99, "tag_name": "2.0.0.99", "draft": True}
     with patch("release.utils.github.open", mock_open()):
-        with patch("release.utils.github.requests.get", return_value=mock_response) as mock_get:
+        with patch("release.utils.github.requests.Session.get", return_value=mock_response) as mock_get:
             github = GitHub()
             release = github._get_release()
             assert release == {"id": 99, "tag_name": "2.0.0.99", "draft": True}
             mock_get.assert_called_once_with(
                 "https://api.github.com/repos/org/project/releases/tags/2.0.0.99",
-                headers={"Authorization": "token tok"},
+                headers={},
+                timeout=30,
             )
+            assert github.api.session.headers["Authorization"] == "token tok"
 
 
 @patch.dict(
@@ -353,10 +354,9 @@ def test_get_release_returns_none_when_input_version_missing(mock_load):
     },
 )
 def test_get_release_returns_none_on_api_404(mock_load):
-    mock_response = MagicMock()
-    mock_response.ok = False
+    mock_response = MagicMock(ok=False, status_code=404, headers={})
     with patch("release.utils.github.open", mock_open()):
-        with patch("release.utils.github.requests.get", return_value=mock_response):
+        with patch("release.utils.github.requests.Session.get", return_value=mock_response):
             github = GitHub()
             release = github._get_release()
             assert release is None
@@ -377,11 +377,10 @@ def test_get_release_returns_none_on_api_404(mock_load):
     },
 )
 def test_revoke_release_is_noop_on_workflow_dispatch_path(mock_load):
-    mock_response = MagicMock()
-    mock_response.ok = True
+    mock_response = MagicMock(ok=True, status_code=200, headers={})
     mock_response.json.return_value = {"id": 7, "tag_name": "1.0.0.42"}
     with patch("release.utils.github.open", mock_open()):
-        with patch("release.utils.github.requests.get", return_value=mock_response):
+        with patch("release.utils.github.requests.Session.get", return_value=mock_response):
             with patch("release.utils.github.requests.delete") as mock_delete:
                 with patch("release.utils.github.requests.patch") as mock_patch:
                     github = GitHub()
@@ -389,3 +388,40 @@ def test_revoke_release_is_noop_on_workflow_dispatch_path(mock_load):
                     github.revoke_release()
                     mock_delete.assert_not_called()
                     mock_patch.assert_not_called()
+
+
+# ── GitHubApiClient: conditional requests and rate limit ─────────────────────
+
+def api_response(status_code, body=None, headers=None):
+    response = MagicMock(ok=200 <= status_code < 300, status_code=status_code,
+                         headers=real_requests.structures.CaseInsensitiveDict(headers or {}))
+    response.json.return_value = body
+    return response
+
+
+def test_api_client_revalidates_cached_responses_with_etag():
+    responses = [api_response(200, {"id": 1}, {"ETag": '"abc"'}), api_response(304)]
+    with patch("release.utils.github.requests.Session.get", side_effect=responses) as mock_get:
+        api = GitHubApiClient("tok")
+        assert api.get_json("/repos/org/project/releases/tags/1.0") == {"id": 1}
+        assert api.get_json("/repos/org/project/releases/tags/1.0") == {"id": 1}
+    assert mock_get.call_args_list[0].kwargs["headers"] == {}
+    assert mock_get.call_args_list[1].kwargs["headers"] == {"If-None-Match": '"abc"'}
+
+
+def test_api_client_waits_for_the_rate_limit():
+    responses = [api_response(403, headers={"Retry-After": "5"}),
+                 api_response(429),
+                 api_response(200, {"id": 1})]
+    with patch("release.utils.github.requests.Session.get", side_effect=responses), \
+            patch("release.utils.github.time.sleep") as sleep:
+        assert GitHubApiClient("tok").get_json("/repos/org/project") == {"id": 1}
+    assert [c.args[0] for c in sleep.call_args_list] == [5, 4]
+
+
+def test_api_client_gives_up_after_rate_limit_attempts():
+    with patch("release.utils.github.requests.Session.get",
+               return_value=api_response(403, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "0"})) \
+            as mock_get, patch("release.utils.github.time.sleep"):
+        assert GitHubApiClient("tok").get_json("/repos/org/project") is None
+    assert mock_get.call_count == 4
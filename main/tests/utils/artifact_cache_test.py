@@ -0,0 +1,80 @@
+import hashlib
+import os
+from unittest.mock import patch
+
+from release.utils.artifact_cache import ArtifactCache
+
+CONTENT = b"jar content"
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+REPO_PATH = "sonarsource-public-releases/org/sonarsource/foo/1.0/foo-1.0.jar"
+
+
+def test_files_are_found_by_checksum_and_by_repox_path(tmp_path):
+    downloaded = tmp_path / "foo-1.0.jar"
+    downloaded.write_bytes(CONTENT)
+    cache = ArtifactCache(str(tmp_path / "cache"))
+
+    cache.put(str(downloaded), REPO_PATH)
+
+    assert os.path.exists(cache.object_path(SHA256))
+    # the index is persisted: another job restoring the cache finds the file by its path
+    restored = ArtifactCache(str(tmp_path / "cache"))
+    assert restored.get(str(tmp_path / "by-path.jar"), REPO_PATH)
+    assert restored.get(str(tmp_path / "by-checksum.jar"), "sonarsource-private-releases/foo-1.0.jar", SHA256)
+    assert (tmp_path / "by-path.jar").read_bytes() == CONTENT
+    assert (tmp_path / "by-checksum.jar").read_bytes() == CONTENT
+
+
+def test_missing_files(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    assert not cache.get(str(tmp_path / "foo.jar"), REPO_PATH)
+    assert not cache.get(str(tmp_path / "foo.jar"), REPO_PATH, SHA256)
+    assert not (tmp_path / "foo.jar").exists()
+
+
+def test_files_are_copied_when_they_cannot_be_linked(tmp_path):
+    downloaded = tmp_path / "foo-1.0.jar"
+    downloaded.write_bytes(CONTENT)
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    with patch('os.link', side_effect=OSError("cross-device link")):
+        cache.put(str(downloaded), REPO_PATH, SHA256)
+        assert cache.get(str(tmp_path / "restored.jar"), REPO_PATH)
+    assert (tmp_path / "restored.jar").read_bytes() == CONTENT
+
+
+def test_corrupted_files_are_not_restored(tmp_path):
+    downloaded = tmp_path / "foo-1.0.jar"
+    downloaded.write_bytes(CONTENT)
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    cache.put(str(downloaded), REPO_PATH)
+    # e.g. a truncated workflow artifact
+    os.remove(cache.object_path(SHA256))
+    with open(cache.object_path(SHA256), 'wb') as f:
+        f.write(CONTENT[:4])
+
+    assert not cache.get(str(tmp_path / "restored.jar"), REPO_PATH)
+    assert not (tmp_path / "restored.jar").exists()
+    cache.put(str(downloaded), REPO_PATH)
+    assert cache.get(str(tmp_path / "restored.jar"), REPO_PATH, SHA256)
+    assert (tmp_path / "restored.jar").read_bytes() == CONTENT
+
+
+def test_only_the_files_of_the_cached_repositories_are_stored(tmp_path):
+    downloaded = tmp_path / "foo-1.0.jar"
+    downloaded.write_bytes(CONTENT)
+    cache = ArtifactCache(str(tmp_path / "cache"), repos=["sonarsource-public-releases"])
+
+    cache.put(str(downloaded), "sonarsource-private-releases/com/sonarsource/foo/1.0/foo-1.0.jar")
+    assert cache.index == {}
+    cache.put(str(downloaded), REPO_PATH)
+    assert cache.index == {REPO_PATH: SHA256}
+
+
+def test_cache_is_disabled_without_directory():
+    with patch.dict('os.environ', {}, clear=True):
+        assert ArtifactCache.from_env() is None
+    with patch.dict('os.environ', {'ARTIFACT_CACHE_DIR': '/tmp/cache'}):
+        assert ArtifactCache.from_env().root == '/tmp/cache'
+        assert ArtifactCache.from_env().repos is None
+    with patch.dict('os.environ', {'ARTIFACT_CACHE_DIR': '/tmp/cache', 'ARTIFACT_CACHE_REPOS': 'a-releases,b-releases'}):
+        assert ArtifactCache.from_env().repos == ['a-releases', 'b-releases']
@@ -0,0 +1,64 @@
+import io
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from urllib3 import HTTPResponse
+
+from release.utils.buffers import BufferPool, read_chunks, response_chunks
+
+
+def test_buffers_are_reused():
+    pool = BufferPool(chunk_size=4, max_buffers=2)
+    with pool.buffer() as first:
+        assert len(first) == 4
+    with pool.buffer() as second:
+        assert second is first
+
+
+def test_buffer_blocks_while_all_are_in_use():
+    pool = BufferPool(chunk_size=4, max_buffers=1)
+    taken = threading.Event()
+
+    def take():
+        with pool.buffer():
+            taken.set()
+
+    with pool.buffer():
+        thread = threading.Thread(target=take)
+        thread.start()
+        assert not taken.wait(0.1)
+    assert taken.wait(1)
+    thread.join()
+
+
+def test_read_chunks():
+    buffer = memoryview(bytearray(4))
+    assert [bytes(c) for c in read_chunks(io.BytesIO(b"0123456789"), buffer)] == [b"0123", b"4567", b"89"]
+
+
+def streamed_response(body, headers):
+    response = MagicMock(headers=headers)
+    response.raw = HTTPResponse(body=io.BytesIO(body), headers=headers, preload_content=False)
+    return response
+
+
+def test_response_chunks_read_into_the_buffer():
+    response = streamed_response(b"0123456789", {'Content-Length': '10'})
+    buffer = memoryview(bytearray(8))
+    assert [bytes(c) for c in response_chunks(response, buffer)] == [b"01234567", b"89"]
+    response.iter_content.assert_not_called()
+
+
+def test_response_chunks_fail_on_truncated_bodies():
+    response = streamed_response(b"0123456789", {'Content-Length': '12'})
+    with pytest.raises(requests.exceptions.ChunkedEncodingError, match="10 bytes read, 2 more expected"):
+        list(response_chunks(response, memoryview(bytearray(8))))
+
+
+def test_response_chunks_lets_requests_decode_compressed_bodies():
+    response = streamed_response(b"compressed", {'Content-Encoding': 'gzip'})
+    response.iter_content.return_value = [b"decoded"]
+    assert list(response_chunks(response, memoryview(bytearray(8)))) == [b"decoded"]
+    response.iter_content.assert_called_once_with(chunk_size=8)
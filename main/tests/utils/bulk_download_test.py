@@ -0,0 +1,103 @@
+import hashlib
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pytest import fixture
+
+from release.exceptions.checksum_mismatch_exception import ChecksumMismatchException
+from release.utils.artifact_cache import ArtifactCache
+from release.utils.bulk_download import BuildDownloader, BuildFile
+
+CONTENT = b"jar content"
+CHECKSUMS = {
+    'md5': hashlib.md5(CONTENT).hexdigest(),
+    'sha1': hashlib.sha1(CONTENT).hexdigest(),
+    'sha256': hashlib.sha256(CONTENT).hexdigest(),
+}
+
+
+def aql_item(path, name):
+    return {"repo": "sonarsource-public-releases", "path": path, "name": name, "size": len(CONTENT),
+            "actual_md5": CHECKSUMS['md5'], "actual_sha1": CHECKSUMS['sha1'], "sha256": CHECKSUMS['sha256']}
+
+
+def download_response(content):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [content[:4], content[4:]]
+    return response
+
+
+@fixture
+def downloader():
+    return BuildDownloader('https://repox.example.com/repox/', 'token', workers=2)
+
+
+def test_list_build_files_queries_the_build_once(downloader):
+    results = [
+        aql_item("org/sonarsource/foo/foo/1.0.0.42", "foo-1.0.0.42.jar"),
+        aql_item("org/sonarsource/foo/foo/1.0.0.42", "foo-1.0.0.42.jar"),
+        aql_item("org/sonarsource/foo/foo/1.0.0.42", "foo-1.0.0.42.pom"),
+        aql_item("org/sonarsource/foo/foo/1.0.0.42", "foo-1.0.0.42.nupkg"),
+        aql_item("com/other/bar/1.0.0.42", "bar-1.0.0.42.jar"),
+    ]
+    with patch.object(downloader.session, 'post', return_value=MagicMock(**{'json.return_value': {"results": results}})) as post:
+        files = downloader.list_build_files('sonarsource-public-releases', 'foo', 42, 'org/sonarsource', '*.nupkg;*.snupkg')
+
+    post.assert_called_once()
+    assert post.call_args.args[0] == 'https://repox.example.com/repox/api/search/aql'
+    query = post.call_args.kwargs['data']
+    assert '"artifact.module.build.name": "foo"' in query
+    assert '"artifact.module.build.number": "42"' in query
+    assert [f.name for f in files] == ["foo-1.0.0.42.jar", "foo-1.0.0.42.pom"]
+    assert files[0].checksums == CHECKSUMS
+
+
+def test_download_all_keeps_the_repository_layout_and_writes_checksums(downloader, tmp_path):
+    files = [BuildFile("sonarsource-public-releases", "org/sonarsource/foo/1.0", "foo-1.0.jar", len(CONTENT), CHECKSUMS),
+             BuildFile("sonarsource-public-releases", "org/sonarsource/foo/1.0", "foo-1.0.jar.asc", len(CONTENT), CHECKSUMS)]
+    with patch.object(downloader.session, 'get', side_effect=lambda *args, **kwargs: download_response(CONTENT)) as get:
+        total_bytes = downloader.download_all(files, str(tmp_path))
+
+    assert total_bytes == 2 * len(CONTENT)
+    get.assert_any_call('https://repox.example.com/repox/sonarsource-public-releases/org/sonarsource/foo/1.0/foo-1.0.jar',
+                        stream=True, timeout=60)
+    jar = tmp_path / "org/sonarsource/foo/1.0/foo-1.0.jar"
+    assert jar.read_bytes() == CONTENT
+    for checksum, value in CHECKSUMS.items():
+        assert (tmp_path / f"org/sonarsource/foo/1.0/foo-1.0.jar.{checksum}").read_text() == value
+    # signatures get no checksum siblings, as with the former `find ... -exec jfrog rt curl`
+    assert sorted(os.listdir(tmp_path / "org/sonarsource/foo/1.0")) == [
+        "foo-1.0.jar", "foo-1.0.jar.asc", "foo-1.0.jar.md5", "foo-1.0.jar.sha1", "foo-1.0.jar.sha256"]
+
+
+def test_download_flat_without_checksums(downloader, tmp_path):
+    build_file = BuildFile("sonarsource-public-releases", "org/sonarsource/foo/1.0", "foo-1.0.jar", len(CONTENT), CHECKSUMS)
+    with patch.object(downloader.session, 'get', return_value=download_response(CONTENT)):
+        downloader.download(build_file, str(tmp_path), flat=True, checksums=False)
+
+    assert os.listdir(tmp_path) == ["foo-1.0.jar"]
+
+
+def test_download_retries_then_fails_on_checksum_mismatch(downloader, tmp_path):
+    build_file = BuildFile("sonarsource-public-releases", "org/sonarsource/foo/1.0", "foo-1.0.jar", len(CONTENT), CHECKSUMS)
+    with patch.object(downloader.session, 'get', side_effect=lambda *args, **kwargs: download_response(b"corrupted")) as get:
+        with pytest.raises(ChecksumMismatchException):
+            downloader.download(build_file, str(tmp_path))
+
+    assert get.call_count == 3
+
+
+def test_download_takes_the_cached_files(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    downloader = BuildDownloader('https://repox.example.com/repox/', 'token', workers=2, cache=cache)
+    build_file = BuildFile("sonarsource-public-releases", "org/sonarsource/foo/1.0", "foo-1.0.jar", len(CONTENT),
+                           CHECKSUMS)
+    with patch.object(downloader.session, 'get', side_effect=lambda *args, **kwargs: download_response(CONTENT)) as get:
+        downloader.download_all([build_file], str(tmp_path / "first"))
+        downloader.download_all([build_file], str(tmp_path / "second"))
+
+    get.assert_called_once()
+    assert (tmp_path / "second" / "org/sonarsource/foo/1.0/foo-1.0.jar").read_bytes() == CONTENT
+    assert (tmp_path / "second" / "org/sonarsource/foo/1.0/foo-1.0.jar.sha256").read_text() == CHECKSUMS['sha256']
@@ -0,0 +1,132 @@
+import hashlib
+import io
+import zipfile
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pytest import fixture
+
+from release.utils.central_bundle import StreamingBundleUpload, bundle_entries, write_bundle
+
+JAR = b"PK jar content"
+POM = b"<project></project>"
+
+
+class UnseekableStream(io.RawIOBase):
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer.extend(data)
+        return len(data)
+
+
+@fixture
+def local_repo(tmp_path):
+    version_dir = tmp_path / "org/sonarsource/foo/1.0"
+    version_dir.mkdir(parents=True)
+    (version_dir / "foo-1.0.jar").write_bytes(JAR)
+    (version_dir / "foo-1.0.jar.md5").write_text(hashlib.md5(JAR).hexdigest())
+    (version_dir / "foo-1.0.jar.asc").write_text("signature")
+    (version_dir / "foo-1.0.pom").write_bytes(POM)
+    (version_dir / ".DS_Store").write_bytes(b"")
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden/file").write_bytes(b"")
+    return tmp_path
+
+
+def test_bundle_entries_skip_hidden_files(local_repo):
+    assert bundle_entries(str(local_repo)) == [
+        "org/sonarsource/foo/1.0/foo-1.0.jar",
+        "org/sonarsource/foo/1.0/foo-1.0.jar.asc",
+        "org/sonarsource/foo/1.0/foo-1.0.jar.md5",
+        "org/sonarsource/foo/1.0/foo-1.0.pom",
+    ]
+
+
+def test_write_bundle_streams_entries_and_generates_missing_checksums(local_repo):
+    output = UnseekableStream()
+
+    count = write_bundle(str(local_repo), output)
+
+    bundle = zipfile.ZipFile(io.BytesIO(bytes(output.buffer)))
+    prefix = "org/sonarsource/foo/1.0/"
+    assert sorted(bundle.namelist()) == [prefix + name for name in [
+        "foo-1.0.jar", "foo-1.0.jar.asc", "foo-1.0.jar.md5", "foo-1.0.jar.sha1",
+        "foo-1.0.pom", "foo-1.0.pom.md5", "foo-1.0.pom.sha1"]]
+    assert count == 7
+    assert bundle.read(prefix + "foo-1.0.jar") == JAR
+    assert bundle.read(prefix + "foo-1.0.jar.sha1").decode() == hashlib.sha1(JAR).hexdigest()
+    assert bundle.read(prefix + "foo-1.0.pom.md5").decode() == hashlib.md5(POM).hexdigest()
+    # archives are not compressed again
+    assert bundle.getinfo(prefix + "foo-1.0.jar").compress_type == zipfile.ZIP_STORED
+    assert bundle.getinfo(prefix + "foo-1.0.pom").compress_type == zipfile.ZIP_DEFLATED
+    for info in bundle.infolist():
+        assert info.flag_bits & 0x08
+        assert not info.extra, "small entries do not need ZIP64 extra fields"
+
+
+def test_write_bundle_does_not_compress_archives(tmp_path):
+    (tmp_path / "foo-1.0.jar").write_bytes(b"a" * 100000)
+    (tmp_path / "foo-1.0.pom").write_bytes(b"a" * 100000)
+    output = UnseekableStream()
+
+    write_bundle(str(tmp_path), output)
+
+    bundle = zipfile.ZipFile(io.BytesIO(bytes(output.buffer)))
+    assert bundle.getinfo("foo-1.0.jar").compress_type == zipfile.ZIP_STORED
+    assert bundle.getinfo("foo-1.0.jar").compress_size == 100000
+    assert bundle.getinfo("foo-1.0.pom").compress_size < 1000
+    assert bundle.read("foo-1.0.jar") == b"a" * 100000
+
+
+def test_streaming_upload_sends_the_bundle_as_multipart(local_repo):
+    sent = {}
+
+    def post(url, params, headers, data):
+        sent['body'] = b"".join(data)
+        sent['headers'] = headers
+        return MagicMock(status_code=201, text="deployment-id\n")
+
+    with patch('release.utils.central_bundle.requests.post', side_effect=post) as requests_post:
+        deployment_id = StreamingBundleUpload("https://central.example.com/", "token") \
+            .upload(str(local_repo), "AUTOMATIC", "foo-42")
+
+    assert deployment_id == "deployment-id"
+    assert requests_post.call_args.args[0] == "https://central.example.com/api/v1/publisher/upload"
+    assert requests_post.call_args.kwargs['params'] == {'publishingType': 'AUTOMATIC', 'name': 'foo-42'}
+    boundary = sent['headers']['Content-Type'].split("boundary=")[1]
+    body = sent['body']
+    assert body.startswith(f"--{boundary}\r\n".encode())
+    assert b'name="bundle"; filename="central-bundle.zip"' in body
+    zip_content = body[body.index(b"\r\n\r\n") + 4:-len(f"\r\n--{boundary}--\r\n")]
+    assert len(zipfile.ZipFile(io.BytesIO(zip_content)).namelist()) == 7
+
+
+def test_streaming_upload_fails_on_rejected_bundle(local_repo):
+    def post(url, params, headers, data):
+        b"".join(data)
+        return MagicMock(status_code=400, text="invalid bundle")
+
+    with patch('release.utils.central_bundle.requests.post', side_effect=post):
+        with pytest.raises(Exception, match="upload failed with status 400"):
+            StreamingBundleUpload("https://central.example.com", "token").upload(str(local_repo), "AUTOMATIC", "foo")
+
+
+def test_streaming_upload_aborts_the_request_when_the_bundle_cannot_be_written(local_repo):
+    sent = []
+
+    def post(url, params, headers, data):
+        for chunk in data:
+            sent.append(chunk)
+        return MagicMock(status_code=201, text="deployment-id")
+
+    with patch('release.utils.central_bundle.write_bundle', side_effect=OSError("disk error")), \
+            patch('release.utils.central_bundle.requests.post', side_effect=post):
+        with pytest.raises(Exception, match="failed to create the bundle: disk error"):
+            StreamingBundleUpload("https://central.example.com", "token").upload(str(local_repo), "AUTOMATIC", "foo")
+
+    assert not any(chunk.endswith(b"--\r\n") for chunk in sent), "the closing boundary must not be sent"
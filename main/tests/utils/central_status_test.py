@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from release.utils.central_status import DeploymentStatusPoller, retry_after_seconds
+
+
+def status_response(state=None, status_code=200, retry_after=None):
+    return MagicMock(ok=200 <= status_code < 300, status_code=status_code, text=f"state {state}",
+                     headers={'Retry-After': retry_after} if retry_after else {},
+                     **{'json.return_value': {'deploymentState': state}})
+
+
+def test_wait_backs_off_and_honors_retry_after(capsys):
+    responses = [status_response('PENDING'), status_response('VALIDATING'), status_response('VALIDATING'),
+                 status_response(status_code=429, retry_after='7'), status_response('VALIDATING'),
+                 status_response('PUBLISHING')]
+    with patch('release.utils.central_status.requests.post', side_effect=responses) as post, \
+            patch('polling.time.sleep') as sleep:
+        poller = DeploymentStatusPoller('https://central.example.com/', 'token')
+        state = poller.wait('deployment-id')
+
+    assert state == 'PUBLISHING'
+    post.assert_called_with('https://central.example.com/api/v1/publisher/status', params={'id': 'deployment-id'},
+                            headers={'Authorization': 'Bearer token'})
+    assert [c.args[0] for c in sleep.call_args_list] == [1, 1.5, 2.25, 3.375, 7]
+    assert set(poller.timings) == {'PENDING', 'VALIDATING', 'PUBLISHING'}
+    assert "6 status requests" in capsys.readouterr().err
+
+
+def test_wait_goes_on_after_transient_errors(capsys):
+    not_json = status_response('PENDING')
+    not_json.json.side_effect = ValueError("Expecting value")
+    responses = [requests.ConnectionError("connection reset"), not_json, status_response('VALIDATED')]
+    with patch('release.utils.central_status.requests.post', side_effect=responses), patch('polling.time.sleep'):
+        state = DeploymentStatusPoller('https://central.example.com', 'token').wait('deployment-id')
+
+    assert state == 'VALIDATED'
+    err = capsys.readouterr().err
+    assert "Warning: status check failed: connection reset" in err
+    assert "Warning: status check failed: Expecting value" in err
+
+
+def test_wait_fails_on_failed_deployment():
+    with patch('release.utils.central_status.requests.post', return_value=status_response('FAILED')), \
+            patch('polling.time.sleep'):
+        with pytest.raises(Exception, match="deployment deployment-id failed"):
+            DeploymentStatusPoller('https://central.example.com', 'token').wait('deployment-id')
+
+
+def test_next_step_is_capped_per_state():
+    poller = DeploymentStatusPoller('https://central.example.com', 'token')
+    poller.state = 'PENDING'
+    assert poller.next_step(4) == 5
+    poller.state = 'VALIDATING'
+    assert poller.next_step(12) == 15
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds('12') == 12
+    assert retry_after_seconds('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert retry_after_seconds('soon') is None
+    assert retry_after_seconds(None) is None
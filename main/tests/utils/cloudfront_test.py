@@ -0,0 +1,62 @@
+from unittest.mock import MagicMock
+
+from release.utils.cloudfront import INVALIDATION_MAX_PATHS, InvalidationManager
+
+
+def cloudfront_client():
+    client = MagicMock()
+    client.create_invalidation.side_effect = lambda **kwargs: {
+        'Location': f"URI_{kwargs['DistributionId']}",
+        'Invalidation': {'Id': f"I{client.create_invalidation.call_count}"}
+    }
+    return client
+
+
+def test_paths_are_batched_per_distribution_with_unique_references():
+    client = cloudfront_client()
+    invalidations = InvalidationManager(client)
+    invalidations.add('D1', '/a.xml', '/b.xml')
+    invalidations.add('D2', '/c.xml')
+    invalidations.add('D1', '/a.xml')
+
+    assert invalidations.submit() == [('D1', 'I1'), ('D2', 'I2')]
+
+    batches = [kwargs['InvalidationBatch'] for _, kwargs in client.create_invalidation.call_args_list]
+    assert batches[0]['Paths'] == {'Quantity': 2, 'Items': ['/a.xml', '/b.xml']}
+    assert batches[1]['Paths'] == {'Quantity': 1, 'Items': ['/c.xml']}
+    assert batches[0]['CallerReference'] != batches[1]['CallerReference']
+    assert batches[0]['CallerReference'].startswith('gh-action_release-')
+    assert invalidations.paths == {}
+    client.get_waiter.assert_not_called()
+
+
+def test_paths_above_the_limit_are_split():
+    client = cloudfront_client()
+    invalidations = InvalidationManager(client)
+    invalidations.add('D1', *[f"/{i}" for i in range(INVALIDATION_MAX_PATHS + 1)])
+
+    invalidations.submit()
+
+    quantities = [kwargs['InvalidationBatch']['Paths']['Quantity']
+                  for _, kwargs in client.create_invalidation.call_args_list]
+    assert quantities == [INVALIDATION_MAX_PATHS, 1]
+
+
+def test_submit_waits_for_completion():
+    client = cloudfront_client()
+    invalidations = InvalidationManager(client)
+    invalidations.add('D1', '/a.xml')
+
+    invalidations.submit(wait=True)
+
+    client.get_waiter.assert_called_once_with('invalidation_completed')
+    _, kwargs = client.get_waiter.return_value.wait.call_args
+    assert kwargs['DistributionId'] == 'D1'
+    assert kwargs['Id'] == 'I1'
+
+
+def test_nothing_is_submitted_without_paths():
+    client = cloudfront_client()
+
+    assert InvalidationManager(client).submit(wait=True) == []
+    client.create_invalidation.assert_not_called()
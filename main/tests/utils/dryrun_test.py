@@ -2,6 +2,7 @@ import io
 import os
 import unittest
 from contextlib import redirect_stdout
+from unittest.mock import patch
 
 from parameterized import parameterized
 from release.utils.dryrun import DryRunHelper
@@ -48,3 +49,11 @@ class DryRunUtilTest(unittest.TestCase):
 
             printed_text = captured_output.getvalue()
             self.assertFalse(printed_text.startswith(DryRunHelper.disclaimer_message))
+
+    @patch.dict(os.environ, {"INPUT_DRY_RUN": "false", "INPUT_DRY_RUN_PROBE": "true"})
+    def test_is_probe_enabled_should_return_false_given_dry_run_is_false(self):
+        self.assertFalse(DryRunHelper.is_probe_enabled())
+
+    @patch.dict(os.environ, {"INPUT_DRY_RUN": "true", "INPUT_DRY_RUN_PROBE": "true"})
+    def test_is_probe_enabled_should_return_true_given_dry_run_is_true(self):
+        self.assertTrue(DryRunHelper.is_probe_enabled())
@@ -0,0 +1,98 @@
+import hashlib
+import io
+import json
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+import pytest
+from pytest import fixture
+
+from release.utils.javadoc import JavadocPublisher
+
+
+@fixture
+def javadoc_dir(tmp_path):
+    (tmp_path / "org/sonar").mkdir(parents=True)
+    (tmp_path / "index.html").write_text("<html></html>")
+    (tmp_path / "org/sonar/Plugin.html").write_text("<html></html>")
+    (tmp_path / "stylesheet.css").write_text("body {}")
+    return tmp_path
+
+
+@fixture
+def s3_client():
+    paginator = MagicMock(**{'paginate.return_value': [
+        {'Contents': [{'Key': 'project/latest/index.html'}, {'Key': 'project/latest/removed.html'}]},
+        {'Contents': [{'Key': 'project/latest/org/sonar/Removed.html'}]},
+    ]})
+    return MagicMock(**{'get_paginator.return_value': paginator, 'delete_objects.return_value': {},
+                        'get_object.side_effect': ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')})
+
+
+def test_publish_uploads_once_copies_latest_and_prunes_stale_keys(javadoc_dir, s3_client):
+    timings = JavadocPublisher(s3_client, 'bucket', 'project', max_workers=2).publish(str(javadoc_dir), '1.0.0.42')
+
+    assert s3_client.upload_file.call_count == 3
+    s3_client.upload_file.assert_any_call(str(javadoc_dir / "org/sonar/Plugin.html"), 'bucket',
+                                          'project/1.0.0.42/org/sonar/Plugin.html',
+                                          ExtraArgs={'ContentType': 'text/html'})
+    s3_client.upload_file.assert_any_call(str(javadoc_dir / "stylesheet.css"), 'bucket',
+                                          'project/1.0.0.42/stylesheet.css', ExtraArgs={'ContentType': 'text/css'})
+    assert s3_client.copy_object.call_count == 3
+    s3_client.copy_object.assert_any_call(Bucket='bucket', Key='project/latest/index.html',
+                                          CopySource={'Bucket': 'bucket', 'Key': 'project/1.0.0.42/index.html'})
+    s3_client.get_paginator.return_value.paginate.assert_called_once_with(Bucket='bucket', Prefix='project/latest/')
+    s3_client.delete_objects.assert_called_once_with(Bucket='bucket', Delete={
+        'Objects': [{'Key': 'project/latest/org/sonar/Removed.html'}, {'Key': 'project/latest/removed.html'}]})
+    assert list(timings) == ['hash', 'upload', 'copy', 'prune']
+    manifest = json.loads(s3_client.put_object.call_args.kwargs['Body'])
+    assert manifest['version'] == '1.0.0.42'
+    assert manifest['files']['stylesheet.css'] == hashlib.sha256(b"body {}").hexdigest()
+
+
+def test_publish_without_stale_keys_deletes_nothing(javadoc_dir, s3_client):
+    s3_client.get_paginator.return_value.paginate.return_value = [{'Contents': [{'Key': 'project/latest/index.html'}]}]
+
+    JavadocPublisher(s3_client, 'bucket', 'project').publish(str(javadoc_dir), '1.0.0.42')
+
+    s3_client.delete_objects.assert_not_called()
+
+
+def test_publish_uploads_only_the_files_changed_since_the_previous_version(javadoc_dir, s3_client):
+    s3_client.get_object.side_effect = None
+    s3_client.get_object.return_value = {'Body': io.BytesIO(json.dumps({"version": "1.0.0.41", "files": {
+        "index.html": hashlib.sha256(b"<html>previous</html>").hexdigest(),
+        "stylesheet.css": hashlib.sha256(b"body {}").hexdigest(),
+    }}).encode())}
+
+    JavadocPublisher(s3_client, 'bucket', 'project').publish(str(javadoc_dir), '1.0.0.42')
+
+    assert sorted(c.args[2] for c in s3_client.upload_file.call_args_list) == [
+        'project/1.0.0.42/index.html', 'project/1.0.0.42/org/sonar/Plugin.html']
+    # the unchanged file is copied from the previous version, and is already up-to-date in latest
+    s3_client.copy_object.assert_any_call(Bucket='bucket', Key='project/1.0.0.42/stylesheet.css',
+                                          CopySource={'Bucket': 'bucket', 'Key': 'project/1.0.0.41/stylesheet.css'})
+    assert sorted(c.kwargs['Key'] for c in s3_client.copy_object.call_args_list) == [
+        'project/1.0.0.42/stylesheet.css', 'project/latest/index.html', 'project/latest/org/sonar/Plugin.html']
+    # the manifest is removed before latest changes, and written again once latest is complete
+    calls = [(name, kwargs.get('Key')) for name, _, kwargs in s3_client.mock_calls
+             if name in ('delete_object', 'copy_object', 'put_object')]
+    assert calls.index(('delete_object', 'project/javadoc-manifest.json')) < \
+        calls.index(('copy_object', 'project/latest/index.html'))
+    assert calls[-1] == ('put_object', 'project/javadoc-manifest.json')
+
+
+def test_failed_publication_leaves_no_manifest(javadoc_dir, s3_client):
+    s3_client.get_object.side_effect = None
+    s3_client.get_object.return_value = {'Body': io.BytesIO(json.dumps({"version": "1.0.0.41", "files": {
+        "stylesheet.css": hashlib.sha256(b"body {}").hexdigest()}}).encode())}
+    def copy_object(Bucket, Key, CopySource):
+        if Key.startswith('project/latest/'):
+            raise Exception("access denied")
+    s3_client.copy_object.side_effect = copy_object
+
+    with pytest.raises(Exception, match="access denied"):
+        JavadocPublisher(s3_client, 'bucket', 'project').publish(str(javadoc_dir), '1.0.0.42')
+
+    s3_client.delete_object.assert_called_once_with(Bucket='bucket', Key='project/javadoc-manifest.json')
+    s3_client.put_object.assert_not_called()
@@ -0,0 +1,53 @@
+from unittest.mock import MagicMock
+from xml.dom.minidom import parseString
+
+import pytest
+from botocore.exceptions import ClientError
+
+from release.utils.p2_composite import CompositeTemplate, composite_template, read_composite, rolling_children
+
+PINNED = "https://binaries.sonarsource.com/SonarLint-for-Eclipse/releases/6.2.0.37299/"
+RELEASES = "https://binaries.sonarsource.com/SonarLint-for-Eclipse/releases"
+
+
+def test_template_is_parsed_once():
+    assert composite_template('compositeContent.xml') is composite_template('compositeContent.xml')
+    assert composite_template('compositeContent.xml').pinned == [PINNED]
+
+
+def test_render_keeps_the_pinned_children_and_comments():
+    content = composite_template('compositeArtifacts.xml').render('1234', [f"{RELEASES}/10.0/", f"{RELEASES}/10.1/"])
+
+    document = parseString(content)
+    assert document.getElementsByTagName('property')[0].getAttribute('value') == '1234'
+    assert document.getElementsByTagName('children')[0].getAttribute('size') == '3'
+    assert [c.getAttribute('location') for c in document.getElementsByTagName('child')] == \
+        [PINNED, f"{RELEASES}/10.0/", f"{RELEASES}/10.1/"]
+    assert b"<!-- The latest release -->" in content
+
+
+def test_released_children_of_a_rendered_file():
+    template = composite_template('compositeContent.xml')
+    content = template.render('1', [f"{RELEASES}/10.0/"]).decode('utf-8')
+
+    assert template.released_children(content) == [f"{RELEASES}/10.0/"]
+
+
+def test_rolling_children():
+    assert rolling_children([], 'c') == ['c']
+    assert rolling_children(['a', 'b'], 'c', keep=2) == ['b', 'c']
+    assert rolling_children(['a', 'c'], 'c', keep=3) == ['a', 'c']
+
+
+def test_invalid_template():
+    with pytest.raises(Exception, match="Composite template"):
+        CompositeTemplate("<repository/>")
+
+
+def test_read_composite():
+    client = MagicMock()
+    client.get_object.return_value = {'Body': MagicMock(**{'read.return_value': b'<repository/>'})}
+    assert read_composite(client, 'bucket', 'key') == '<repository/>'
+
+    client.get_object.side_effect = ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+    assert read_composite(client, 'bucket', 'key') is None
@@ -0,0 +1,75 @@
+from unittest.mock import MagicMock, patch
+
+from pytest import fixture
+
+from release.steps.ReleaseRequest import ReleaseRequest
+from release.utils.buildinfo import BuildInfo
+from release.utils.probe import ReleaseProbe
+from release.utils.profiles import profile_for
+
+
+@fixture
+def release_request():
+    return ReleaseRequest('org', 'project', '1.0.0.42', '42', 'branch', 'sha')
+
+
+@fixture
+def buildinfo():
+    return BuildInfo({
+        "buildInfo": {
+            "properties": {
+                "buildInfo.env.ARTIFACTORY_DEPLOY_REPO": "sonarsource-public-qa",
+            },
+            "modules": [{
+                "properties": {
+                    "artifactsToPublish": "org.sonarsource.sonarqube:sonar-application:zip,org.sonarsource.foo:foo:jar:linux-x64",
+                },
+                "id": "org.sonarsource.sonarqube:sonar-application:1.0.0.42",
+            }]
+        }
+    })
+
+
+def test_probe_reports_sizes_destinations_and_estimate(release_request, buildinfo, capsys):
+    artifactory = MagicMock(**{
+        'artifact_url.side_effect': lambda repo, gid, aid, qual, ext, version: f"{repo}/{aid}",
+        'head_artifact.side_effect': [3 * 1024 * 1024, 1024 * 1024],
+        'find_sbom_filename.return_value': None,
+        'measure_download_throughput.return_value': 1024 * 1024,
+    })
+    binaries = MagicMock(**{'list_destination.return_value': []})
+    with patch('release.utils.probe.set_output') as set_output:
+        probes = ReleaseProbe(artifactory, binaries).run(release_request, buildinfo)
+
+    # Artifacts are not promoted during a dry run: they are looked up in the builds repository.
+    artifactory.head_artifact.assert_any_call(
+        'sonarsource-public-builds', 'org.sonarsource.sonarqube', 'sonar-application', '', 'zip', '1.0.0.42')
+    # The binaries destination uses the renamed sonarqube artifact.
+    binaries.list_destination.assert_any_call(
+        'sonarqube-1.0.0.42.zip', 'org.sonarsource.sonarqube', 'sonarqube', '1.0.0.42', '',
+        profile=profile_for('org.sonarsource.sonarqube', 'sonar-application'))
+    # Only the largest artifact is sampled.
+    artifactory.measure_download_throughput.assert_called_once_with('sonarsource-public-builds/sonar-application',
+                                                                     3 * 1024 * 1024)
+    assert [p.size for p in probes] == [3 * 1024 * 1024, 1024 * 1024]
+    set_output.assert_any_call("probe_total_bytes", 4 * 1024 * 1024)
+    set_output.assert_any_call("probe_missing_artifacts", "")
+    set_output.assert_any_call("probe_estimated_seconds", 8)
+    assert "2 artifacts, 0 missing, 4194304 bytes to transfer" in capsys.readouterr().out
+
+
+def test_probe_warns_about_missing_artifacts(release_request, buildinfo, capsys):
+    artifactory = MagicMock(**{
+        'artifact_url.return_value': 'url',
+        'head_artifact.side_effect': [None, None],
+        'find_sbom_filename.return_value': None,
+    })
+    with patch('release.utils.probe.set_output') as set_output:
+        ReleaseProbe(artifactory).run(release_request, buildinfo)
+
+    artifactory.measure_download_throughput.assert_not_called()
+    set_output.assert_any_call("probe_missing_artifacts",
+                               "org.sonarsource.sonarqube:sonar-application:zip,org.sonarsource.foo:foo:jar:linux-x64")
+    captured = capsys.readouterr().out
+    assert "::warning::org.sonarsource.sonarqube:sonar-application:zip is missing on Repox (url)" in captured
+    assert "could not measure the download throughput" in captured
@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+import pytest
+
+from release.utils.profiles import ANY_GROUP, PublishingProfile, profile_for, registry
+
+
+def test_profiles_match_the_artifact_of_any_group():
+    assert profile_for('org.sonarsource.sonarqube', 'sonarqube-cli').is_hierarchical('linux-x64') is True
+    assert profile_for('org.sonarsource.sonarqube', 'sonarqube-cli').is_hierarchical('') is False
+    assert profile_for('org.sonarsource.scanner.cli', 'sonar-scanner-cli').is_hierarchical('linux-x64') is False
+    assert profile_for('whatever', 'sonarqube-cli') is profile_for('org.sonarsource.sonarqube', 'sonarqube-cli')
+    assert profile_for('org.sonarsource.dummy', 'dummy') is registry()[0]
+
+
+def test_profile_of_the_group_is_preferred():
+    default = PublishingProfile("{repo}/{aid}", "flat", [], [], [], False)
+    grouped = PublishingProfile("{repo}/{aid}", "platform", [], [], [], False)
+    any_group = PublishingProfile("{repo}/{aid}", "flat", [], [], [], False)
+    profiles = {('org.sonarsource.foo', 'foo'): grouped, (ANY_GROUP, 'foo'): any_group}
+    with patch('release.utils.profiles.registry', return_value=(default, profiles)):
+        assert profile_for('org.sonarsource.foo', 'foo') is grouped
+        assert profile_for('org.sonarsource.bar', 'foo') is any_group
+        assert profile_for('org.sonarsource.foo', 'bar') is default
+
+
+def test_binaries_filename():
+    assert profile_for('org.sonarsource.sonarqube', 'sonar-application').binaries_filename(
+        'sonar-application', '10.0.0.66185', 'zip', '') == ('sonarqube-10.0.0.66185.zip', 'sonarqube')
+    assert profile_for('org.sonarsource.dummy', 'dummy').binaries_filename(
+        'dummy', '1.0', 'jar', 'sources') == ('dummy-1.0-sources.jar', 'dummy')
+
+
+def test_root_bucket_key_and_checksums():
+    reddeer = profile_for('org.sonarsource.eclipse.reddeer', 'org.eclipse.reddeer.site')
+    assert reddeer.root_bucket_key('Distribution', 'org.eclipse.reddeer.site') == 'RedDeer/releases'
+    assert reddeer.checksums == ['md5', 'sha1', 'sha256']
+    default = profile_for('com.sonarsource.dummy', 'dummy')
+    assert default.root_bucket_key('CommercialDistribution', 'dummy') == 'CommercialDistribution/dummy'
+    assert default.checksums == ['md5', 'sha1', 'sha256', 'asc']
+
+
+def test_profiles_are_validated():
+    with pytest.raises(Exception, match="unknown hooks unzip"):
+        PublishingProfile("{repo}/{aid}", "flat", [], ["unzip"], [], False)
+    with pytest.raises(Exception, match="unknown layout nested"):
+        PublishingProfile("{repo}/{aid}", "nested", [], [], [], False)
@@ -0,0 +1,55 @@
+from release.utils.progress import MB, TransferProgress
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_progress_is_throttled_and_reports_throughput_and_eta(capsys):
+    clock = FakeClock()
+    progress = TransferProgress(interval=10, clock=clock)
+    transfer = progress.start("sonarqube-10.0.zip", "download", 600 * MB)
+
+    clock.now = 5
+    progress.update(transfer, 50 * MB)
+    assert capsys.readouterr().out == ""
+
+    clock.now = 10
+    progress.update(transfer, 50 * MB)
+    assert capsys.readouterr().out == \
+        "download sonarqube-10.0.zip: 100.0/600.0 MB (16%), 10.0 MB/s, ETA 50s\n"
+
+
+def test_progress_aggregates_concurrent_transfers(capsys):
+    clock = FakeClock()
+    progress = TransferProgress(interval=10, clock=clock)
+    download = progress.start("a.jar", "download")
+    upload = progress.start("b.jar", "upload", 40 * MB)
+    progress.update(upload, 20 * MB)
+
+    clock.now = 10
+    progress.update(download, 30 * MB)
+    assert capsys.readouterr().out == \
+        "download a.jar: 30.0 MB, 3.0 MB/s | 2 transfers: 50.0 MB, 5.0 MB/s\n"
+
+
+def test_report_prints_the_finished_transfers(capsys):
+    clock = FakeClock()
+    progress = TransferProgress(clock=clock)
+    transfer = progress.start("a.jar", "upload", 8 * MB)
+    progress.start("pending.jar", "download")
+    progress.update(transfer, 8 * MB)
+    clock.now = 4
+    progress.finish(transfer)
+
+    progress.report()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["transfer", "direction", "MB", "seconds", "MB/s"]
+    assert lines[1].split() == ["a.jar", "upload", "8.0", "4.0", "2.0"]
+    assert len(lines) == 2
+    assert [t.name for t in progress.transfers] == ["pending.jar"]
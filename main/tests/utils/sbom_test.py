@@ -0,0 +1,45 @@
+import gzip
+import hashlib
+import json
+from unittest.mock import patch
+
+from release.utils.sbom import compress_sbom, is_compression_enabled
+
+
+def test_json_sbom_is_minified_and_compressed(tmp_path):
+    sbom = tmp_path / "sonar-dummy-1.0-cyclonedx.json"
+    document = {"bomFormat": "CycloneDX", "components": [{"name": "é"}]}
+    sbom.write_text(json.dumps(document, indent=4), encoding='utf-8')
+    original = sbom.read_bytes()
+
+    compressed, extra_args = compress_sbom(str(sbom), ["md5", "sha256"])
+
+    assert extra_args == {'ContentEncoding': 'gzip', 'ContentType': 'application/json'}
+    content = gzip.decompress(open(compressed, 'rb').read())
+    assert content == '{"bomFormat":"CycloneDX","components":[{"name":"é"}]}'.encode('utf-8')
+    # the checksums match the file saved by a client decoding the Content-Encoding
+    assert open(f"{compressed}.md5").read() == hashlib.md5(content).hexdigest()
+    assert open(f"{compressed}.sha256").read() == hashlib.sha256(content).hexdigest()
+    assert sbom.read_bytes() == original
+
+
+def test_xml_sbom_is_not_compressed(tmp_path):
+    sbom = tmp_path / "sonar-dummy-1.0-cyclonedx.xml"
+    sbom.write_text('<?xml version="1.0"?>\n<bom xmlns="http://cyclonedx.org/schema/bom/1.5">\n</bom>\n')
+
+    assert compress_sbom(str(sbom), ["md5"]) is None
+    assert [p.name for p in tmp_path.iterdir()] == [sbom.name]
+
+
+def test_compression_is_deterministic(tmp_path):
+    sbom = tmp_path / "sbom.json"
+    sbom.write_text('{"a": 1}')
+    first = open(compress_sbom(str(sbom), [])[0], 'rb').read()
+    assert open(compress_sbom(str(sbom), [])[0], 'rb').read() == first
+
+
+def test_compression_is_opt_in():
+    with patch.dict('os.environ', {}, clear=True):
+        assert not is_compression_enabled()
+    with patch.dict('os.environ', {'INPUT_COMPRESS_SBOM': 'true'}):
+        assert is_compression_enabled()
@@ -0,0 +1,102 @@
+import threading
+from unittest.mock import MagicMock, call
+
+from release.utils.slack import SlackNotifier
+
+
+def test_notifications_are_sent_in_the_background_and_progress_edits_one_message():
+    client = MagicMock(**{'chat_postMessage.return_value': {'channel': 'C123', 'ts': '1.0'}})
+    notifier = SlackNotifier(client, '#channel')
+
+    notifier.progress('promote', 'promoting')
+    notifier.flush()
+    notifier.progress('promote', 'done')
+    notifier.flush()
+    notifier.progress('publish', '1/2 artifacts')
+    notifier.notify('Successfully released project:1.0.0.42')
+    notifier.flush()
+
+    assert client.chat_postMessage.call_args_list == [
+        call(channel='#channel', text='promote: promoting'),
+        call(channel='#channel', text='Successfully released project:1.0.0.42'),
+    ]
+    assert client.chat_update.call_args_list == [
+        call(channel='C123', ts='1.0', text='promote: done'),
+        call(channel='C123', ts='1.0', text='promote: done\npublish: 1/2 artifacts'),
+    ]
+
+
+def test_only_the_latest_progress_is_sent_and_messages_go_first():
+    sending = threading.Event()
+    posted = threading.Event()
+
+    def post_message(**kwargs):
+        posted.set()
+        sending.wait(1)
+        return {'channel': 'C123', 'ts': '1.0'}
+
+    client = MagicMock(**{'chat_postMessage.side_effect': post_message})
+    notifier = SlackNotifier(client, '#channel')
+
+    notifier.progress('publish', '0/500 artifacts')
+    assert posted.wait(1)
+    for i in range(1, 501):
+        notifier.progress('publish', f"{i}/500 artifacts")
+        notifier.progress('sbom', f"a{i}: published")
+    notifier.notify('Successfully released project:1.0.0.42')
+    sending.set()
+    notifier.flush()
+
+    assert client.chat_postMessage.call_args_list == [
+        call(channel='#channel', text='publish: 0/500 artifacts'),
+        call(channel='#channel', text='Successfully released project:1.0.0.42'),
+    ]
+    assert client.chat_update.call_args_list == [
+        call(channel='C123', ts='1.0', text='publish: 500/500 artifacts\nsbom: a500: published'),
+    ]
+
+
+def test_flush_gives_up_after_timeout(capsys):
+    client = MagicMock(**{'chat_postMessage.side_effect': lambda **kwargs: threading.Event().wait(1)})
+    notifier = SlackNotifier(client, '#channel', flush_timeout=0.1)
+
+    notifier.notify('slow')
+    notifier.notify('waiting')
+    notifier.flush()
+
+    assert "Could not notify slack: 1 pending notifications were not sent in time" in capsys.readouterr().out
+
+
+def test_the_oldest_messages_are_dropped_beyond_the_limit(capsys):
+    sending = threading.Event()
+    posted = threading.Event()
+
+    def post_message(**kwargs):
+        posted.set()
+        sending.wait(1)
+        return {'channel': 'C123', 'ts': '1.0'}
+
+    client = MagicMock(**{'chat_postMessage.side_effect': post_message})
+    notifier = SlackNotifier(client, '#channel', max_pending_messages=2)
+
+    notifier.notify('first')
+    assert posted.wait(1)
+    for i in range(5):
+        notifier.notify(f"message {i}")
+    sending.set()
+    notifier.flush()
+
+    assert [c.kwargs['text'] for c in client.chat_postMessage.call_args_list] == ['first', 'message 3', 'message 4']
+    assert "Could not notify slack: 3 messages were dropped, more than 2 were waiting to be sent" \
+           in capsys.readouterr().out
+
+
+def test_nothing_is_sent_without_channel():
+    client = MagicMock()
+    notifier = SlackNotifier(client, None)
+
+    notifier.notify('message')
+    notifier.flush()
+
+    assert notifier.thread is None
+    client.chat_postMessage.assert_not_called()
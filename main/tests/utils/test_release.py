@@ -1,11 +1,17 @@
+import os
 import tempfile
-from unittest.mock import MagicMock, patch
+import threading
+from unittest.mock import ANY, MagicMock, patch
 
-from pytest import fixture
+import dryable
+import requests
+from pytest import fixture, raises
 
 from release.utils.binaries import Binaries
 from release.utils.buildinfo import BuildInfo
-from release.utils.release import publish_artifact
+from release.utils.profiles import profile_for
+from release.utils.release import (SbomStage, publish_all_artifacts_to_binaries, publish_artifact, revoke_artifacts,
+                                   revoke_release)
 
 
 @fixture
@@ -102,7 +108,7 @@ def test_publish_artifact_s3_upload(buildinfo_com, buildinfo_org, capsys):
             # com
             publish_artifact(artifactory, binaries, buildinfo_com.get_artifacts_to_publish(), version, "repo")
             s3_upload.assert_called_once_with("/tmp/dummy-1.0.2.456.jar", "dummy-1.0.2.456.jar", "com.sonarsource.dummy", "dummy",
-                                              "1.0.2.456", "")
+                                              "1.0.2.456", "", profile=profile_for("com.sonarsource.dummy", "dummy"))
             captured = capsys.readouterr().out.split('\n')
             assert captured[0] == "publishing com.sonarsource.dummy:dummy:jar#1.0.2.456"
             assert captured[1] == "com.sonarsource.dummy dummy jar "
@@ -110,7 +116,7 @@ def test_publish_artifact_s3_upload(buildinfo_com, buildinfo_org, capsys):
             # org
             publish_artifact(artifactory, binaries, buildinfo_org.get_artifacts_to_publish(), version, "repo")
             s3_upload.assert_called_with("/tmp/dummy-1.0.2.456.jar", "dummy-1.0.2.456-qualifier.jar", "org.sonarsource.dummy", "dummy",
-                                         "1.0.2.456", "qualifier")
+                                         "1.0.2.456", "qualifier", profile=profile_for("org.sonarsource.dummy", "dummy"))
             captured = capsys.readouterr().out.split('\n')
             assert captured[0] == "publishing org.sonarsource.dummy:dummy:jar:qualifier#1.0.2.456"
             assert captured[1] == "org.sonarsource.dummy dummy jar qualifier"
@@ -125,8 +131,10 @@ def test_publish_artifact_s3_upload_sonarqube(buildinfo_sonarqube, capsys):
         version = buildinfo_sonarqube.get_version()
         with patch('release.utils.binaries.Binaries.s3_upload') as s3_upload:
             publish_artifact(artifactory, binaries, buildinfo_sonarqube.get_artifacts_to_publish(), version, "repo")
+            # the profile is the one of the Repox artifact ID, not of the renamed one
             s3_upload.assert_called_once_with("/tmp/sonarqube-10.0.0.66185.zip", "sonarqube-10.0.0.66185.zip", 'org.sonarsource.sonarqube',
-                                              'sonarqube', '10.0.0.66185', '')
+                                              'sonarqube', '10.0.0.66185', '',
+                                              profile=profile_for('org.sonarsource.sonarqube', 'sonar-application'))
             captured = capsys.readouterr().out.split('\n')
             assert captured[0] == "publishing org.sonarsource.sonarqube:sonar-application:zip#10.0.0.66185"
             assert captured[1] == "org.sonarsource.sonarqube sonar-application zip "
@@ -147,7 +155,8 @@ def test_publish_artifact_upload_file_sonarqube_cli(buildinfo_sonarqube_cli, cap
             publish_artifact(artifactory, binaries, buildinfo_sonarqube_cli.get_artifacts_to_publish(), version, "repo")
             upload_file.assert_called_with(
                 '/tmp/sonarqube-cli-0.6.0.500-linux-x64.zip.asc', 'test_bucket',
-                'Distribution/sonarqube-cli/0.6.0.500/linux/sonarqube-cli-0.6.0.500-linux-x64.zip.asc')
+                'Distribution/sonarqube-cli/0.6.0.500/linux/sonarqube-cli-0.6.0.500-linux-x64.zip.asc',
+                Callback=ANY, Config=ANY)
             captured = capsys.readouterr().out.split('\n')
             assert captured[0] == 'publishing org.sonarsource.sonarqube:sonarqube-cli:zip:linux-x64#0.6.0.500'
             assert captured[1] == 'org.sonarsource.sonarqube sonarqube-cli zip linux-x64'
@@ -171,7 +180,8 @@ def test_publish_artifact_upload_file(buildinfo_com, buildinfo_org, capsys):
             version = buildinfo_com.get_version()
             publish_artifact(artifactory, binaries, buildinfo_com.get_artifacts_to_publish(), version, "repo")
             upload_file.assert_called_with('/tmp/dummy-1.0.2.456.jar.asc', 'test_bucket',
-                                           'CommercialDistribution/dummy/dummy-1.0.2.456.jar.asc')
+                                           'CommercialDistribution/dummy/dummy-1.0.2.456.jar.asc',
+                                           Callback=ANY, Config=ANY)
             captured = capsys.readouterr().out.split('\n')
             assert captured[0] == 'publishing com.sonarsource.dummy:dummy:jar#1.0.2.456'
             assert captured[1] == 'com.sonarsource.dummy dummy jar '
@@ -190,7 +200,8 @@ def test_publish_artifact_upload_file(buildinfo_com, buildinfo_org, capsys):
             version = buildinfo_org.get_version()
             publish_artifact(artifactory, binaries, buildinfo_org.get_artifacts_to_publish(), version, "repo")
             upload_file.assert_called_with('/tmp/dummy-1.0.2.456.jar.asc', 'test_bucket',
-                                           'Distribution/dummy/dummy-1.0.2.456-qualifier.jar.asc')
+                                           'Distribution/dummy/dummy-1.0.2.456-qualifier.jar.asc',
+                                           Callback=ANY, Config=ANY)
             captured = capsys.readouterr().out.split('\n')
             assert captured[0] == 'publishing org.sonarsource.dummy:dummy:jar:qualifier#1.0.2.456'
             assert captured[1] == 'org.sonarsource.dummy dummy jar qualifier'
@@ -221,7 +232,8 @@ def test_publish_artifact_upload_file_sonarlint(buildinfo_sonarlint, capsys):
             version = buildinfo_sonarlint.get_version()
             publish_artifact(artifactory, binaries, buildinfo_sonarlint.get_artifacts_to_publish(), version, "repo")
             upload_file.assert_called_with('/tmp/org.sonarlint.eclipse.site-7.9.0.63244.zip.asc', 'test_bucket',
-                                           'SonarLint-for-Eclipse/releases/org.sonarlint.eclipse.site-7.9.0.63244.zip.asc')
+                                           'SonarLint-for-Eclipse/releases/org.sonarlint.eclipse.site-7.9.0.63244.zip.asc',
+                                           Callback=ANY, Config=ANY)
             captured = capsys.readouterr().out.split('\n')
             assert captured[0] == 'publishing org.sonarsource.sonarlint.eclipse:org.sonarlint.eclipse.site:zip#7.9.0.63244'
             assert captured[1] == 'org.sonarsource.sonarlint.eclipse org.sonarlint.eclipse.site zip '
@@ -254,7 +266,8 @@ def test_publish_artifact_upload_file_reddeer(buildinfo_reddeer, capsys):
             version = buildinfo_reddeer.get_version()
             publish_artifact(artifactory, binaries, buildinfo_reddeer.get_artifacts_to_publish(), version, "repo")
             upload_file.assert_called_with('/tmp/org.eclipse.reddeer.site-4.7.0.53.zip.sha256', 'test_bucket',
-                                           'RedDeer/releases/org.eclipse.reddeer.site-4.7.0.53.zip.sha256')
+                                           'RedDeer/releases/org.eclipse.reddeer.site-4.7.0.53.zip.sha256',
+                                           Callback=ANY, Config=ANY)
             captured = capsys.readouterr().out.split('\n')
             assert captured[0] == 'publishing org.sonarsource.eclipse.reddeer:org.eclipse.reddeer.site:zip#4.7.0.53'
             assert captured[1] == 'org.sonarsource.eclipse.reddeer org.eclipse.reddeer.site zip '
@@ -270,8 +283,11 @@ def test_revoke_publish_artifact():
     binaries = MagicMock()
     publish_artifact(artifactory, binaries, "groupId:artefactId:ext", "version", "repo", True)
     artifactory.assert_not_called()
-    binaries.s3_delete.assert_called_once_with('artefactId-version.ext', 'groupId', 'artefactId', 'version', '')
-    binaries.s3_delete_sbom.assert_called_once_with('artefactId-version.sbom.json', 'groupId', 'artefactId', 'version', '')
+    profile = profile_for('groupId', 'artefactId')
+    binaries.s3_delete.assert_called_once_with('artefactId-version.ext', 'groupId', 'artefactId', 'version', '',
+                                               profile=profile)
+    binaries.s3_delete_sbom.assert_called_once_with('artefactId-version.sbom.json', 'groupId', 'artefactId', 'version',
+                                                    '', profile=profile)
 
 
 def test_publish_artifact_uploads_sbom(buildinfo_sonarqube):
@@ -295,12 +311,67 @@ def test_publish_artifact_uploads_sbom(buildinfo_sonarqube):
                 "repo", "org.sonarsource.sonarqube", "sonar-application", "10.0.0.66185")
             artifactory.download_named.assert_called_once_with(
                 "repo", "org.sonarsource.sonarqube", "sonar-application", "10.0.0.66185",
-                "sonar-application-10.0.0.66185-cyclonedx.json",
+                "sonar-application-10.0.0.66185-cyclonedx.json", ANY,
                 checksums=["md5", "sha1", "sha256"], optional_checksums=["asc"])
             # SBOM uploaded next to the binary with the normalized name + checksums (incl. .asc).
             sbom_key = "Distribution/sonarqube/sonarqube-10.0.0.66185.sbom.json"
-            upload_file.assert_any_call(sbom_local, "test_bucket", sbom_key)
-            upload_file.assert_any_call(f"{sbom_local}.asc", "test_bucket", f"{sbom_key}.asc")
+            upload_file.assert_any_call(sbom_local, "test_bucket", sbom_key, Callback=ANY, Config=ANY)
+            upload_file.assert_any_call(f"{sbom_local}.asc", "test_bucket", f"{sbom_key}.asc", Callback=ANY, Config=ANY)
+
+
+def test_publish_artifact_uploads_compressed_sbom(buildinfo_org, tmp_path):
+    sbom_local = tmp_path / "dummy-1.0.2.456-cyclonedx.json"
+    sbom_local.write_text('{"bomFormat": "CycloneDX"}')
+    artifactory = MagicMock(**{'download.return_value': "/tmp/dummy-1.0.2.456-qualifier.jar",
+                               'find_sbom_filename.return_value': "dummy-1.0.2.456-cyclonedx.json",
+                               'download_named.return_value': (str(sbom_local), ["asc"])})
+    binaries = MagicMock()
+    with patch.dict('os.environ', {'INPUT_COMPRESS_SBOM': 'true'}):
+        publish_artifact(artifactory, binaries, buildinfo_org.get_artifacts_to_publish(), "1.0.2.456", "repo")
+    # the signature of the original SBOM is not uploaded next to the compressed one
+    binaries.s3_upload_sbom.assert_called_once_with(
+        f"{sbom_local}.gz", "dummy-1.0.2.456-qualifier.sbom.json", "org.sonarsource.dummy", "dummy", "1.0.2.456",
+        "qualifier", checksums=["md5", "sha1", "sha256"],
+        extra_args={'ContentEncoding': 'gzip', 'ContentType': 'application/json'},
+        profile=profile_for("org.sonarsource.dummy", "dummy"))
+
+
+def test_publish_artifact_uploads_xml_sbom_unchanged(buildinfo_org, tmp_path):
+    sbom_local = tmp_path / "dummy-1.0.2.456-cyclonedx.xml"
+    sbom_local.write_text('<?xml version="1.0"?>\n<bom xmlns="http://cyclonedx.org/schema/bom/1.5"/>\n')
+    artifactory = MagicMock(**{'download.return_value': "/tmp/dummy-1.0.2.456-qualifier.jar",
+                               'find_sbom_filename.return_value': "dummy-1.0.2.456-cyclonedx.xml",
+                               'download_named.return_value': (str(sbom_local), ["asc"])})
+    binaries = MagicMock()
+    with patch.dict('os.environ', {'INPUT_COMPRESS_SBOM': 'true'}):
+        publish_artifact(artifactory, binaries, buildinfo_org.get_artifacts_to_publish(), "1.0.2.456", "repo")
+    binaries.s3_upload_sbom.assert_called_once_with(
+        str(sbom_local), "dummy-1.0.2.456-qualifier.sbom.json", "org.sonarsource.dummy", "dummy", "1.0.2.456",
+        "qualifier", checksums=["md5", "sha1", "sha256", "asc"], extra_args=None,
+        profile=profile_for("org.sonarsource.dummy", "dummy"))
+
+
+def test_publish_sbom_removes_its_download_folder(buildinfo_org):
+    downloaded = []
+
+    def download_named(repo, gid, aid, version, filename, directory, **kwargs):
+        sbom = os.path.join(directory, filename)
+        with open(sbom, 'w') as f:
+            f.write('{"bomFormat": "CycloneDX"}')
+        downloaded.append(sbom)
+        return sbom, []
+
+    artifactory = MagicMock(**{'download.return_value': "/tmp/dummy-1.0.2.456-qualifier.jar",
+                               'find_sbom_filename.return_value': "dummy-1.0.2.456-cyclonedx.json",
+                               'download_named.side_effect': download_named})
+    uploaded = []
+    binaries = MagicMock(**{'s3_upload_sbom.side_effect': lambda sbom_file, *args, **kwargs:
+                            uploaded.append(os.path.exists(sbom_file))})
+    with patch.dict('os.environ', {'INPUT_COMPRESS_SBOM': 'true'}):
+        publish_artifact(artifactory, binaries, buildinfo_org.get_artifacts_to_publish(), "1.0.2.456", "repo")
+    # the compressed SBOM is uploaded before its folder is removed
+    assert uploaded == [True]
+    assert not os.path.exists(os.path.dirname(downloaded[0]))
 
 
 def test_publish_artifact_skips_when_no_sbom(buildinfo_org, capsys):
@@ -316,3 +387,132 @@ def test_publish_artifact_skips_when_no_sbom(buildinfo_org, capsys):
         artifactory.download_named.assert_not_called()
         assert "no SBOM found for org.sonarsource.dummy:dummy:1.0.2.456 - skipping SBOM upload" \
                in capsys.readouterr().out
+
+
+def test_publish_all_artifacts_indexes_sboms_once():
+    dryable.set(False)
+    buildinfo = BuildInfo({
+        "buildInfo": {
+            "properties": {"buildInfo.env.ARTIFACTORY_DEPLOY_REPO": "sonarsource-public-qa"},
+            "modules": [{
+                "properties": {"artifactsToPublish": "org.sonarsource.a:a:jar,com.sonarsource.b:b:zip:linux-x64"},
+                "id": "org.sonarsource.a:a:1.0.0.1",
+            }]
+        }
+    })
+    artifactory = MagicMock()
+    with patch('release.utils.release.publish_artifact') as publish_artifact_mock:
+        publish_all_artifacts_to_binaries(artifactory, MagicMock(), MagicMock(), buildinfo)
+    artifactory.index_sbom_filenames.assert_called_once_with(
+        "sonarsource-public-releases", [("org.sonarsource.a", "a"), ("com.sonarsource.b", "b")], "1.0.0.1")
+    assert publish_artifact_mock.call_count == 2
+
+
+def test_publish_all_artifacts_goes_on_when_the_sbom_index_fails(capsys):
+    dryable.set(False)
+    buildinfo = BuildInfo({
+        "buildInfo": {
+            "properties": {"buildInfo.env.ARTIFACTORY_DEPLOY_REPO": "sonarsource-public-qa"},
+            "modules": [{
+                "properties": {"artifactsToPublish": "org.sonarsource.a:a:jar"},
+                "id": "org.sonarsource.a:a:1.0.0.1",
+            }]
+        }
+    })
+    artifactory = MagicMock(**{'index_sbom_filenames.side_effect': requests.ConnectionError("connection reset")})
+    with patch('release.utils.release.publish_artifact') as publish_artifact_mock:
+        publish_all_artifacts_to_binaries(artifactory, MagicMock(), MagicMock(), buildinfo)
+    assert publish_artifact_mock.call_count == 1
+    assert "could not index the SBOMs (connection reset)" in capsys.readouterr().out
+
+
+def test_sboms_are_published_while_the_next_binaries_upload(capsys):
+    dryable.set(False)
+    buildinfo = BuildInfo({
+        "buildInfo": {
+            "properties": {"buildInfo.env.ARTIFACTORY_DEPLOY_REPO": "sonarsource-public-qa"},
+            "modules": [{
+                "properties": {"artifactsToPublish": "org.sonarsource.a:a:jar,org.sonarsource.b:b:jar"},
+                "id": "org.sonarsource.a:a:1.0.0.1",
+            }]
+        }
+    })
+    second_upload = threading.Event()
+    binaries = MagicMock(**{'s3_upload.side_effect': lambda *args, **kwargs: args[1].startswith('b-') and second_upload.set()})
+    artifactory = MagicMock(**{
+        'download.return_value': "/tmp/artifact.jar",
+        # the SBOM of a is only found when the binary of b is uploaded meanwhile
+        'find_sbom_filename.side_effect': lambda repo, gid, aid, version: second_upload.wait(1) and f"{aid}.json",
+        'download_named.return_value': ("/tmp/sbom.json", []),
+    })
+    with patch.dict('os.environ', {}, clear=True):
+        publish_all_artifacts_to_binaries(artifactory, binaries, MagicMock(), buildinfo)
+    assert "SBOMs of 2 artifacts: 2 published, 0 missing, 0 failed" in capsys.readouterr().out
+    assert binaries.s3_upload_sbom.call_count == 2
+
+
+def test_sbom_stage_summarizes_the_results(capsys):
+    def find_sbom_filename(repo, gid, aid, version):
+        if aid == 'c':
+            raise Exception("timeout")
+        return None if aid == 'b' else f"{aid}-cyclonedx.json"
+
+    artifactory = MagicMock(**{'find_sbom_filename.side_effect': find_sbom_filename,
+                               'download_named.return_value': ("/tmp/sbom.json", [])})
+    stage = SbomStage(artifactory, MagicMock())
+    for aid in ['a', 'b', 'c']:
+        stage.submit("repo", "org.sonarsource.dummy", aid, aid, "1.0", '', f"{aid}-1.0.jar")
+
+    assert stage.finish() == {"a-1.0.jar": "published", "b-1.0.jar": "no SBOM", "c-1.0.jar": "failed"}
+    captured = capsys.readouterr().out
+    assert "SBOMs of 3 artifacts: 1 published, 1 missing, 1 failed" in captured
+    assert "::warning::SBOM publishing failed for c-1.0.jar" in captured
+
+
+def test_publish_all_artifacts_leaves_the_published_artifacts_to_the_revoke_on_failure():
+    dryable.set(False)
+    buildinfo = BuildInfo({
+        "buildInfo": {
+            "properties": {"buildInfo.env.ARTIFACTORY_DEPLOY_REPO": "sonarsource-public-qa"},
+            "modules": [{
+                "properties": {"artifactsToPublish": "org.sonarsource.a:a:jar,org.sonarsource.b:b:jar"},
+                "id": "org.sonarsource.a:a:1.0.0.1",
+            }]
+        }
+    })
+    artifactory = MagicMock(**{'download.side_effect': ["/tmp/a.jar", Exception("not found")]})
+    binaries = MagicMock()
+    with raises(Exception, match="not found"):
+        publish_all_artifacts_to_binaries(artifactory, binaries, MagicMock(), buildinfo)
+    binaries.s3_upload.assert_called_once_with("/tmp/a.jar", "a-1.0.0.1.jar", "org.sonarsource.a", "a", "1.0.0.1", '',
+                                               profile=profile_for("org.sonarsource.a", "a"))
+    # deleted once, by the revoke of abort_release
+    binaries.s3_delete.assert_not_called()
+
+
+def test_revoke_artifacts_goes_on_after_a_failure_and_reports_the_removed_objects(capsys):
+    def s3_delete(filename, *args, **kwargs):
+        if filename.startswith('b-'):
+            raise Exception("denied")
+        return [f"key/{filename}"]
+
+    binaries = MagicMock(**{'s3_delete.side_effect': s3_delete})
+    binaries.s3_delete_sbom.return_value = []
+
+    with raises(Exception, match="could not delete 1 artifacts from binaries: org.sonarsource.b:b:jar: denied"):
+        revoke_artifacts(MagicMock(), binaries, ["org.sonarsource.a:a:jar", "org.sonarsource.b:b:jar"], "1.0", "repo")
+
+    output = capsys.readouterr().out
+    assert "removed 1 objects from binaries\n  key/a-1.0.jar\n" in output
+    assert binaries.s3_delete.call_count == 2
+
+
+def test_revoke_release_deletes_from_binaries_even_when_unpromotion_fails(capsys):
+    dryable.set(False)
+    artifactory = MagicMock(**{'promote.side_effect': Exception("unpromotion failed")})
+    release_request = MagicMock(project="project", buildnumber="42")
+    with patch('release.utils.release.publish_all_artifacts_to_binaries') as publish_all:
+        with raises(Exception, match="unpromotion failed"):
+            revoke_release(artifactory, MagicMock(), release_request)
+    publish_all.assert_called_once()
+    assert "Error could not unpromote project 42 unpromotion failed" in capsys.readouterr().out
@@ -0,0 +1,115 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from release.utils.progress import MB
+from release.utils.transfer import BandwidthLimiter, RetryPolicy, TransferManager, transfer_manager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def response(status_code, chunks=(), content=b''):
+    r = requests.Response()
+    r.status_code = status_code
+    r._content = content
+    r.iter_content = lambda chunk_size: iter(chunks)
+    r.raw = MagicMock()
+    return r
+
+
+def test_bandwidth_is_shared_by_the_transfers():
+    clock = FakeClock()
+    limiter = BandwidthLimiter(10 * MB, clock=clock, sleep=clock.sleep)
+
+    for _ in range(4):
+        limiter.consume(5 * MB)
+
+    assert clock.now == 2
+
+
+def test_no_bandwidth_cap():
+    sleep = MagicMock()
+    BandwidthLimiter(None, sleep=sleep).consume(100 * MB)
+    sleep.assert_not_called()
+
+
+def test_retry_policy_retries_server_and_connection_errors_only():
+    sleep = MagicMock()
+    policy = RetryPolicy(attempts=3, backoff=2, sleep=sleep)
+    function = MagicMock(side_effect=[requests.ConnectionError("reset"), requests.HTTPError(response=response(503)),
+                                      "done"])
+
+    assert policy.run("download", function) == "done"
+    assert [c.args[0] for c in sleep.call_args_list] == [2, 4]
+
+    with pytest.raises(requests.HTTPError):
+        policy.run("download", MagicMock(side_effect=requests.HTTPError(response=response(404))))
+    assert sleep.call_count == 2
+
+
+def test_download_is_retried(tmp_path):
+    manager = TransferManager(retry=RetryPolicy(sleep=MagicMock()), progress=MagicMock())
+    local_file = tmp_path / "a.jar"
+    with patch('requests.get', side_effect=[response(502), response(200, [b'ab', b'c'])]) as get:
+        manager.download("https://repox/a.jar", {'Authorization': 'Bearer token'}, str(local_file))
+    assert get.call_count == 2
+    get.assert_called_with("https://repox/a.jar", headers={'Authorization': 'Bearer token'}, stream=True)
+    assert local_file.read_bytes() == b'abc'
+
+
+def test_get_returns_client_errors_and_retries_server_errors():
+    manager = TransferManager(retry=RetryPolicy(sleep=MagicMock()))
+    with patch('requests.get', side_effect=[response(500), response(404)]) as get:
+        assert manager.get("https://repox/a.jar.asc", {}).status_code == 404
+    assert get.call_count == 2
+
+
+def test_upload_reports_progress_and_consumes_bandwidth():
+    progress = MagicMock()
+    manager = TransferManager(max_transfers=4, max_bandwidth=10 * MB, progress=progress)
+    manager.limiter = MagicMock()
+    s3_client = MagicMock(**{'upload_file.side_effect': lambda *args, Callback, Config: Callback(3)})
+
+    manager.upload(s3_client, "/tmp/a.jar", "bucket", "key")
+
+    _, kwargs = s3_client.upload_file.call_args
+    assert kwargs['Config'].max_concurrency == 4
+    progress.update.assert_called_once_with(progress.start.return_value, 3)
+    progress.finish.assert_called_once()
+    manager.limiter.consume.assert_called_once_with(3)
+
+
+def test_transfer_manager_is_built_from_the_environment_on_first_use():
+    transfer_manager.cache_clear()
+    try:
+        with patch.dict('os.environ', {'INPUT_MAX_TRANSFERS': '3'}):
+            manager = transfer_manager()
+        assert transfer_manager() is manager
+        assert manager.max_transfers == 3
+        assert manager.max_connections == 9
+    finally:
+        transfer_manager.cache_clear()
+
+
+def test_upload_extra_args():
+    s3_client = MagicMock()
+    TransferManager(progress=MagicMock()).upload(s3_client, "/tmp/a.json.gz", "bucket", "key",
+                                                 extra_args={'ContentEncoding': 'gzip'})
+    assert s3_client.upload_file.call_args.kwargs['ExtraArgs'] == {'ContentEncoding': 'gzip'}
+
+
+def test_transfer_limits_from_env():
+    with patch.dict('os.environ', {'INPUT_MAX_TRANSFERS': '2', 'INPUT_MAX_BANDWIDTH': '200'}):
+        manager = TransferManager.from_env()
+    assert manager.max_transfers == 2
+    assert manager.limiter.bytes_per_second == 200 * MB
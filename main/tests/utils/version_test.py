@@ -0,0 +1,75 @@
+import pytest
+from hypothesis import given, strategies as st
+
+from release.steps.ReleaseRequest import ReleaseRequest
+from release.utils.version import Version, is_commit_sha, parse_version
+
+numbers = st.integers(min_value=0, max_value=10 ** 6)
+tags = st.builds(
+    lambda prefix, major, minor, patch, milestone, separator, build:
+    f"{prefix + '-' if prefix else ''}{major}.{minor}.{patch}{f'-M{milestone}' if milestone is not None else ''}"
+    f"{separator}{build}",
+    st.one_of(st.none(), st.from_regex(r'[a-zA-Z]{1,8}', fullmatch=True)),
+    numbers, numbers, numbers, st.one_of(st.none(), numbers), st.sampled_from('.-+'), numbers)
+
+
+@given(tags)
+def test_parse_version_round_trips(tag):
+    version = parse_version(tag)
+    assert version is not None
+    assert str(version) == tag
+    assert parse_version(str(version)) == version
+    assert hash(parse_version(str(version))) == hash(version)
+
+
+@given(tags, tags)
+def test_version_ordering_is_consistent(a, b):
+    va, vb = parse_version(a), parse_version(b)
+    assert (va < vb) + (va == vb) + (va > vb) == 1
+
+
+@given(st.text())
+def test_parse_version_never_raises(text):
+    version = parse_version(text)
+    assert version is None or str(version) == text
+
+
+@pytest.mark.parametrize("tag, expected", [
+    ("1.0.0.42", (None, 1, 0, 0, None, "42")),
+    ("ab-10.2.3-M4.567", ("ab", 10, 2, 3, 4, "567")),
+    ("1.0.0+42", (None, 1, 0, 0, None, "42")),
+])
+def test_parse_version(tag, expected):
+    v = parse_version(tag)
+    assert (v.prefix, v.major, v.minor, v.patch, v.milestone, v.build) == expected
+
+
+@pytest.mark.parametrize("tag", ["bad version", "1.0.42", "org-project-1.0.0.42", "1.0.0.42-SNAPSHOT",
+                                 "00.0.0.0", "1.01.0.42", "1.0.0.042", "1.0.0-M01.42", "\u0661.0.0.42"])
+def test_parse_version_rejects_invalid_tags(tag):
+    assert parse_version(tag) is None
+
+
+def test_milestone_comes_before_release():
+    assert parse_version("10.0.0-M1.1") < parse_version("10.0.0.2") < parse_version("10.0.1.1")
+    assert parse_version("2.0.0.10") > parse_version("2.0.0.9")
+
+
+def test_version_is_immutable():
+    with pytest.raises(AttributeError):
+        parse_version("1.0.0.42").build = "43"
+
+
+def test_is_commit_sha():
+    assert is_commit_sha("c747bee7bf5cfc8c0ad5fbc126d516c0a1aa42ef")
+    assert not is_commit_sha("master")
+
+
+def test_release_request_is_hashable_value():
+    request = ReleaseRequest('org', 'project', '1.0.0.42', '42', 'branch', 'sha')
+    assert request == ReleaseRequest('org', 'project', '1.0.0.42', '42', 'branch', 'sha')
+    assert len({request, ReleaseRequest('org', 'project', '1.0.0.42', '42', 'branch', 'sha')}) == 1
+    assert request.parsed_version == Version(None, 1, 0, 0, None, '.', '42')
+    assert ReleaseRequest('org', 'project', '?.?.?.????', '????', 'master', 'sha').parsed_version is None
+    with pytest.raises(AttributeError):
+        request.version = '1.0.0.43'
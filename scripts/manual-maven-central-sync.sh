@@ -14,7 +14,7 @@
 #   - `jfrog` (v1) or `jf` (v2) CLI configured against repox.jfrog.io with read access to the build's `sonarsource-public-releases` repo
 #   and build-info.
 #   - `vault` CLI logged in to https://vault.sonar.build:8200
-#   - `zip`, `curl`, `find`, `jq`.
+#   - `python3` with `requests` and `polling`, `find`.
 #
 # Usage:
 #   scripts/manual-maven-central-sync.sh <build-name> <build-number> [project-name]